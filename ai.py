@@ -1,69 +1,455 @@
 
 import random
-import copy
+import time
 from game import WHITE, BLACK
-from pst import PIECE_TABLES
+from pst import PIECE_SCORE, MG_VALUES, EG_VALUES, PHASE_WEIGHTS, MAX_PHASE
+from pawns import PawnTable, pawn_structure
+from cache import EXACT, LOWER, UPPER
 
 
-# piece values (positive for white, negative for black)
-PIECE_SCORE = {"king": 0, "queen": 900, "rook": 500, "bishop": 330, "knight": 320, "pawn": 100}
+# score of a checkmate, reduced by the distance to mate in plies from the root of the search (see minimax)
+MATE_SCORE = 100000
+# score of a draw by repetition or by the fifty-move rule
+DRAW_SCORE = 0
+# half-width of the aspiration window placed around the previous iteration's score
+ASPIRATION_WINDOW = 50
+# captures losing more than this (according to the static exchange evaluation) are dropped at depth 1
+SEE_PRUNE_MARGIN = 100
+# value of the king in static exchanges (it can only be the last capturer)
+SEE_KING_VALUE = 20000
+# maximum number of positions kept in the transposition table (it is cleared when full)
+TT_MAX_ENTRIES = 500000
 
+# score of a tablebase win, reduced by the distance to mate (below the mates found by the search itself)
+TB_WIN_SCORE = MATE_SCORE - 500
+
+# transposition table shared by all searches: position hash -> (depth, score, bound, best move)
+TRANSPOSITION_TABLE = {}
+# pawn structure evaluations shared by all searches, keyed by pawn key (see pawns.py)
+PAWN_TABLE = PawnTable()
+# endgame tablebases probed by the search, see load_tablebases
+TABLEBASES = None
+# WIN and DRAW results of the tablebases, bound by load_tablebases (tablebase.py is only imported then)
+_TB_WIN = _TB_DRAW = None
+
+
+# raised inside the search when a limit is reached (time, nodes or stop request), caught by get_minimax_move
+class SearchTimeout(Exception):
+    pass
+
+
+# SearchLimits class that tells a running search when to stop: at a deadline (time.perf_counter() value),
+# when a threading.Event is set (e.g. by the "stop" command of a UCI front end), or after a number of nodes
+# check() is called at every node: it counts the node and raises SearchTimeout when a limit is reached
+
+class SearchLimits:
+
+    def __init__(self, deadline=None, stop_event=None, max_nodes=None):
+        self.deadline = deadline
+        self.stop_event = stop_event
+        self.max_nodes = max_nodes
+        self.nodes = 0
+
+    def check(self):
+        self.nodes += 1
+        if self.reached():
+            raise SearchTimeout()
+
+    # check the limits without counting a node
+    def reached(self):
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            return True
+        if self.stop_event is not None and self.stop_event.is_set():
+            return True
+        return self.max_nodes is not None and self.nodes > self.max_nodes
+
+
+# SearchStats class that collects counters and timings while searching, to measure how much work a search did
+# and how good its move ordering is (cutoffs on the first move / all cutoffs should be close to 1)
+# it is filled by get_minimax_move(..., stats=SearchStats()) and can be logged as a structured record
+
+class SearchStats:
+
+    def __init__(self):
+        self.nodes = 0 # main search nodes (minimax calls above the horizon)
+        self.qnodes = 0 # quiescence nodes
+        self.leaf_evals = 0 # calls to the evaluation function
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0 # cutoffs produced by the first move searched
+        self.tt_probes = 0
+        self.tt_hits = 0 # probes that found the position
+        self.tt_cutoffs = 0 # hits that were deep enough to return a score without searching
+        self.pawn_probes = 0 # pawn structure lookups of the evaluation
+        self.pawn_hits = 0 # lookups answered by the pawn table
+        self.depth_times = [] # seconds spent on each iteration of the iterative deepening
+        self.depth_nodes = [] # main search + quiescence nodes of each iteration
+
+    # fraction of the beta cutoffs produced by the first move searched
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.beta_cutoffs if self.beta_cutoffs else 0.0
+
+    # effective branching factor: growth of the node count between the last two iterations
+    def effective_branching_factor(self):
+        if len(self.depth_nodes) < 2 or self.depth_nodes[-2] == 0:
+            return 0.0
+        return self.depth_nodes[-1] / self.depth_nodes[-2]
+
+    # dict with all the counters and derived figures, ready to be logged (e.g. as JSON)
+    def as_record(self):
+        total_time = sum(self.depth_times)
+        total_nodes = self.nodes + self.qnodes
+        return {
+            "nodes": self.nodes, "qnodes": self.qnodes, "leaf_evals": self.leaf_evals,
+            "beta_cutoffs": self.beta_cutoffs, "first_move_cutoffs": self.first_move_cutoffs,
+            "first_move_cutoff_rate": round(self.first_move_cutoff_rate(), 4),
+            "tt_probes": self.tt_probes, "tt_hits": self.tt_hits, "tt_cutoffs": self.tt_cutoffs,
+            "pawn_probes": self.pawn_probes, "pawn_hits": self.pawn_hits,
+            "depth_times": [round(t, 6) for t in self.depth_times], "depth_nodes": list(self.depth_nodes),
+            "ebf": round(self.effective_branching_factor(), 3),
+            "time": round(total_time, 6), "nps": int(total_nodes / total_time) if total_time > 0 else 0,
+        }
+
+    # log the record as JSON on the "pinpawn.search" logger, with optional extra fields (e.g. the position)
+    def log(self, **fields):
+        import json, logging # only needed here, not imported with the engine (see engine.py)
+        record = dict(fields)
+        record.update(self.as_record())
+        logging.getLogger("pinpawn.search").info(json.dumps(record))
+
+
+
+# function to make the search use the endgame tablebases of a directory (built with tablebase.py)
+# passing None disables them
+def load_tablebases(directory):
+    global TABLEBASES, _TB_WIN, _TB_DRAW
+    from tablebase import Tablebases, WIN, DRAW # imported on first use, like the tables themselves
+    _TB_WIN, _TB_DRAW = WIN, DRAW
+    if TABLEBASES is not None:
+        TABLEBASES.close()
+    TABLEBASES = Tablebases(directory) if directory is not None else None
+
+
+# helper function to convert a tablebase probe into a score (positive = white advantage), or None
+def _probe_tablebases(game):
+    probed = TABLEBASES.probe(game)
+    if probed is None:
+        return None
+    result, dtm = probed
+    if result == _TB_DRAW:
+        return 0
+    score = TB_WIN_SCORE - dtm if result == _TB_WIN else -(TB_WIN_SCORE - dtm)
+    return score if game.curr_player == WHITE else -score
 
 
 # function to find the best move on a given game state, using minimax with alpha-beta pruning
 # takes as optional input the depth of the minimax search (defaults to 2)
-def get_minimax_move(game, depth=2):
+# the search is iteratively deepened (1, 2, ..., depth): each iteration searches the previous best move first,
+# inside an aspiration window around the previous score, and uses principal variation search (PVS)
+# if time_limit (seconds) is given, the best move of the last completed iteration is returned when time runs out
+# if an info dict is given, it is filled with the score, completed depth and principal variation of the search
+# if an AnalysisCache is given, it is consulted before searching and updated with deeper results
+# if an OpeningBook is given, book moves are played instantly (picked at random, proportionally to their weight)
+# the search also stops when stop_event (a threading.Event) is set or after max_nodes nodes, and on_iteration is
+# called after every completed iteration with a dict of depth, score, pv, nodes and time (seconds)
+# if a SearchStats object is given, it collects the search counters and the time and nodes of every iteration
+def get_minimax_move(game, depth=2, time_limit=None, info=None, cache=None, book=None,
+                     stop_event=None, max_nodes=None, on_iteration=None, stats=None):
+    game.refresh_eval() # the board may have been edited directly since the last make_move
     moves = game.find_all_legal_moves(game.curr_player)
+    if not moves:
+        return None # checkmate or stalemate
+
+    # opening book: no search at all
+    if book is not None:
+        book_move = book.choose_move(game)
+        if book_move is not None:
+            if info is not None:
+                info["score"] = 0
+                info["depth"] = 0
+                info["pv"] = [book_move]
+                info["nodes"] = 0
+                info["book"] = True
+            return book_move
+
+    # endgame tablebases: perfect play without searching
+    if TABLEBASES is not None:
+        tb_move = TABLEBASES.best_move(game)
+        if tb_move is not None:
+            if info is not None:
+                info["score"] = _probe_tablebases(game)
+                info["depth"] = 0
+                info["pv"] = [tb_move]
+                info["nodes"] = 0
+                info["tablebase"] = True
+            return tb_move
+
+    # persistent cache: a deep enough exact result needs no search at all
+    key = None
+    cached = None
+    if cache is not None:
+        key = game.zobrist_key
+        cached = cache.probe(key)
+        if cached is not None:
+            cached_move, cached_score, cached_depth, cached_bound = cached
+            if cached_move[0] + cached_move[1] not in moves:
+                cached = None # hash collision
+            elif cached_depth >= depth and cached_bound == EXACT:
+                if info is not None:
+                    info["score"] = cached_score
+                    info["depth"] = cached_depth
+                    info["pv"] = [cached_move]
+                    info["nodes"] = 0
+                return cached_move
+
     random.shuffle(moves) # randomize order to avoid AI playing the exact same moves every time
+    moves = [move for _, move in order_moves(game, moves)] # stable sort, quiet moves stay shuffled
     maximize = True if game.curr_player == WHITE else False # flag to check who is maximizing
-    # initialize alpha/beta values
-    alpha = -100000 # best score white can guarantee
-    beta = 100000 # best score black can guarantee
-    best_move = None
-    
-    if maximize: # white
-        max_eval = -100000
-        for move in moves:
-            # create a copy of the game to simulate the move (computationally expensive but necessary)
-            game_copy = copy.deepcopy(game)
-            start_pos = (move[0], move[1])
-            end_pos = (move[2], move[3])
-            game_copy.make_move(start_pos, end_pos)
-            # perform minimax
-            evaluation = minimax(game_copy, depth - 1, alpha, beta, False) # recursive call
-            if evaluation > max_eval:
-                max_eval = evaluation
-                best_move = (start_pos, end_pos)
-            # alpha-beta pruning
+    pawn_hits, pawn_misses = PAWN_TABLE.hits, PAWN_TABLE.misses
+    start_time = time.perf_counter()
+    deadline = start_time + time_limit if time_limit is not None else None
+    limits = SearchLimits(deadline, stop_event, max_nodes)
+
+    best_move = cached[0] if cached is not None else None # a shallower cached move is still searched first
+    best_score = 0
+    best_pv = []
+    completed_depth = 0
+    for curr_depth in range(1, depth + 1):
+        iteration_start, iteration_nodes = time.perf_counter(), limits.nodes
+        # search the best move of the previous iteration first
+        if best_move is not None:
+            flat_move = best_move[0] + best_move[1]
+            moves.remove(flat_move)
+            moves.insert(0, flat_move)
+        try:
+            score, pv = _search_window(game, moves, curr_depth, best_score if curr_depth > 1 else None, maximize,
+                                       limits, stats)
+        except SearchTimeout:
+            break # keep the result of the last completed iteration
+        if stats is not None:
+            stats.depth_times.append(time.perf_counter() - iteration_start)
+            stats.depth_nodes.append(limits.nodes - iteration_nodes)
+        best_score, best_pv, completed_depth = score, pv, curr_depth
+        best_move = pv[0]
+        if on_iteration is not None:
+            on_iteration({"depth": curr_depth, "score": score, "pv": pv, "nodes": limits.nodes,
+                          "time": time.perf_counter() - start_time})
+        if limits.reached():
+            break
+    if stats is not None:
+        stats.pawn_hits += PAWN_TABLE.hits - pawn_hits
+        stats.pawn_probes += PAWN_TABLE.hits - pawn_hits + PAWN_TABLE.misses - pawn_misses
+
+    if completed_depth == 0:
+        # not even the first iteration completed in time, fall back to the first move
+        best_move = ((moves[0][0], moves[0][1]), (moves[0][2], moves[0][3]))
+        best_pv = [best_move]
+    elif cache is not None:
+        cache.store(key, best_move, best_score, completed_depth, EXACT) # ignored if the cache holds a deeper result
+    if info is not None:
+        info["score"] = best_score
+        info["depth"] = completed_depth
+        info["pv"] = best_pv
+        info["nodes"] = limits.nodes
+    return best_move
+
+
+# function to find the best num_lines moves of a game state with their scores and principal variations, for
+# analysis: returns a list of dicts with the move, score (positive = white advantage) and pv, best line first
+# every iteration of the iterative deepening searches the lines one after the other, each one among the root
+# moves not chosen by the previous lines, so the transposition table and the move ordering (the lines of the
+# previous iteration are searched first, each in its own aspiration window) are shared by all the lines
+# time_limit, stop_event, max_nodes and stats work as in get_minimax_move (the opening book, the tablebases and
+# the analysis cache are not used), and on_iteration is called after every line with a dict of depth, multipv
+# (the line number, from 1), score, pv, nodes and time
+# if an info dict is given, it is filled with the completed depth, the nodes, the nodes spent on every line
+# (line_nodes) and the extra cost of the additional lines relative to the first one, i.e. to a single-PV search
+# the root moves given in exclude, as (start_pos, end_pos), are not searched
+def get_multipv(game, num_lines=3, depth=2, time_limit=None, info=None, stop_event=None, max_nodes=None,
+                on_iteration=None, stats=None, exclude=()):
+    game.refresh_eval() # the board may have been edited directly since the last make_move
+    excluded = [start_pos + end_pos for start_pos, end_pos in exclude]
+    moves = [move for move in game.find_all_legal_moves(game.curr_player) if move not in excluded]
+    if not moves:
+        return [] # checkmate or stalemate
+    num_lines = min(num_lines, len(moves))
+
+    moves = [move for _, move in order_moves(game, moves)]
+    maximize = True if game.curr_player == WHITE else False # flag to check who is maximizing
+    pawn_hits, pawn_misses = PAWN_TABLE.hits, PAWN_TABLE.misses
+    start_time = time.perf_counter()
+    deadline = start_time + time_limit if time_limit is not None else None
+    limits = SearchLimits(deadline, stop_event, max_nodes)
+
+    best_lines = []
+    line_nodes = [0] * num_lines
+    completed_depth = 0
+    for curr_depth in range(1, depth + 1):
+        iteration_start, iteration_nodes = time.perf_counter(), limits.nodes
+        # search the lines of the previous iteration first, in their order
+        for line in reversed(best_lines):
+            flat_move = line["move"][0] + line["move"][1]
+            moves.remove(flat_move)
+            moves.insert(0, flat_move)
+        lines = []
+        remaining = list(moves)
+        try:
+            for i in range(num_lines):
+                line_start = limits.nodes
+                guess = best_lines[i]["score"] if curr_depth > 1 else None
+                score, pv = _search_window(game, remaining, curr_depth, guess, maximize, limits, stats)
+                line_nodes[i] += limits.nodes - line_start
+                lines.append({"move": pv[0], "score": score, "pv": pv})
+                remaining.remove(pv[0][0] + pv[0][1]) # the next line is searched without this move
+                if on_iteration is not None:
+                    on_iteration({"depth": curr_depth, "multipv": i + 1, "score": score, "pv": pv,
+                                  "nodes": limits.nodes, "time": time.perf_counter() - start_time})
+        except SearchTimeout:
+            break # keep the lines of the last completed iteration
+        if stats is not None:
+            stats.depth_times.append(time.perf_counter() - iteration_start)
+            stats.depth_nodes.append(limits.nodes - iteration_nodes)
+        # a later line can only score better through search instability, keep them sorted anyway
+        lines.sort(key=lambda line: -line["score"] if maximize else line["score"])
+        best_lines, completed_depth = lines, curr_depth
+        if limits.reached():
+            break
+    if stats is not None:
+        stats.pawn_hits += PAWN_TABLE.hits - pawn_hits
+        stats.pawn_probes += PAWN_TABLE.hits - pawn_hits + PAWN_TABLE.misses - pawn_misses
+
+    if completed_depth == 0:
+        # not even the first iteration completed in time, fall back to the first moves
+        best_lines = [{"move": ((move[0], move[1]), (move[2], move[3])), "score": 0,
+                       "pv": [((move[0], move[1]), (move[2], move[3]))]} for move in moves[:num_lines]]
+    if info is not None:
+        info["depth"] = completed_depth
+        info["nodes"] = limits.nodes
+        info["line_nodes"] = line_nodes
+        info["extra_cost"] = sum(line_nodes[1:]) / line_nodes[0] if line_nodes[0] else 0.0
+    return best_lines
+
+
+# helper function to search the root moves inside an aspiration window around the score guess (usually the
+# score of the previous iteration), with a full window re-search if the score falls outside
+# without a guess, or with a mate score, the full window is searched at once
+def _search_window(game, moves, depth, guess, maximize, limits, stats=None):
+    if guess is not None and abs(guess) < MATE_SCORE - 1000:
+        alpha = guess - ASPIRATION_WINDOW
+        beta = guess + ASPIRATION_WINDOW
+        score, pv = _search_root(game, moves, depth, alpha, beta, maximize, limits, stats)
+        if alpha < score < beta:
+            return score, pv
+    return _search_root(game, moves, depth, -MATE_SCORE, MATE_SCORE, maximize, limits, stats)
+
+
+# helper function to search all the root moves (already ordered) inside the (alpha, beta) window
+# returns the best score and the principal variation as a list of (start_pos, end_pos) moves
+def _search_root(game, moves, depth, alpha, beta, maximize, limits, stats=None):
+    best_score = -MATE_SCORE if maximize else MATE_SCORE
+    best_pv = []
+    for i, move in enumerate(moves):
+        # simulate the move, and take it back after searching it
+        start_pos = (move[0], move[1])
+        end_pos = (move[2], move[3])
+        game.make_move(start_pos, end_pos)
+        # perform minimax, with a zero window for every move after the first one
+        child_pv = []
+        try:
+            evaluation = _pvs_child(game, depth - 1, alpha, beta, not maximize, i == 0, child_pv, limits, stats, 1)
+        finally:
+            game.undo_move() # also when the search is interrupted
+        if (maximize and evaluation > best_score) or (not maximize and evaluation < best_score) or not best_pv:
+            best_score = evaluation
+            best_pv = [(start_pos, end_pos)] + child_pv
+        # alpha-beta pruning
+        if maximize:
             alpha = max(alpha, evaluation)
-            if beta <= alpha:
-                break # pruning
-        return best_move
-
-    else: # black (minimize)
-        min_eval = 100000
-        for move in moves:
-            game_copy = copy.deepcopy(game)
-            start_pos = (move[0], move[1])
-            end_pos = (move[2], move[3])
-            game_copy.make_move(start_pos, end_pos)
-            # perform minimax
-            evaluation = minimax(game_copy, depth - 1, alpha, beta, True)
-            if evaluation < min_eval:
-                min_eval = evaluation
-                best_move = (start_pos, end_pos)
-            # alpha-beta pruning
+        else:
             beta = min(beta, evaluation)
-            if beta <= alpha:
-                break # pruning
-        return best_move
+        if beta <= alpha:
+            break # pruning
+    return best_score, best_pv
+
+
+# helper function to search a child node with principal variation search
+# the first child gets the full window, the others a zero window that is re-searched only on fail-high
+# (for white) or fail-low (for black), i.e. when the move turns out to be better than the current best
+def _pvs_child(game, depth, alpha, beta, maximizing_player, is_first, pv, limits, stats=None, ply=0):
+    if is_first:
+        return minimax(game, depth, alpha, beta, maximizing_player, pv, limits, stats, ply)
+    if maximizing_player: # the parent is black (minimizing), test against beta
+        evaluation = minimax(game, depth, beta - 1, beta, True, pv, limits, stats, ply)
+    else: # the parent is white (maximizing), test against alpha
+        evaluation = minimax(game, depth, alpha, alpha + 1, False, pv, limits, stats, ply)
+    if alpha < evaluation < beta:
+        if pv is not None:
+            pv.clear()
+        evaluation = minimax(game, depth, alpha, beta, maximizing_player, pv, limits, stats, ply) # re-search
+    return evaluation
+
+
+# helper functions to convert mate scores (and tablebase wins) between the distance from the root of the
+# search and the distance from the current position, which is how the transposition table and the tablebases
+# hold them (so that they stay valid when the position is reached at another ply)
+def _to_node_score(score, ply):
+    if score >= MATE_SCORE - 1000:
+        return score + ply
+    if score <= -(MATE_SCORE - 1000):
+        return score - ply
+    return score
+
+def _to_root_score(score, ply):
+    if score >= MATE_SCORE - 1000:
+        return score - ply
+    if score <= -(MATE_SCORE - 1000):
+        return score + ply
+    return score
 
 
 # minimax algorithm recursive function
-def minimax(game, depth, alpha, beta, maximizing_player):
-    # base stopping condition
+# ply is the distance from the root of the search, mates are scored MATE_SCORE - ply (or -MATE_SCORE + ply)
+# if a pv list is given, it is filled with the principal variation found from this node
+# if SearchLimits are given, SearchTimeout is raised when one of them is reached
+def minimax(game, depth, alpha, beta, maximizing_player, pv=None, limits=None, stats=None, ply=0):
+    # base stopping condition, resolve pending captures before evaluating
     if depth == 0:
-        return score_board(game.board)
+        return quiescence(game, alpha, beta, maximizing_player, limits, stats, ply)
+
+    if limits is not None:
+        limits.check()
+    if stats is not None:
+        stats.nodes += 1
+
+    # draws by rule: a position repeated since the last irreversible move would be repeated again by the side
+    # that aimed for it (a twofold repetition is enough inside the tree), or the fifty-move rule applies
+    if game.repetition_count() >= 2 or game.halfmove_clock >= 100:
+        return DRAW_SCORE
+
+    # endgame tablebases give the exact result inside the tree (and in quiescence at the leaves)
+    if TABLEBASES is not None:
+        tb_score = _probe_tablebases(game)
+        if tb_score is not None:
+            return _to_root_score(tb_score, ply)
+
+    # transposition table: reuse the result of an earlier search of the same position if deep enough
+    key = game.zobrist_key
+    entry = TRANSPOSITION_TABLE.get(key)
+    tt_move = None
+    if stats is not None:
+        stats.tt_probes += 1
+    if entry is not None:
+        entry_depth, entry_score, entry_bound, tt_move = entry
+        entry_score = _to_root_score(entry_score, ply)
+        if stats is not None:
+            stats.tt_hits += 1
+        if entry_depth >= depth and (entry_bound == EXACT
+                                     or (entry_bound == LOWER and entry_score >= beta)
+                                     or (entry_bound == UPPER and entry_score <= alpha)):
+            if stats is not None:
+                stats.tt_cutoffs += 1
+            if pv is not None:
+                pv[:] = [tt_move]
+            return entry_score
     
     # list moves and check for game over inside the recursion
     moves = game.find_all_legal_moves(game.curr_player)
@@ -71,60 +457,226 @@ def minimax(game, depth, alpha, beta, maximizing_player):
         # if checkmate, return high/low score to incentivize moves that lead to it
         if game.is_square_attacked(game.board.find_king(game.curr_player), game.curr_opponent):
             if maximizing_player:
-                return -100000 + depth # white must favor later black checkmates
+                return -MATE_SCORE + ply # white is mated, later mates are better for white
             else:
-                return 100000 - depth # black must favor sooner black checkmates
+                return MATE_SCORE - ply # black is mated, sooner mates are better for white
         else:
             return 0 # stalemate
 
-    if maximizing_player: # white
-        max_eval = -100000
-        for move in moves:
-            gs_copy = copy.deepcopy(game)
-            gs_copy.make_move((move[0], move[1]), (move[2], move[3]))
-            # recursive step
-            eval = minimax(gs_copy, depth - 1, alpha, beta, False)
-            max_eval = max(max_eval, eval)
-            # alpha/beta update and pruning
-            alpha = max(alpha, eval)
-            if beta <= alpha:
+    # best move from the transposition table first, then good captures, losing captures last
+    ordered_moves = order_moves(game, moves)
+    if tt_move is not None:
+        for i, (see_value, move) in enumerate(ordered_moves):
+            if move == tt_move[0] + tt_move[1]:
+                ordered_moves.insert(0, ordered_moves.pop(i))
                 break
-        return max_eval
-    else: # black
-        min_eval = 100000
-        for move in moves:
-            gs_copy = copy.deepcopy(game)
-            gs_copy.make_move((move[0], move[1]), (move[2], move[3]))
-            # recursive step
-            eval = minimax(gs_copy, depth - 1, alpha, beta, True)
-            min_eval = min(min_eval, eval)
-            # alpha/beta update and pruning
+    # at the frontier, obviously losing captures are not worth a search (unless in check)
+    prune_bad_captures = depth == 1 and not game.is_square_attacked(game.board.find_king(game.curr_player), game.curr_opponent)
+
+    alpha_orig, beta_orig = alpha, beta
+    best_eval = -MATE_SCORE if maximizing_player else MATE_SCORE
+    best_move = None
+    for i, (see_value, move) in enumerate(ordered_moves):
+        if prune_bad_captures and i > 0 and see_value is not None and see_value < -SEE_PRUNE_MARGIN:
+            continue
+        game.make_move((move[0], move[1]), (move[2], move[3]))
+        # recursive step (principal variation search)
+        child_pv = [] if pv is not None else None
+        try:
+            eval = _pvs_child(game, depth - 1, alpha, beta, not maximizing_player, i == 0, child_pv, limits, stats,
+                              ply + 1)
+        finally:
+            game.undo_move()
+        if best_move is None or (maximizing_player and eval > best_eval) or (not maximizing_player and eval < best_eval):
+            best_eval = eval
+            best_move = ((move[0], move[1]), (move[2], move[3]))
+            if pv is not None:
+                pv[:] = [best_move] + child_pv
+        # alpha/beta update and pruning
+        if maximizing_player: # white
+            alpha = max(alpha, eval)
+        else: # black
             beta = min(beta, eval)
-            if beta <= alpha:
+        if beta <= alpha:
+            if stats is not None:
+                stats.beta_cutoffs += 1
+                if i == 0:
+                    stats.first_move_cutoffs += 1
+            break
+
+    # store the result, with the bound given by the original window
+    if best_eval >= beta_orig:
+        bound = LOWER
+    elif best_eval <= alpha_orig:
+        bound = UPPER
+    else:
+        bound = EXACT
+    if len(TRANSPOSITION_TABLE) >= TT_MAX_ENTRIES:
+        TRANSPOSITION_TABLE.clear()
+    TRANSPOSITION_TABLE[key] = (depth, _to_node_score(best_eval, ply), bound, best_move)
+    return best_eval
+
+
+# quiescence search: at the horizon, keep searching captures until the position is quiet
+# the side to move can always "stand pat" on the static evaluation, and captures losing material
+# according to the static exchange evaluation are not searched at all
+def quiescence(game, alpha, beta, maximizing_player, limits=None, stats=None, ply=0):
+    if limits is not None:
+        limits.check()
+    if stats is not None:
+        stats.qnodes += 1
+
+    if TABLEBASES is not None:
+        tb_score = _probe_tablebases(game)
+        if tb_score is not None:
+            return _to_root_score(tb_score, ply)
+
+    stand_pat = evaluate(game)
+    if stats is not None:
+        stats.leaf_evals += 1
+    if maximizing_player:
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+    else:
+        if stand_pat <= alpha:
+            return stand_pat
+        beta = min(beta, stand_pat)
+
+    best_eval = stand_pat
+    captures = game.find_all_legal_captures(game.curr_player)
+    for see_value, move in order_moves(game, captures):
+        if see_value < 0:
+            break # losing captures come last, and are all pruned
+        game.make_move((move[0], move[1]), (move[2], move[3]))
+        try:
+            eval = quiescence(game, alpha, beta, not maximizing_player, limits, stats, ply + 1)
+        finally:
+            game.undo_move()
+        if maximizing_player:
+            best_eval = max(best_eval, eval)
+            alpha = max(alpha, eval)
+        else:
+            best_eval = min(best_eval, eval)
+            beta = min(beta, eval)
+        if beta <= alpha:
+            break
+    return best_eval
+
+
+# function to order a list of moves for the search: winning and even captures first (best exchange first),
+# then quiet moves (in their original order), then losing captures (least bad first)
+# returns a list of (see_value, move) tuples, where see_value is None for quiet moves
+def order_moves(game, moves):
+    good_captures = []
+    quiet_moves = []
+    bad_captures = []
+    for move in moves:
+        if _is_capture(game, move):
+            see_value = see(game, move)
+            if see_value >= 0:
+                good_captures.append((see_value, move))
+            else:
+                bad_captures.append((see_value, move))
+        else:
+            quiet_moves.append((None, move))
+    good_captures.sort(key=lambda x: x[0], reverse=True)
+    bad_captures.sort(key=lambda x: x[0], reverse=True)
+    return good_captures + quiet_moves + bad_captures
+
+
+# helper function to check if a move (r, c, r, c) captures a piece, en passant included
+def _is_capture(game, move):
+    if game.board.board[move[2]][move[3]] is not None:
+        return True
+    piece = game.board.board[move[0]][move[1]]
+    return piece.type == "pawn" and (move[2], move[3]) == game.en_passant_target_square
+
+
+# static exchange evaluation: material outcome (for the side making it) of the capture sequence on the
+# destination square started by move (r, c, r, c), with both sides always recapturing with their least
+# valuable attacker and free to stop when continuing would lose material
+# no move is made: the attacker lists of the square are recomputed while capturers are lifted off the board,
+# which also reveals x-ray attackers behind them, and the board is restored before returning
+def see(game, move):
+    board = game.board.board
+    start_pos = (move[0], move[1])
+    target_pos = (move[2], move[3])
+    moving_piece = board[start_pos[0]][start_pos[1]]
+    target_piece = board[target_pos[0]][target_pos[1]]
+    if target_piece is None:
+        gain = [PIECE_SCORE["pawn"] if _is_capture(game, move) else 0] # en passant
+    else:
+        gain = [PIECE_SCORE[target_piece.type]]
+
+    lifted = [(start_pos, moving_piece)]
+    board[start_pos[0]][start_pos[1]] = None
+    on_square_value = _see_value(moving_piece) # value of the piece that would be captured next
+    side = BLACK if moving_piece.color == WHITE else WHITE
+    try:
+        while True:
+            attackers = game.find_attackers(target_pos, side)
+            if not attackers:
                 break
-        return min_eval
+            # least valuable attacker
+            attacker_pos = min(attackers, key=lambda pos: _see_value(board[pos[0]][pos[1]]))
+            attacker = board[attacker_pos[0]][attacker_pos[1]]
+            other_side = BLACK if side == WHITE else WHITE
+            if attacker.type == "king" and game.find_attackers(target_pos, other_side):
+                break # the king cannot capture into a defended square
+            gain.append(on_square_value - gain[-1])
+            if max(-gain[-2], gain[-1]) < 0:
+                break # neither side can improve by continuing
+            on_square_value = _see_value(attacker)
+            lifted.append((attacker_pos, attacker))
+            board[attacker_pos[0]][attacker_pos[1]] = None
+            side = other_side
+    finally:
+        # restore the board
+        for pos, piece in lifted:
+            board[pos[0]][pos[1]] = piece
+
+    # minimax the gains back to the first capture (each side may stop capturing)
+    for i in range(len(gain) - 1, 0, -1):
+        gain[i - 1] = -max(-gain[i - 1], gain[i])
+    return gain[0]
+
+
+# helper function returning the exchange value of a piece
+def _see_value(piece):
+    return SEE_KING_VALUE if piece.type == "king" else PIECE_SCORE[piece.type]
 
 
-# function to evaluate the score of a given board using PST (positive = white advantange)
+
+# function to evaluate the score of a given board using PST and the pawn structure (positive = white advantange)
+# midgame and endgame scores are blended according to the game phase, i.e. the material left on the board
+# this scans the whole board, the search uses evaluate(game) instead
 def score_board(board):
-    score = 0
+    mg_score, eg_score, _, _ = pawn_structure(board)
+    phase = 0
     for r in range(8):
         for c in range(8):
             piece = board.board[r][c]
             if piece is not None:
-                # material score
-                material_score = PIECE_SCORE[piece.type]
-                # positional score
-                if piece.color == WHITE:
-                    idx = r*8 + c # 2D to 1D index
-                    pos_score = PIECE_TABLES[piece.type][idx]
-                    score += material_score + pos_score
-                else:
-                    # black pieces use a mirrored PST
-                    idx = (r-7)*8 + c
-                    pos_score = PIECE_TABLES[piece.type][idx]
-                    score -= material_score + pos_score
-    return score
+                # material and positional score, precomputed per color, piece and square (see pst.py)
+                key = (piece.color, piece.type)
+                mg_score += MG_VALUES[key][r*8 + c]
+                eg_score += EG_VALUES[key][r*8 + c]
+                phase += PHASE_WEIGHTS[piece.type]
+    return _taper(mg_score, eg_score, phase)
+
+
+# function to evaluate a game from its incrementally updated evaluation terms (see Game.refresh_eval) and its
+# cached pawn structure, same result as score_board(game.board) without scanning the board
+def evaluate(game):
+    pawn_mg, pawn_eg, _, _ = PAWN_TABLE.probe(game.pawn_key, game.board)
+    return _taper(game.eval_mg + pawn_mg, game.eval_eg + pawn_eg, game.phase)
+
+
+# helper function to blend the midgame and endgame scores according to the game phase (tapered evaluation)
+def _taper(mg_score, eg_score, phase):
+    phase = min(phase, MAX_PHASE) # promotions can push the phase above its starting value
+    return (mg_score * phase + eg_score * (MAX_PHASE - phase)) // MAX_PHASE
 
 
 ### UNUSED
@@ -144,6 +696,13 @@ def score_board_trivial(board):
 
 
 
+# function that runs get_minimax_move with a fresh SearchStats object, returns (move, stats)
+def get_minimax_move_with_stats(game, depth=2, **kwargs):
+    stats = SearchStats()
+    move = get_minimax_move(game, depth, stats=stats, **kwargs)
+    return move, stats
+
+
 # function that returns a random legal move (tuple of tuples) or None, for the given game state
 def get_random_move(game):
     valid_moves = game.find_all_legal_moves(game.curr_player)
@@ -0,0 +1,192 @@
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+import ai
+import profiler
+from game import Game
+
+
+# search benchmark: runs a fixed-depth search on a set of positions and reports the search statistics of
+# each one (nodes, cutoffs, transposition and pawn table hits, time per depth, effective branching factor)
+# with --json, one structured record per position is logged instead, to compare runs between commits
+# with --profile, the time of every position is also split between the hot-path functions (see profiler.py)
+# with --startup, the cold start of the headless engine (engine.py) is measured in fresh interpreters instead
+# with --multipv N, every position is searched once with a single line and once with N lines, to measure the
+# extra cost of the additional lines, and with N separate single-line searches (each excluding the best moves of
+# the previous lines) for comparison
+
+POSITIONS = [
+    ("start", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"),
+    ("italian", "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 0 1"),
+    ("queens_gambit", "rnbqkbnr/ppp2ppp/4p3/3p4/2PP4/8/PP2PPPP/RNBQKBNR w KQkq - 0 1"),
+    ("middlegame", "r2q1rk1/pp2bppp/2n1bn2/3p4/3P4/2NBBN2/PP3PPP/R2Q1RK1 w - - 0 1"),
+    ("tactics", "r1b1kb1r/pppp1ppp/5q2/4n3/3KP3/2N3PN/PPP4P/R1BQ1B1R b kq - 0 1"),
+    ("rook_endgame", "8/5k2/3p4/1p1Pp2p/pP2Pp1P/P4P1K/8/8 b - - 0 1"),
+    ("king_pawn", "8/8/8/4k3/8/8/4P3/4K3 w - - 0 1"),
+]
+
+# script run in a fresh interpreter to measure the cold start of the headless engine: import time, then latency
+# of the first move (which imports the search), and whether pygame was loaded
+STARTUP_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import engine
+imported = time.perf_counter()
+engine.Engine().best_move(depth=%d)
+done = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_move": done - imported, "pygame": "pygame" in sys.modules}))
+"""
+
+
+# function to run the benchmark, returns the list of (name, move, stats) results
+def run_benchmark(positions=POSITIONS, depth=3, time_limit=None):
+    results = []
+    for name, fen in positions:
+        game = Game()
+        game.load_fen(fen)
+        ai.TRANSPOSITION_TABLE.clear() # every position starts from empty tables
+        ai.PAWN_TABLE.clear()
+        with profiler.measure(f"position {name}"):
+            move, stats = ai.get_minimax_move_with_stats(game, depth, time_limit=time_limit)
+        results.append((name, move, stats))
+    return results
+
+
+# function to compare single-PV, multi-PV and separate searches (each from empty tables), returns a list of
+# (name, single-PV nodes, single-PV time, multi-PV nodes, multi-PV time, multi-PV info, separate nodes) results
+def run_multipv_benchmark(positions=POSITIONS, depth=3, num_lines=3):
+    results = []
+    for name, fen in positions:
+        game = Game()
+        game.load_fen(fen)
+        timings = []
+        for lines in (1, num_lines):
+            ai.TRANSPOSITION_TABLE.clear()
+            ai.PAWN_TABLE.clear()
+            info = {}
+            start_time = time.perf_counter()
+            found = ai.get_multipv(game, lines, depth, info=info)
+            timings.append((info["nodes"], time.perf_counter() - start_time, info))
+        (single_nodes, single_time, _), (multi_nodes, multi_time, multi_info) = timings
+        # the same lines searched one at a time, the way it was done without multi-PV
+        separate_nodes = 0
+        for i in range(len(found)):
+            ai.TRANSPOSITION_TABLE.clear()
+            ai.PAWN_TABLE.clear()
+            info = {}
+            ai.get_multipv(game, 1, depth, info=info, exclude=[line["move"] for line in found[:i]])
+            separate_nodes += info["nodes"]
+        results.append((name, single_nodes, single_time, multi_nodes, multi_time, multi_info, separate_nodes))
+    return results
+
+
+# function to format the multi-PV results as a table, with the totals on the last line
+def format_multipv_results(results, num_lines=3):
+    lines = [f"{'position':<15}{'1-pv nodes':>12}{f'{num_lines}-pv nodes':>12}{'extra':>9}{'separate':>10}{'extra':>9}"
+             f"{'1-pv time':>11}{f'{num_lines}-pv time':>11}"]
+    for name, single_nodes, single_time, multi_nodes, multi_time, _, separate_nodes in results:
+        extra = multi_nodes / single_nodes - 1 if single_nodes else 0.0
+        separate_extra = separate_nodes / single_nodes - 1 if single_nodes else 0.0
+        lines.append(f"{name:<15}{single_nodes:>12}{multi_nodes:>12}{extra:>9.0%}{separate_nodes:>10}{separate_extra:>9.0%}"
+                     f"{single_time:>10.2f}s{multi_time:>10.2f}s")
+    total_single = sum(r[1] for r in results)
+    total_multi = sum(r[3] for r in results)
+    total_separate = sum(r[6] for r in results)
+    extra = total_multi / total_single - 1 if total_single else 0.0
+    separate_extra = total_separate / total_single - 1 if total_single else 0.0
+    lines.append(f"{'total':<15}{total_single:>12}{total_multi:>12}{extra:>9.0%}{total_separate:>10}{separate_extra:>9.0%}"
+                 f"{sum(r[2] for r in results):>10.2f}s{sum(r[4] for r in results):>10.2f}s")
+    lines.append(f"{num_lines - 1} extra lines cost {extra:.0%} of a single-PV search "
+                 f"({separate_extra:.0%} when searched separately)")
+    return "\n".join(lines)
+
+
+# function to measure the cold start of the engine in runs fresh processes, returns the median import time,
+# first move latency and total process time (with interpreter startup) in seconds, and the pygame flag
+def measure_startup(runs=5, depth=1):
+    records = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT % depth], capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        record = json.loads(output)
+        record["process"] = time.perf_counter() - start_time
+        records.append(record)
+    summary = {field: statistics.median(r[field] for r in records) for field in ("import", "first_move", "process")}
+    summary["pygame"] = any(r["pygame"] for r in records)
+    return summary
+
+
+# function to format the results as a table, with the totals on the last line
+def format_results(results):
+    lines = [f"{'position':<15}{'nodes':>9}{'qnodes':>9}{'evals':>9}{'cut1st':>8}{'tthit':>8}{'pawnhit':>9}{'ebf':>7}{'time':>9}"]
+    total_nodes = total_qnodes = total_evals = 0
+    total_time = 0.0
+    for name, _, stats in results:
+        tt_rate = stats.tt_hits / stats.tt_probes if stats.tt_probes else 0.0
+        pawn_rate = stats.pawn_hits / stats.pawn_probes if stats.pawn_probes else 0.0
+        time_spent = sum(stats.depth_times)
+        lines.append(f"{name:<15}{stats.nodes:>9}{stats.qnodes:>9}{stats.leaf_evals:>9}"
+                     f"{stats.first_move_cutoff_rate():>8.1%}{tt_rate:>8.1%}{pawn_rate:>9.1%}{stats.effective_branching_factor():>7.2f}"
+                     f"{time_spent:>8.2f}s")
+        total_nodes += stats.nodes
+        total_qnodes += stats.qnodes
+        total_evals += stats.leaf_evals
+        total_time += time_spent
+    nps = int((total_nodes + total_qnodes) / total_time) if total_time > 0 else 0
+    lines.append(f"{'total':<15}{total_nodes:>9}{total_qnodes:>9}{total_evals:>9}{'':>32}{total_time:>8.2f}s")
+    lines.append(f"{nps} nodes/s")
+    return "\n".join(lines)
+
+
+# command line tool, e.g. python benchmark.py -d 4 --json
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the PinPawn search.")
+    parser.add_argument("-d", "--depth", type=int, default=3, help="search depth (default: 3)")
+    parser.add_argument("-t", "--time-limit", type=float, default=None, help="time limit per position in seconds")
+    parser.add_argument("--json", action="store_true", help="log one JSON record per position")
+    parser.add_argument("--profile", action="store_true", help="print a hot-path time breakdown per position")
+    parser.add_argument("--stacks", default=None, help="write the profiled call stacks to this file (collapsed format)")
+    parser.add_argument("--startup", action="store_true", help="measure the engine's import and first move latency")
+    parser.add_argument("--multipv", type=int, default=None, help="compare single-PV and N-line searches")
+    args = parser.parse_args()
+    if args.startup:
+        summary = measure_startup()
+        if args.json:
+            print(json.dumps(summary))
+        else:
+            print(f"import {summary['import'] * 1000:.1f} ms, first move {summary['first_move'] * 1000:.1f} ms, "
+                  f"process {summary['process'] * 1000:.1f} ms (pygame {'loaded' if summary['pygame'] else 'not loaded'})")
+        sys.exit()
+    if args.multipv is not None:
+        results = run_multipv_benchmark(depth=args.depth, num_lines=args.multipv)
+        if args.json:
+            for name, single_nodes, single_time, multi_nodes, multi_time, info, separate_nodes in results:
+                print(json.dumps({"position": name, "depth": args.depth, "lines": args.multipv,
+                                  "single_nodes": single_nodes, "single_time": round(single_time, 6),
+                                  "multi_nodes": multi_nodes, "multi_time": round(multi_time, 6),
+                                  "line_nodes": info["line_nodes"], "extra_cost": round(info["extra_cost"], 4),
+                                  "separate_nodes": separate_nodes}))
+        else:
+            print(format_multipv_results(results, args.multipv))
+        sys.exit()
+    if args.profile or args.stacks:
+        profiler.enable(stacks_path=args.stacks)
+    else:
+        profiler.enable_from_env()
+    try:
+        results = run_benchmark(depth=args.depth, time_limit=args.time_limit)
+    finally:
+        profiler.disable()
+    if args.json:
+        logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+        for name, move, stats in results:
+            stats.log(position=name, depth=args.depth, move=move)
+    else:
+        print(format_results(results))
@@ -0,0 +1,144 @@
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import zobrist
+from game import Game, WHITE
+from pgn import read_games, san_to_move
+from utils import _move2int, _int2move
+
+
+# binary opening book, using the fixed 16-byte record layout of Polyglot books:
+#   key (uint64) | move (uint16) | weight (uint16) | learn (uint32), big-endian, records sorted by key
+# keys are the Zobrist hashes of zobrist.py and moves are packed with utils._move2int (castling is stored
+# as the king's two-square move, as make_move expects it)
+# the file is memory-mapped and looked up with a binary search, so a probe costs a few microseconds
+
+RECORD = struct.Struct(">QHHI")
+KEY = struct.Struct(">Q")
+
+
+# OpeningBook class that gives read access to a book file
+
+class OpeningBook:
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self.num_records = size // RECORD.size
+        # an empty file cannot be memory-mapped
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    # list the book moves of a position hash, as (move, weight) tuples with move = (start_pos, end_pos)
+    def find_moves(self, key):
+        # binary search of the first record with the given key
+        lo, hi = 0, self.num_records
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if KEY.unpack_from(self._mm, mid * RECORD.size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        moves = []
+        while lo < self.num_records:
+            record_key, move, weight, _ = RECORD.unpack_from(self._mm, lo * RECORD.size)
+            if record_key != key:
+                break
+            moves.append((_int2move(move), weight))
+            lo += 1
+        return moves
+
+    # list the legal book moves for the current position of a game
+    def probe(self, game):
+        moves = []
+        for move, weight in self.find_moves(zobrist.hash_game(game)):
+            # guard against hash collisions
+            if game.is_move_legal(move[0], move[1], game.curr_player)[0]:
+                moves.append((move, weight))
+        return moves
+
+    # pick a book move at random, proportionally to the weights, or return None if out of book
+    def choose_move(self, game, rng=random):
+        moves = self.probe(game)
+        total = sum(weight for _, weight in moves)
+        if total == 0:
+            return None
+        pick = rng.randrange(total)
+        for move, weight in moves:
+            if pick < weight:
+                return move
+            pick -= weight
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# function to build a book file from PGN files
+# the first max_ply moves of every game are counted, each move weighted 2 for a win and 1 for a draw of the
+# side playing it (moves of the losing side are not stored), and (position, move) pairs seen fewer than
+# min_games times are dropped
+# returns the number of records written
+def build_book(pgn_paths, out_path, max_ply=20, min_games=1):
+    counts = {} # (key, move) -> [games, weight]
+    for path in pgn_paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for headers, san_moves in read_games(f):
+                result = headers.get("Result", "*")
+                if result not in ("1-0", "0-1", "1/2-1/2"):
+                    continue
+                game = Game()
+                for san in san_moves[:max_ply]:
+                    try:
+                        start_pos, end_pos = san_to_move(game, san)
+                    except ValueError:
+                        break # skip the rest of a broken game
+                    if result == "1/2-1/2":
+                        weight = 1
+                    elif (result == "1-0") == (game.curr_player == WHITE):
+                        weight = 2
+                    else:
+                        weight = 0
+                    if weight:
+                        entry = counts.setdefault((zobrist.hash_game(game), _move2int(start_pos, end_pos)), [0, 0])
+                        entry[0] += 1
+                        entry[1] += weight
+                    game.make_move(start_pos, end_pos)
+    return write_book(
+        out_path, [(key, move, weight) for (key, move), (games, weight) in counts.items() if games >= min_games]
+    )
+
+
+# function to write (key, move, weight) entries to a book file, sorted by key and then by decreasing weight
+# weights are scaled down to fit 16 bits if needed, returns the number of records written
+def write_book(out_path, entries):
+    entries = sorted(entries, key=lambda e: (e[0], -e[2], e[1]))
+    max_weight = max((weight for _, _, weight in entries), default=0)
+    scale = 65535 / max_weight if max_weight > 65535 else 1
+    with open(out_path, "wb") as f:
+        for key, move, weight in entries:
+            f.write(RECORD.pack(key, move, max(1, int(weight * scale)), 0))
+    return len(entries)
+
+
+# command line tool, e.g. python book.py games1.pgn games2.pgn -o book.bin --max-ply 16
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a PinPawn opening book from PGN files.")
+    parser.add_argument("pgn", nargs="+", help="PGN files to read")
+    parser.add_argument("-o", "--output", default="book.bin", help="book file to write (default: book.bin)")
+    parser.add_argument("--max-ply", type=int, default=20, help="number of half-moves read from every game")
+    parser.add_argument("--min-games", type=int, default=1, help="minimum number of games for a book move")
+    args = parser.parse_args()
+    n = build_book(args.pgn, args.output, args.max_ply, args.min_games)
+    print(f"{n} book entries written to {args.output}", file=sys.stderr)
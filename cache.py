@@ -0,0 +1,86 @@
+
+from utils import _move2int, _int2move
+
+
+# bound types of a stored score (shared with the in-memory transposition table of the search)
+EXACT = 0 # the score is the exact minimax value
+LOWER = 1 # the true value is at least the score (the search failed high)
+UPPER = 2 # the true value is at most the score (the search failed low)
+
+
+# AnalysisCache class that persists search results on disk (SQLite in WAL mode), so that positions analyzed
+# in a previous session are answered without searching again
+# entries are keyed by the Zobrist hash of the position and store best move, score, depth and bound
+# when the cache grows beyond max_entries, the shallowest entries are evicted first
+
+class AnalysisCache:
+
+    def __init__(self, path, max_entries=1_000_000):
+        self.path = path
+        self.max_entries = max_entries
+        import sqlite3 # imported on first use, the search only needs the bound types of this module
+        # the search may run in a worker thread, while the cache is opened by the main thread
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis ("
+            "key INTEGER PRIMARY KEY, move INTEGER, score INTEGER, depth INTEGER, bound INTEGER)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS analysis_depth ON analysis (depth)")
+        self.conn.commit()
+        self._count = self.conn.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+
+    # look up a position by hash, returns (move, score, depth, bound) or None
+    # move is returned as (start_pos, end_pos)
+    def probe(self, key):
+        row = self.conn.execute(
+            "SELECT move, score, depth, bound FROM analysis WHERE key = ?", (_to_signed(key),)
+        ).fetchone()
+        if row is None:
+            return None
+        move, score, depth, bound = row
+        return _int2move(move), score, depth, bound
+
+    # store a search result, unless the cache already holds a deeper one for the same position
+    # returns True if the entry was written
+    def store(self, key, move, score, depth, bound=EXACT):
+        signed_key = _to_signed(key)
+        row = self.conn.execute("SELECT depth FROM analysis WHERE key = ?", (signed_key,)).fetchone()
+        if row is not None and row[0] > depth:
+            return False # keep the deeper result
+        self.conn.execute(
+            "INSERT OR REPLACE INTO analysis (key, move, score, depth, bound) VALUES (?, ?, ?, ?, ?)",
+            (signed_key, _move2int(move[0], move[1]), score, depth, bound)
+        )
+        if row is None:
+            self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+        self.conn.commit()
+        return True
+
+    # evict the shallowest entries, leaving the cache 10% below its size cap
+    def _evict(self):
+        excess = self._count - int(self.max_entries * 0.9)
+        self.conn.execute(
+            "DELETE FROM analysis WHERE key IN (SELECT key FROM analysis ORDER BY depth ASC LIMIT ?)", (excess,)
+        )
+        self._count = self.conn.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# helper function to map an unsigned 64-bit hash to the signed range of SQLite integers
+def _to_signed(key):
+    return key - (1 << 64) if key >= (1 << 63) else key
@@ -0,0 +1,107 @@
+
+from game import Game, WHITE
+from utils import _n2c, _c2n
+
+
+# headless engine API, for scripts, batch jobs and worker processes: no pygame, no interactive loop
+# importing this module only loads the rules (game.py); the search (ai.py) and the mate search (mate.py) are
+# imported on their first use, so a fresh process that only validates moves never pays for them, and one that
+# searches pays for them once (see benchmark.py --startup)
+# moves are given and returned as coordinate strings, e.g. "e2e4" (promotions are always to a queen)
+
+
+# Engine class that holds a game and answers queries about it
+
+class Engine:
+
+    def __init__(self, fen=None):
+        self.set_position(fen)
+
+    # set the position from a FEN string (the start position if None), then play the given moves
+    # raises ValueError for an invalid FEN or an illegal move
+    def set_position(self, fen=None, moves=()):
+        self.game = Game()
+        if fen is not None:
+            self.game.load_fen(fen)
+        for move in moves:
+            self.push(move)
+
+    # play a move, raises ValueError if it is illegal
+    def push(self, move):
+        if (len(move) not in (4, 5) or (len(move) == 5 and move[4].lower() != "q")
+                or any(move[i] not in "abcdefgh" or move[i + 1] not in "12345678" for i in (0, 2))):
+            raise ValueError(f"Invalid move '{move}'")
+        start_pos, end_pos = _n2c(move[0:2]), _n2c(move[2:4])
+        is_legal, error_msg = self.game.is_move_legal(start_pos, end_pos, self.game.curr_player)
+        if not is_legal:
+            raise ValueError(f"Illegal move '{move}': {error_msg}")
+        self.game.make_move(start_pos, end_pos)
+
+    def fen(self):
+        return self.game.get_fen()
+
+    def legal_moves(self):
+        return [_c2n(r1, c1) + _c2n(r2, c2) for r1, c1, r2, c2 in self.game.find_all_legal_moves(self.game.curr_player)]
+
+    # function returning the result of the game: "1-0", "0-1", "1/2-1/2" (stalemate, repetition or fifty-move
+    # rule), or None if it is not over
+    def result(self):
+        game = self.game
+        if game.find_all_legal_moves(game.curr_player):
+            return "1/2-1/2" if game.draw_reason() is not None else None
+        if game.is_square_attacked(game.board.find_king(game.curr_player), game.curr_opponent):
+            return "0-1" if game.curr_player == WHITE else "1-0"
+        return "1/2-1/2"
+
+    # function to search the best move (see ai.get_minimax_move for the options), returns it or None if the
+    # game is over; an info dict is filled with the score, depth, principal variation and nodes
+    def best_move(self, depth=3, time_limit=None, info=None, **options):
+        import ai # imported on first use
+        move = ai.get_minimax_move(self.game, depth, time_limit, info=info, **options)
+        if info is not None and "pv" in info:
+            info["pv"] = [_c2n(*start) + _c2n(*end) for start, end in info["pv"]]
+        return _c2n(*move[0]) + _c2n(*move[1]) if move is not None else None
+
+    # function to search the best num_lines moves (see ai.get_multipv), returns a list of dicts with the move,
+    # score and principal variation of every line, best first; an info dict is filled with the depth, the nodes
+    # and the extra cost of the additional lines compared with a single-PV search
+    def analyse(self, num_lines=3, depth=3, time_limit=None, info=None, **options):
+        import ai # imported on first use
+        lines = ai.get_multipv(self.game, num_lines, depth, time_limit, info=info, **options)
+        return [{"move": _c2n(*line["move"][0]) + _c2n(*line["move"][1]), "score": line["score"],
+                 "pv": [_c2n(*start) + _c2n(*end) for start, end in line["pv"]]} for line in lines]
+
+    # function to search a forced mate for the side to move (see mate.find_mate), returns the mating line or None
+    def find_mate(self, max_nodes=None, time_limit=None, info=None):
+        import mate # imported on first use
+        line = mate.find_mate(self.game, max_nodes, time_limit, info=info)
+        return [_c2n(*start) + _c2n(*end) for start, end in line] if line is not None else None
+
+
+# command line tool, e.g. python engine.py --moves e2e4 e7e5 -d 3, prints the best move and the search info
+# as JSON (or the mating line with --mate, or the best lines with --multipv N)
+if __name__ == "__main__":
+    import argparse, json, sys # not imported with the module, to keep the import light
+    parser = argparse.ArgumentParser(description="Headless PinPawn engine: search one position.")
+    parser.add_argument("--fen", default=None, help="position (default: the start position)")
+    parser.add_argument("--moves", nargs="*", default=[], help="moves played from the position, e.g. e2e4 e7e5")
+    parser.add_argument("-d", "--depth", type=int, default=3, help="search depth (default: 3)")
+    parser.add_argument("-t", "--time-limit", type=float, default=None, help="search time in seconds")
+    parser.add_argument("--mate", action="store_true", help="search a forced mate instead")
+    parser.add_argument("--multipv", type=int, default=1, help="number of best lines to search (default: 1)")
+    args = parser.parse_args()
+    try:
+        engine = Engine()
+        engine.set_position(args.fen, args.moves)
+    except ValueError as e:
+        sys.exit(str(e))
+    info = {}
+    if args.mate:
+        line = engine.find_mate(time_limit=args.time_limit, info=info)
+        print(json.dumps({"mate": line, **info}))
+    elif args.multipv > 1:
+        lines = engine.analyse(args.multipv, args.depth, args.time_limit, info=info)
+        print(json.dumps({"lines": lines, **info}))
+    else:
+        move = engine.best_move(args.depth, args.time_limit, info=info)
+        print(json.dumps({"move": move, **info}))
@@ -0,0 +1,173 @@
+
+import argparse
+import json
+import shlex
+import sys
+import time
+from multiprocessing import Pool
+import ai
+from game import Game
+from pgn import san_to_move
+from utils import _c2n
+
+
+# EPD test suites: positions with known best moves ("bm") or moves to avoid ("am"), e.g.
+#   2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - bm Qg6; id "WAC.001";
+# every position is searched with iterative deepening, and the time-to-solution is the time of the iteration
+# after which the best move was a solution and stayed one until the end of the search
+# the solve rate at N seconds (fraction of the positions solved within N seconds) gives a curve that shows
+# search speed improvements better than raw nodes per second, and runs saved as JSON can be compared
+
+
+# function to parse an EPD line, returns a dict with the FEN (with move counters) and the operations
+# (lists of operands, quotes removed), e.g. {"fen": "...", "bm": ["Qg6"], "id": ["WAC.001"]}
+# raises ValueError if the line is malformed
+def parse_epd(line):
+    fields = line.strip().split(None, 4)
+    if len(fields) < 4:
+        raise ValueError(f"Invalid EPD line '{line.strip()}'")
+    entry = {"fen": " ".join(fields[:4]) + " 0 1"}
+    if len(fields) == 5:
+        for operation in fields[4].split(";"):
+            tokens = shlex.split(operation)
+            if tokens:
+                entry[tokens[0]] = tokens[1:]
+    Game().load_fen(entry["fen"]) # validate the position
+    return entry
+
+
+# generator that reads the entries of an EPD file from any iterable of lines, skipping blank lines and comments
+def read_epd(lines):
+    for line in lines:
+        if line.strip() and not line.lstrip().startswith("#"):
+            yield parse_epd(line)
+
+
+# helper function to convert the SAN operands of an entry into (start_pos, end_pos) moves
+def _moves(game, sans):
+    return {san_to_move(game, san) for san in sans}
+
+
+# function to check if a move solves an entry: one of the "bm" moves, or any move but the "am" moves
+def is_solution(move, best_moves, avoid_moves):
+    if best_moves:
+        return move in best_moves
+    return move not in avoid_moves
+
+
+# function to search an entry, returns a record with the id, the move found, the solution flag, the
+# time-to-solution in seconds (None if unsolved), the completed depth, the nodes, the search time and the error
+# (an entry whose "bm"/"am" moves cannot be parsed, e.g. under-promotions, is not searched and counts as unsolved)
+def solve_position(entry, time_limit=None, depth=64):
+    game = Game()
+    game.load_fen(entry["fen"])
+    entry_id = " ".join(entry.get("id", [])) or entry["fen"]
+    try:
+        best_moves = _moves(game, entry.get("bm", []))
+        avoid_moves = _moves(game, entry.get("am", []))
+    except ValueError as e:
+        return {"id": entry_id, "move": None, "solved": False, "solution_time": None, "depth": 0, "nodes": 0,
+                "seconds": 0.0, "error": str(e)}
+    ai.TRANSPOSITION_TABLE.clear() # every position starts from an empty table
+    solved_at = [None]
+    def track(info):
+        if is_solution(info["pv"][0], best_moves, avoid_moves):
+            if solved_at[0] is None:
+                solved_at[0] = info["time"]
+        else:
+            solved_at[0] = None # changed its mind
+    start_time = time.perf_counter()
+    info = {}
+    move = ai.get_minimax_move(game, depth, time_limit, info=info, on_iteration=track)
+    seconds = time.perf_counter() - start_time
+    solved = move is not None and is_solution(move, best_moves, avoid_moves)
+    return {
+        "id": entry_id, "move": _c2n(*move[0]) + _c2n(*move[1]) if move else None,
+        "solved": solved, "solution_time": round(solved_at[0] if solved_at[0] is not None else seconds, 4) if solved else None,
+        "depth": info.get("depth", 0), "nodes": info.get("nodes", 0), "seconds": round(seconds, 4), "error": None,
+    }
+
+
+# helper function for the worker processes
+def _solve_job(job):
+    return solve_position(*job)
+
+
+# function to run a suite on a pool of worker processes, returns the records in suite order
+# (with several workers the positions compete for the CPU, so use at most one worker per core)
+def run_suite(entries, time_limit=None, depth=64, workers=None):
+    jobs = [(entry, time_limit, depth) for entry in entries]
+    if workers == 1:
+        return [_solve_job(job) for job in jobs]
+    with Pool(workers) as pool:
+        return list(pool.imap(_solve_job, jobs))
+
+
+# function to compute the solve rate curve, as (seconds, fraction of positions solved within that time) points
+def solve_curve(records, thresholds):
+    times = [r["solution_time"] for r in records if r["solution_time"] is not None]
+    total = len(records)
+    return [(t, sum(1 for s in times if s <= t) / total if total else 0.0) for t in thresholds]
+
+
+# helper function returning the default thresholds of the curve: a few points up to the time limit
+def _thresholds(time_limit):
+    points = [0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100]
+    if time_limit is None:
+        return points
+    return [t for t in points if t < time_limit] + [time_limit]
+
+
+# function to format the solve rate curves of several runs side by side, runs are (label, curve) tuples
+def format_curves(runs):
+    lines = [f"{'seconds':>9}" + "".join(f"{label:>14}" for label, _ in runs)]
+    for i, (seconds, _) in enumerate(runs[0][1]):
+        lines.append(f"{seconds:>9g}" + "".join(f"{curve[i][1]:>14.1%}" if i < len(curve) else f"{'':>14}"
+                                                for _, curve in runs))
+    return "\n".join(lines)
+
+
+# command line tool:
+#   python epd.py run suite.epd -t 2 -w 4 -o results.json --label after
+#   python epd.py compare before.json after.json
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run EPD test suites with the PinPawn search.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run a suite")
+    run.add_argument("epd", help="EPD file")
+    run.add_argument("-t", "--time-limit", type=float, default=None, help="seconds per position")
+    run.add_argument("-d", "--depth", type=int, default=None, help="maximum depth (default: 4 without time limit)")
+    run.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    run.add_argument("-o", "--output", default=None, help="JSON file for the results, to compare runs")
+    run.add_argument("--label", default=None, help="name of the run, e.g. a commit (default: the file name)")
+    compare = commands.add_parser("compare", help="compare the curves of saved runs")
+    compare.add_argument("results", nargs="+", help="JSON files written by run")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        depth = args.depth if args.depth is not None else (64 if args.time_limit is not None else 4)
+        with open(args.epd) as f:
+            entries = list(read_epd(f))
+        records = run_suite(entries, args.time_limit, depth, args.workers)
+        for record in records:
+            status = f"solved in {record['solution_time']}s" if record["solved"] else "not solved"
+            if record.get("error"):
+                status = f"unparsable: {record['error']}"
+            print(f"{record['id']:<20} {record['move'] or '-':<6} depth {record['depth']:<3} {status}", file=sys.stderr)
+        curve = solve_curve(records, _thresholds(args.time_limit))
+        label = args.label or args.epd
+        print(f"solved {sum(r['solved'] for r in records)}/{len(records)}")
+        print(format_curves([(label, curve)]))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump({"label": label, "time_limit": args.time_limit, "depth": depth, "records": records,
+                           "curve": curve}, f, indent=1)
+    else:
+        saved = []
+        for path in args.results:
+            with open(path) as f:
+                saved.append(json.load(f))
+        # the same thresholds for every run, up to the longest time limit
+        limits = [data["time_limit"] for data in saved]
+        thresholds = _thresholds(None if None in limits else max(limits))
+        print(format_curves([(data["label"], solve_curve(data["records"], thresholds)) for data in saved]))
@@ -0,0 +1,369 @@
+
+import argparse
+import json
+import random
+import sys
+import time
+from multiprocessing import Pool
+from game import Game, WHITE, BLACK
+from piece import Piece
+from pawns import pawn_structure
+from utils import _c2n
+import ai
+import zobrist
+
+
+# differential fuzzer: the fast paths of the engine against the reference rules implementation
+# the reference is the readable code every fast path was derived from: is_move_legal / find_all_legal_moves
+# (move generation), is_square_attacked (attack detection), score_board (evaluation) and the from-scratch hashes
+# of zobrist.py; random playouts are played from edge-case and random positions, and at every ply the fast paths
+# are compared with the reference:
+#   eval:     incremental evaluation (ai.evaluate) vs score_board
+#   zobrist:  incremental Zobrist key vs zobrist.hash_game
+#   pawns:    incremental pawn key vs zobrist.hash_pawns, pawn table vs pawn_structure
+#   captures: find_all_legal_captures vs the captures of find_all_legal_moves
+#   attacks:  find_attackers vs is_square_attacked, on both kings
+#   fen:      get_fen / load_fen round trip (board, rights, evaluation terms)
+#   undo:     make_move + undo_move vs the state before the move
+#   history:  halfmove clock and repetition counts vs a replay of the reference hashes
+# playouts run in parallel worker processes, and every mismatch is shrunk to a minimal move sequence that still
+# reproduces it from the same start position
+
+CHECKS = ["eval", "zobrist", "pawns", "captures", "attacks", "fen", "undo", "history"]
+
+# start positions with en passant, castling (through attacked squares too) and promotion edge cases
+EDGE_CASE_FENS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/pppq1ppp/8/3pP3/8/8/PPPQ1PPP/R3K2R w KQkq d6 0 1", # en passant and castling on both sides
+    "r3k2r/8/8/8/2b2B2/8/8/R3K2R w KQkq - 0 1", # castling squares attacked by bishops
+    "r3k2r/1P6/8/8/8/8/1p6/R3K2R w KQkq - 0 1", # promotions that capture rooks with castling rights
+    "8/8/8/K2pP2r/8/8/8/7k w - d6 0 1", # en passant capture exposing the king along the rank
+    "4k3/8/8/2pPp3/8/8/8/4K3 w - e6 0 1", # two pawns next to the en passant pawn
+    "8/1P4k1/8/8/8/8/6p1/K7 w - - 0 1", # promotions on both sides
+    "1r5k/P7/8/8/8/8/7p/K5R1 w - - 0 1", # promotion by capture
+    "4k3/8/8/8/8/8/4p3/R3K2R b KQ - 0 1", # promotion with check, castling out of check
+]
+# share of the playouts that start from a random position instead of an edge-case position
+RANDOM_POSITION_RATE = 0.5
+# probability of playing a special move (castling, en passant, promotion, double pawn push) when there is one
+SPECIAL_MOVE_RATE = 0.5
+# number of playouts sent to a worker process at once
+BATCH_SIZE = 20
+
+
+# Playout class that plays moves on a game and compares the fast paths with the reference after every move
+# check() and push() return None, or a (check name, detail) pair for the first mismatch found
+
+class Playout:
+
+    def __init__(self, fen, checks=CHECKS):
+        self.fen = fen
+        self.checks = checks
+        self.game = Game()
+        self.game.load_fen(fen)
+        self.moves = []
+        # reference draw history: hashes of the positions since the last capture or pawn move
+        self.history = [zobrist.hash_game(self.game)]
+        self.halfmove_clock = self.game.halfmove_clock
+
+    # compare the fast paths on the current position, legal_moves are the reference legal moves
+    def check(self, legal_moves):
+        game = self.game
+        if "eval" in self.checks:
+            fast, reference = ai.evaluate(game), ai.score_board(game.board)
+            if fast != reference:
+                return "eval", f"evaluate {fast} != score_board {reference}"
+        if "zobrist" in self.checks:
+            reference = zobrist.hash_game(game)
+            if game.zobrist_key != reference:
+                return "zobrist", f"zobrist_key {game.zobrist_key:x} != hash_game {reference:x}"
+        if "pawns" in self.checks:
+            reference = zobrist.hash_pawns(game.board)
+            if game.pawn_key != reference:
+                return "pawns", f"pawn_key {game.pawn_key:x} != hash_pawns {reference:x}"
+            fast, reference = ai.PAWN_TABLE.probe(game.pawn_key, game.board), pawn_structure(game.board)
+            if fast != reference:
+                return "pawns", f"pawn table {fast} != pawn_structure {reference}"
+        if "captures" in self.checks:
+            fast = sorted(game.find_all_legal_captures(game.curr_player))
+            reference = sorted(move for move in legal_moves if self._is_capture(move))
+            if fast != reference:
+                return "captures", f"find_all_legal_captures {_format_moves(fast)} != {_format_moves(reference)}"
+        if "attacks" in self.checks:
+            for color, opponent in ((WHITE, BLACK), (BLACK, WHITE)):
+                king_pos = game.board.find_king(color)
+                if king_pos is None:
+                    continue
+                fast, reference = bool(game.find_attackers(king_pos, opponent)), game.is_square_attacked(king_pos, opponent)
+                if fast != reference:
+                    return "attacks", f"find_attackers {fast} != is_square_attacked {reference} on {_c2n(*king_pos)}"
+        if "fen" in self.checks:
+            clone = Game()
+            clone.load_fen(game.get_fen())
+            fast = (game.get_fen(), game.eval_mg, game.eval_eg, game.phase, game.pawn_key)
+            reference = (clone.get_fen(), clone.eval_mg, clone.eval_eg, clone.phase, clone.pawn_key)
+            if fast != reference:
+                return "fen", f"{fast} != reloaded {reference}"
+        return None
+
+    # play a move (r1, c1, r2, c2), taking it back once first to compare the undone state with the state before
+    def push(self, move):
+        game = self.game
+        start_pos, end_pos = (move[0], move[1]), (move[2], move[3])
+        irreversible = self._is_capture(move) or game.board.board[move[0]][move[1]].type == "pawn"
+        if "undo" in self.checks:
+            before = _snapshot(game)
+            game.make_move(start_pos, end_pos)
+            game.undo_move()
+            after = _snapshot(game)
+            if after != before:
+                self.moves.append(move)
+                field = next(name for name, a, b in zip(SNAPSHOT_FIELDS, before, after) if a != b)
+                return "undo", f"undo_move restored {field} wrongly"
+        game.make_move(start_pos, end_pos)
+        self.moves.append(move)
+        if irreversible:
+            self.history = []
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        self.history.append(zobrist.hash_game(game))
+        if "history" in self.checks:
+            reference = self.history.count(self.history[-1])
+            if game.repetition_count() != reference:
+                return "history", f"repetition_count {game.repetition_count()} != {reference}"
+            if game.halfmove_clock != self.halfmove_clock:
+                return "history", f"halfmove_clock {game.halfmove_clock} != {self.halfmove_clock}"
+        return None
+
+    # a capture takes a piece on the destination square, or is a pawn taking en passant
+    def _is_capture(self, move):
+        board = self.game.board.board
+        if board[move[2]][move[3]] is not None:
+            return True
+        return board[move[0]][move[1]].type == "pawn" and move[1] != move[3]
+
+    # castling, en passant, promotion and double pawn push
+    def is_special(self, move):
+        piece = self.game.board.board[move[0]][move[1]]
+        if piece.type == "king":
+            return abs(move[3] - move[1]) == 2
+        if piece.type == "pawn":
+            return move[2] in (0, 7) or abs(move[2] - move[0]) == 2 or (move[2], move[3]) == self.game.en_passant_target_square
+        return False
+
+
+# names of the fields of a snapshot, to report which one undo_move got wrong
+SNAPSHOT_FIELDS = ["board", "side to move", "castling flags", "en passant square", "evaluation terms",
+                   "zobrist key", "halfmove clock", "repetitions", "undo stack"]
+
+
+# helper function to capture the whole state of a game as comparable values
+def _snapshot(game):
+    board = tuple((piece.color, piece.type) if piece is not None else None for row in game.board.board for piece in row)
+    flags = tuple(tuple(sorted(game.has_moved[color].items())) for color in (WHITE, BLACK))
+    return (board, (game.curr_player, game.curr_opponent), flags, game.en_passant_target_square,
+            (game.eval_mg, game.eval_eg, game.phase, game.pawn_key), game.zobrist_key, game.halfmove_clock,
+            dict(game.repetitions), len(game.undo_stack))
+
+
+# helper function to convert moves (r1, c1, r2, c2) to coordinate strings
+def _format_moves(moves):
+    return [_c2n(move[0], move[1]) + _c2n(move[2], move[3]) for move in moves]
+
+
+# function to generate a random legal position as a FEN string: both kings, up to max_pieces other pieces (no
+# pawns on the first and last ranks), castling rights where the king and rook stand on their squares, and an en
+# passant square where a pawn could just have made a double step; the side not to move is never in check
+def random_fen(rng, max_pieces=12):
+    while True:
+        game = Game()
+        board = [[None for _ in range(8)] for _ in range(8)]
+        squares = rng.sample(range(64), 2 + max_pieces)
+        white_king, black_king = divmod(squares[0], 8), divmod(squares[1], 8)
+        if abs(white_king[0] - black_king[0]) <= 1 and abs(white_king[1] - black_king[1]) <= 1:
+            continue
+        board[white_king[0]][white_king[1]] = Piece(WHITE, "king")
+        board[black_king[0]][black_king[1]] = Piece(BLACK, "king")
+        for square in squares[2:2 + rng.randint(0, max_pieces)]:
+            r, c = divmod(square, 8)
+            piece_type = rng.choice(["pawn", "pawn", "pawn", "knight", "bishop", "rook", "queen"])
+            if piece_type == "pawn" and r in (0, 7):
+                continue
+            board[r][c] = Piece(rng.choice([WHITE, BLACK]), piece_type)
+        game.board.board = board
+        game.curr_player = rng.choice([WHITE, BLACK])
+        game.curr_opponent = BLACK if game.curr_player == WHITE else WHITE
+        for color, row in ((WHITE, 0), (BLACK, 7)):
+            king = board[row][4]
+            home = king is not None and king.type == "king" and king.color == color
+            for flag, col in (("rook_a", 0), ("rook_h", 7)):
+                rook = board[row][col]
+                game.has_moved[color][flag] = not (home and rook is not None and rook.type == "rook"
+                                                   and rook.color == color and rng.random() < 0.8)
+            game.has_moved[color]["king"] = game.has_moved[color]["rook_a"] and game.has_moved[color]["rook_h"]
+        # en passant: a pawn of the side not to move on its fourth rank, with the two squares behind it empty
+        pawn_row, direction = (4, 1) if game.curr_player == WHITE else (3, -1)
+        candidates = [c for c in range(8) if board[pawn_row][c] is not None and board[pawn_row][c].type == "pawn"
+                      and board[pawn_row][c].color == game.curr_opponent
+                      and board[pawn_row + direction][c] is None and board[pawn_row + 2 * direction][c] is None]
+        game.en_passant_target_square = (pawn_row + direction, rng.choice(candidates)) if candidates and rng.random() < 0.5 else None
+        game.refresh_eval()
+        if game.is_square_attacked(game.board.find_king(game.curr_opponent), game.curr_player):
+            continue
+        return game.get_fen()
+
+
+# function to play one random playout of at most max_plies plies from a FEN, comparing the fast paths with the
+# reference at every ply; returns (plies played, mismatch dict or None)
+def run_playout(fen, seed, max_plies=100, checks=CHECKS):
+    rng = random.Random(seed)
+    playout = Playout(fen, checks)
+    game = playout.game
+    for _ in range(max_plies + 1):
+        legal_moves = game.find_all_legal_moves(game.curr_player)
+        mismatch = playout.check(legal_moves)
+        if mismatch is None and legal_moves and len(playout.moves) < max_plies:
+            special = [move for move in legal_moves if playout.is_special(move)]
+            if special and rng.random() < SPECIAL_MOVE_RATE:
+                move = rng.choice(special)
+            else:
+                move = rng.choice(legal_moves)
+            mismatch = playout.push(move)
+        if mismatch is not None:
+            check, detail = mismatch
+            return len(playout.moves), {"check": check, "detail": detail, "fen": fen, "moves": list(playout.moves)}
+        if not legal_moves or len(playout.moves) >= max_plies:
+            break
+    return len(playout.moves), None
+
+
+# function to replay a move sequence from a FEN with the reference legality check, comparing the fast paths at
+# every ply; returns the first mismatch as a (check, detail, plies) tuple, or None (also when a move is illegal)
+def replay(fen, moves, checks=CHECKS):
+    playout = Playout(fen, checks)
+    game = playout.game
+    for i in range(len(moves) + 1):
+        legal_moves = game.find_all_legal_moves(game.curr_player) if "captures" in checks else []
+        mismatch = playout.check(legal_moves)
+        if mismatch is None and i < len(moves):
+            move = moves[i]
+            is_legal, _ = game.is_move_legal((move[0], move[1]), (move[2], move[3]), game.curr_player)
+            if not is_legal:
+                return None
+            mismatch = playout.push(move)
+        if mismatch is not None:
+            return mismatch[0], mismatch[1], len(playout.moves)
+    return None
+
+
+# function to shrink a mismatch: moves are removed (in chunks, then by pairs of a move and its reply, then one by
+# one) as long as the remaining sequence is legal and still shows a mismatch of the same check, and it is cut
+# after the ply where the mismatch appears
+# returns the minimal move sequence and the detail of its mismatch
+def shrink(fen, moves, check):
+    result = replay(fen, moves, [check])
+    if result is None:
+        return list(moves), None # not reproducible (e.g. depends on the state of the pawn table)
+    moves = list(moves[:result[2]])
+    detail = result[1]
+    chunk = max(2, len(moves) // 2)
+    while True:
+        removed = False
+        i = 0
+        while i < len(moves):
+            candidate = moves[:i] + moves[i + chunk:]
+            result = replay(fen, candidate, [check])
+            if result is not None and result[0] == check:
+                moves, detail = candidate[:result[2]], result[1]
+                removed = True
+            else:
+                i += chunk if chunk > 2 else 1 # pairs and single moves are tried at every ply
+        if removed:
+            continue
+        if chunk == 1:
+            break
+        chunk = 1 if chunk == 2 else max(2, chunk // 2)
+    return moves, detail
+
+
+# helper function run by the worker processes: play a batch of playouts, returns (playouts, plies, mismatches)
+def _run_batch(job):
+    seed, first, count, max_plies, checks = job
+    plies = 0
+    mismatches = []
+    for index in range(first, first + count):
+        rng = random.Random(seed * 1000003 + index)
+        if rng.random() < RANDOM_POSITION_RATE:
+            fen = random_fen(rng)
+        else:
+            fen = rng.choice(EDGE_CASE_FENS)
+        played, mismatch = run_playout(fen, rng.getrandbits(32), max_plies, checks)
+        plies += played
+        if mismatch is not None:
+            mismatch["playout"] = index
+            mismatches.append(mismatch)
+    return count, plies, mismatches
+
+
+# function to run num_playouts playouts on worker processes (in this process if workers is 1), then shrink the
+# mismatches; on_batch is called with the playouts and plies done so far after every batch
+# returns a summary dict: playouts, plies, time (seconds) and the list of shrunk mismatches
+def run_fuzz(num_playouts, workers=None, seed=0, max_plies=100, checks=CHECKS, on_batch=None):
+    jobs = [(seed, first, min(BATCH_SIZE, num_playouts - first), max_plies, checks)
+            for first in range(0, num_playouts, BATCH_SIZE)]
+    start_time = time.perf_counter()
+    playouts = plies = 0
+    mismatches = []
+    def collect(result):
+        nonlocal playouts, plies
+        playouts += result[0]
+        plies += result[1]
+        mismatches.extend(result[2])
+        if on_batch is not None:
+            on_batch(playouts, plies)
+    if workers == 1:
+        for job in jobs:
+            collect(_run_batch(job))
+    else:
+        with Pool(workers) as pool:
+            for result in pool.imap_unordered(_run_batch, jobs):
+                collect(result)
+    elapsed = time.perf_counter() - start_time
+    for mismatch in mismatches:
+        shrunk, detail = shrink(mismatch["fen"], mismatch["moves"], mismatch["check"])
+        mismatch["plies"] = len(mismatch["moves"])
+        mismatch["moves"] = _format_moves(shrunk)
+        if detail is not None:
+            mismatch["detail"] = detail
+    mismatches.sort(key=lambda mismatch: (mismatch["check"], len(mismatch["moves"])))
+    return {"playouts": playouts, "plies": plies, "time": elapsed, "mismatches": mismatches}
+
+
+# command line tool, e.g. python fuzz.py -n 10000 -w 8 --checks eval zobrist undo
+# exits with status 1 if a mismatch was found
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Differential fuzzing of the PinPawn fast paths against the reference rules.")
+    parser.add_argument("-n", "--playouts", type=int, default=1000, help="number of random playouts (default: 1000)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("-p", "--plies", type=int, default=100, help="maximum plies per playout (default: 100)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed, playouts are reproducible from it")
+    parser.add_argument("--checks", nargs="+", choices=CHECKS, default=CHECKS, help="checks to run (default: all)")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+    def progress(playouts, plies):
+        if not args.json:
+            print(f"\r{playouts}/{args.playouts} playouts, {plies} plies", end="", file=sys.stderr, flush=True)
+    summary = run_fuzz(args.playouts, args.workers, args.seed, args.plies, args.checks, progress)
+    if args.json:
+        print(json.dumps(summary))
+    else:
+        print(file=sys.stderr)
+        rate = summary["plies"] / summary["time"] if summary["time"] > 0 else 0
+        print(f"{summary['playouts']} playouts, {summary['plies']} plies in {summary['time']:.1f}s ({rate:.0f} plies/s)")
+        for mismatch in summary["mismatches"]:
+            print(f"{mismatch['check']}: {mismatch['detail']}\n  position {mismatch['fen']}\n"
+                  f"  moves {' '.join(mismatch['moves']) or '(none)'} (shrunk from {mismatch['plies']} plies)")
+        if not summary["mismatches"]:
+            print("no mismatch")
+    sys.exit(1 if summary["mismatches"] else 0)
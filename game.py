@@ -2,6 +2,8 @@
 import utils
 from piece import Piece, WHITE, BLACK
 from board import Board
+from pst import MG_VALUES, EG_VALUES, PHASE_WEIGHTS
+from zobrist import PIECE_KEYS, hash_state
 
 
 
@@ -23,6 +25,147 @@ class Game:
         }
         # state initialization for en passant
         self.en_passant_target_square = None
+        # evaluation terms and position hash, kept up to date by make_move (see refresh_eval)
+        self.refresh_eval()
+        # draw rules and move history (see make_move and undo_move)
+        self.reset_history()
+
+
+    FEN_PIECES = {"p": "pawn", "n": "knight", "b": "bishop", "r": "rook", "q": "queen", "k": "king"}
+
+    # set up the game from a FEN string (piece placement, side to move, castling rights, en passant square and
+    # halfmove clock), raises ValueError for malformed strings, the fullmove number is accepted but ignored
+    def load_fen(self, fen):
+        fields = fen.split()
+        if len(fields) < 4:
+            raise ValueError(f"Invalid FEN '{fen}'")
+        ranks = fields[0].split("/")
+        if len(ranks) != 8:
+            raise ValueError(f"Invalid FEN piece placement '{fields[0]}'")
+        board = [[None for _ in range(8)] for _ in range(8)]
+        for i, rank in enumerate(ranks):
+            row = 7 - i # FEN starts from rank 8
+            col = 0
+            for char in rank:
+                if char.isdigit():
+                    col += int(char)
+                elif char.lower() in self.FEN_PIECES and col < 8:
+                    color = WHITE if char.isupper() else BLACK
+                    board[row][col] = Piece(color, self.FEN_PIECES[char.lower()])
+                    col += 1
+                else:
+                    raise ValueError(f"Invalid FEN piece placement '{fields[0]}'")
+            if col != 8:
+                raise ValueError(f"Invalid FEN piece placement '{fields[0]}'")
+        if fields[1] not in ("w", "b"):
+            raise ValueError(f"Invalid FEN side to move '{fields[1]}'")
+        self.board.board = board
+        self.curr_player = WHITE if fields[1] == "w" else BLACK
+        self.curr_opponent = BLACK if self.curr_player == WHITE else WHITE
+        # castling rights are stored as "has moved" flags
+        castling = fields[2]
+        for color, kingside, queenside in ((WHITE, "K", "Q"), (BLACK, "k", "q")):
+            self.has_moved[color]['rook_h'] = kingside not in castling
+            self.has_moved[color]['rook_a'] = queenside not in castling
+            self.has_moved[color]['king'] = kingside not in castling and queenside not in castling
+        self.en_passant_target_square = None if fields[3] == "-" else utils._n2c(fields[3])
+        self.refresh_eval()
+        self.reset_history(int(fields[4]) if len(fields) > 4 and fields[4].isdigit() else 0)
+
+
+    # recompute the evaluation terms from the whole board: the midgame and endgame sums of material and
+    # piece-square values (positive = white advantage), the game phase counted from the material, the pawn
+    # key (Zobrist hash of the pawns only, to look up the pawn structure evaluation) and the Zobrist hash of the
+    # position (same as zobrist.hash_game)
+    # make_move keeps them up to date incrementally, so this is only needed after editing board squares directly
+    def refresh_eval(self):
+        self.eval_mg = 0
+        self.eval_eg = 0
+        self.phase = 0
+        self.pawn_key = 0
+        self.zobrist_key = hash_state(self)
+        for r in range(8):
+            for c in range(8):
+                piece = self.board.board[r][c]
+                if piece is not None:
+                    self._eval_add(piece, (r, c))
+
+
+    # start the move history from the current position: no move to undo, and the halfmove clock (moves since
+    # the last capture or pawn move, for the fifty-move rule) and position counts (for repetitions) start over
+    def reset_history(self, halfmove_clock=0):
+        self.halfmove_clock = halfmove_clock
+        self.undo_stack = []
+        # number of times every position (by hash) occurred since the last irreversible move
+        self.repetitions = {self.zobrist_key: 1}
+
+
+    # number of times the current position occurred since the last capture or pawn move, itself included
+    def repetition_count(self):
+        return self.repetitions.get(self.zobrist_key, 0)
+
+
+    # function returning the reason why the game is drawn by rule ("threefold repetition" or "fifty-move rule"),
+    # or None (checkmate and stalemate are detected from the legal moves)
+    def draw_reason(self):
+        if self.repetition_count() >= 3:
+            return "threefold repetition"
+        if self.halfmove_clock >= 100:
+            return "fifty-move rule"
+        return None
+
+
+    # helper functions to update the evaluation terms when a piece is put on or taken off a square
+    def _eval_add(self, piece, pos):
+        key = (piece.color, piece.type)
+        idx = pos[0] * 8 + pos[1]
+        self.eval_mg += MG_VALUES[key][idx]
+        self.eval_eg += EG_VALUES[key][idx]
+        self.phase += PHASE_WEIGHTS[piece.type]
+        self.zobrist_key ^= PIECE_KEYS[key][idx]
+        if piece.type == "pawn":
+            self.pawn_key ^= PIECE_KEYS[key][idx]
+
+    def _eval_remove(self, piece, pos):
+        key = (piece.color, piece.type)
+        idx = pos[0] * 8 + pos[1]
+        self.eval_mg -= MG_VALUES[key][idx]
+        self.eval_eg -= EG_VALUES[key][idx]
+        self.phase -= PHASE_WEIGHTS[piece.type]
+        self.zobrist_key ^= PIECE_KEYS[key][idx]
+        if piece.type == "pawn":
+            self.pawn_key ^= PIECE_KEYS[key][idx]
+
+
+    # export the game state as a FEN string (the move counters are always "0 1")
+    def get_fen(self):
+        ranks = []
+        for row in range(7, -1, -1):
+            rank = ""
+            empty = 0
+            for col in range(8):
+                piece = self.board.board[row][col]
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                letter = "n" if piece.type == "knight" else piece.type[0]
+                rank += letter.upper() if piece.color == WHITE else letter
+            if empty:
+                rank += str(empty)
+            ranks.append(rank)
+        castling = ""
+        for color, kingside, queenside in ((WHITE, "K", "Q"), (BLACK, "k", "q")):
+            if not self.has_moved[color]['king']:
+                if not self.has_moved[color]['rook_h']:
+                    castling += kingside
+                if not self.has_moved[color]['rook_a']:
+                    castling += queenside
+        en_passant = "-" if self.en_passant_target_square is None else utils._c2n(*self.en_passant_target_square)
+        side = "w" if self.curr_player == WHITE else "b"
+        return f"{'/'.join(ranks)} {side} {castling or '-'} {en_passant} 0 1"
     
 
     # helper function to check if all the conditions for castling apply
@@ -73,6 +216,17 @@ class Game:
     # to be called by the play loop AFTER validity check
     def make_move(self, start_pos, end_pos):
         moved_piece = self.board.board[start_pos[0]][start_pos[1]]
+        captured_piece = self.board.board[end_pos[0]][end_pos[1]]
+        # everything undo_move needs to restore the current state
+        undo = [start_pos, end_pos, moved_piece, captured_piece, None, None, self.has_moved[self.curr_player].copy(),
+                self.en_passant_target_square, self.eval_mg, self.eval_eg, self.phase, self.pawn_key,
+                self.zobrist_key, self.halfmove_clock, None]
+        self.zobrist_key ^= hash_state(self) # castling rights, en passant and side to move are hashed again below
+
+        # update the evaluation terms: the moved piece leaves its square, a captured piece leaves the board
+        self._eval_remove(moved_piece, start_pos)
+        if captured_piece is not None:
+            self._eval_remove(captured_piece, end_pos)
         
         # make the move
         if moved_piece.type == "king" and abs(end_pos[1] - start_pos[1]) == 2:
@@ -85,13 +239,22 @@ class Game:
                 rook_start_pos = (start_pos[0], 0)
                 rook_end_pos = (start_pos[0], 3)
             self.board.move_piece(rook_start_pos, rook_end_pos) # move the rook
+            rook = self.board.board[rook_end_pos[0]][rook_end_pos[1]]
+            if rook is not None:
+                self._eval_remove(rook, rook_start_pos)
+                self._eval_add(rook, rook_end_pos)
+            undo[5] = (rook_start_pos, rook_end_pos)
         elif moved_piece.type == 'pawn' and end_pos == self.en_passant_target_square and self.board.board[end_pos[0]][end_pos[1]] is None:
             # en passant move, handle manually
             self.board.move_piece(start_pos, end_pos) # move attacking pawn
             # remove captured pawn
             direction = -1 if self.curr_player == WHITE else 1
             captured_pawn_pos = (end_pos[0] + direction, end_pos[1])
+            captured_pawn = self.board.board[captured_pawn_pos[0]][captured_pawn_pos[1]]
+            if captured_pawn is not None:
+                self._eval_remove(captured_pawn, captured_pawn_pos)
             self.board.board[captured_pawn_pos[0]][captured_pawn_pos[1]] = None
+            undo[4] = (captured_pawn_pos, captured_pawn)
         else:
             # normal move, use move_piece function
             self.board.move_piece(start_pos, end_pos)
@@ -117,15 +280,58 @@ class Game:
         # TODO: add promotion choice and logic
         if moved_piece.type == "pawn" and (end_pos[0] == 0 or end_pos[0] == 7):
              self.board.board[end_pos[0]][end_pos[1]] = Piece(moved_piece.color, "queen")
+        self._eval_add(self.board.board[end_pos[0]][end_pos[1]], end_pos) # the moved (or promoted) piece arrives
 
         # switch players
         self.curr_player = BLACK if self.curr_player == WHITE else WHITE
         self.curr_opponent = BLACK if self.curr_player == WHITE else WHITE
+        self.zobrist_key ^= hash_state(self)
+
+        # draw rules: captures and pawn moves are irreversible, the positions before them cannot occur again
+        if moved_piece.type == "pawn" or captured_piece is not None:
+            self.halfmove_clock = 0
+            undo[14] = self.repetitions
+            self.repetitions = {}
+        else:
+            self.halfmove_clock += 1
+        self.repetitions[self.zobrist_key] = self.repetitions.get(self.zobrist_key, 0) + 1
+        self.undo_stack.append(undo)
+
+
+    # take back the last move made with make_move
+    def undo_move(self):
+        (start_pos, end_pos, moved_piece, captured_piece, en_passant_capture, rook_move, flags, en_passant_square,
+         self.eval_mg, self.eval_eg, self.phase, self.pawn_key, zobrist_key, self.halfmove_clock,
+         repetitions) = self.undo_stack.pop()
+        if repetitions is None:
+            count = self.repetitions[self.zobrist_key] - 1
+            if count:
+                self.repetitions[self.zobrist_key] = count
+            else:
+                del self.repetitions[self.zobrist_key]
+        else:
+            self.repetitions = repetitions # back to the counts before the irreversible move
+        self.zobrist_key = zobrist_key
+        self.curr_player, self.curr_opponent = self.curr_opponent, self.curr_player
+        # put the pieces back (the moved piece is still a pawn if it was promoted)
+        board = self.board.board
+        board[start_pos[0]][start_pos[1]] = moved_piece
+        board[end_pos[0]][end_pos[1]] = captured_piece
+        if rook_move is not None:
+            rook_start_pos, rook_end_pos = rook_move
+            board[rook_start_pos[0]][rook_start_pos[1]] = board[rook_end_pos[0]][rook_end_pos[1]]
+            board[rook_end_pos[0]][rook_end_pos[1]] = None
+        if en_passant_capture is not None:
+            captured_pawn_pos, captured_pawn = en_passant_capture
+            board[captured_pawn_pos[0]][captured_pawn_pos[1]] = captured_pawn
+        self.has_moved[self.curr_player] = flags
+        self.en_passant_target_square = en_passant_square
     
     
     
     # main game loop
     def play(self):
+        import profiler # imported here, profiler.py wraps the methods of this module
         while True:
 
             # display the board and set/reset flags
@@ -138,6 +344,9 @@ class Game:
                 move = input("Enter your move: ")
                 if move.lower() == 'exit':
                     break # quit shortcut
+                if move.lower() == 'mate':
+                    self.print_mate_hint()
+                    continue
                 if len(move) != 4:
                     print("Invalid input. Please use valid algebraic notation (e.g., 'e2e4').")
                     continue
@@ -146,55 +355,78 @@ class Game:
             except (ValueError, IndexError):
                 print("GENERAL ERROR: Invalid input.\n")
             
-            # check move validity
-            is_legal, error_msg = self.is_move_legal(start_pos, end_pos, self.curr_player)
-            if not is_legal:
-                print("\n" + error_msg)
-                continue
-            moved_piece = self.board.board[start_pos[0]][start_pos[1]]
-
-            # make the move
-            self.make_move(start_pos, end_pos)
-
-            # check for pawn promotion and handle it
-            ### CURRENTLY DISABLED AS THE make_move() FUNCTION HANDLES PROMOTION FOR THE GUI
-            if False:
-                if moved_piece.type == "pawn" and (end_pos[0] == 0 or end_pos[0] == 7):
-                    new_type = "_"
-                    while new_type not in ["Q", "R", "B", "K"]:
-                        new_type = input("Pick a piece for pawn promotion (Q,R,B,K): ")
-                        if new_type not in ["Q", "R", "B", "K"]:
-                            print("Invalid input, please try again.")
-                    # replace pawn in end position with new piece
-                    piece_ref = {"Q":"queen", "R":"rook", "B":"bishop", "K":"knight"}
-                    self.board.board[end_pos[0]][end_pos[1]] = Piece(self.curr_player, piece_ref[new_type])
-
-            # check for check
-            king_pos = self.board.find_king(self.curr_player)
-            if king_pos and self.is_square_attacked(king_pos, self.curr_opponent):
-                king_in_check = True # temporary flag
+            # check, make and judge the move, profiled as one unit of work when profiling is enabled
+            with profiler.measure("move"):
+                # check move validity
+                is_legal, error_msg = self.is_move_legal(start_pos, end_pos, self.curr_player)
+                if not is_legal:
+                    print("\n" + error_msg)
+                    continue
+                moved_piece = self.board.board[start_pos[0]][start_pos[1]]
+
+                # make the move
+                self.make_move(start_pos, end_pos)
+
+                # check for pawn promotion and handle it
+                ### CURRENTLY DISABLED AS THE make_move() FUNCTION HANDLES PROMOTION FOR THE GUI
+                if False:
+                    if moved_piece.type == "pawn" and (end_pos[0] == 0 or end_pos[0] == 7):
+                        new_type = "_"
+                        while new_type not in ["Q", "R", "B", "K"]:
+                            new_type = input("Pick a piece for pawn promotion (Q,R,B,K): ")
+                            if new_type not in ["Q", "R", "B", "K"]:
+                                print("Invalid input, please try again.")
+                        # replace pawn in end position with new piece
+                        piece_ref = {"Q":"queen", "R":"rook", "B":"bishop", "K":"knight"}
+                        self.board.board[end_pos[0]][end_pos[1]] = Piece(self.curr_player, piece_ref[new_type])
+
+                # check for check
+                king_pos = self.board.find_king(self.curr_player)
+                if king_pos and self.is_square_attacked(king_pos, self.curr_opponent):
+                    king_in_check = True # temporary flag
             
-            # check for checkmate or stalemate
-            moves = self.find_all_legal_moves(self.curr_player) # moves for the player who has to move now
-            print(f"{self.curr_player} has {len(moves)} legal move{'s' if len(moves) != 1 else ''} available") # feedback print
-            if not moves:
-                self.board.display() # display final board state
-                # no legal moves and king in check -> checkmate
-                if king_in_check:
-                    print(f"\n{self.curr_player} is in checkmate! {self.curr_opponent} is the winner!\n")
-                    break
-                # no legal moves and king not in check -> stalemate
-                else:
-                    print(f"\nStalemate! It's a draw.\n")
-                    break
+                # check for checkmate or stalemate
+                moves = self.find_all_legal_moves(self.curr_player) # moves for the player who has to move now
+                print(f"{self.curr_player} has {len(moves)} legal move{'s' if len(moves) != 1 else ''} available") # feedback print
+                if not moves:
+                    self.board.display() # display final board state
+                    # no legal moves and king in check -> checkmate
+                    if king_in_check:
+                        print(f"\n{self.curr_player} is in checkmate! {self.curr_opponent} is the winner!\n")
+                        break
+                    # no legal moves and king not in check -> stalemate
+                    else:
+                        print(f"\nStalemate! It's a draw.\n")
+                        break
             
-            # no checkmate nor stalemate -> announce eventual check
-            if king_in_check:
-                print(f"\n{self.curr_player} is in check.")
+                # draw by threefold repetition or by the fifty-move rule
+                draw_reason = self.draw_reason()
+                if draw_reason is not None:
+                    self.board.display() # display final board state
+                    print(f"\nDraw by {draw_reason}.\n")
+                    break
+
+                # no checkmate nor stalemate -> announce eventual check
+                if king_in_check:
+                    print(f"\n{self.curr_player} is in check.")
             
 
     
 
+    # function to print a forced mate for the current player, if the mate search finds one (the 'mate' command)
+    def print_mate_hint(self):
+        from mate import find_mate # imported here, mate.py depends on the search which depends on this module
+        info = {}
+        line = find_mate(self, time_limit=2.0, info=info)
+        if line:
+            moves = " ".join(utils._c2n(*start) + utils._c2n(*end) for start, end in line)
+            print(f"\nMate in {(len(line) + 1) // 2}: {moves}\n")
+        elif info["result"] == "no mate":
+            print("\nNo forced mate by checks.\n")
+        else:
+            print("\nNo mate found in time.\n")
+
+
     # general function to check if a move is legal for a player
     def is_move_legal(self, start_pos, end_pos, player):
 
@@ -323,6 +555,48 @@ class Game:
         return False # no attack detected
 
 
+    # list the positions of all the pieces of a specific color attacking a square
+    # same logic as is_square_attacked, but collects every attacker instead of stopping at the first one
+    def find_attackers(self, position, attacking_color):
+        attackers = []
+        dest_piece = self.board.board[position[0]][position[1]]
+        for r in range(8):
+            for c in range(8):
+                piece = self.board.board[r][c]
+                if piece is not None and piece.color == attacking_color and (r, c) != position:
+                    if self.is_piece_move_legal(piece, (r, c), position, dest_piece, is_attack_check=True):
+                        # check path for sliding pieces
+                        if piece.type not in ["rook", "bishop", "queen"] or self.board.is_path_clear((r, c), position):
+                            attackers.append((r, c))
+        return attackers
+
+
+    # lists all the legal captures (including en passant) for a player
+    # only the squares occupied by enemy pieces are tried as destinations, so this is much cheaper than
+    # filtering the output of find_all_legal_moves
+    def find_all_legal_captures(self, player):
+        targets = []
+        for r in range(8):
+            for c in range(8):
+                piece = self.board.board[r][c]
+                if piece is not None and piece.color != player:
+                    targets.append((r, c))
+        if self.en_passant_target_square is not None:
+            targets.append(self.en_passant_target_square)
+        moves = []
+        for r in range(8):
+            for c in range(8):
+                piece = self.board.board[r][c]
+                if piece is not None and piece.color == player:
+                    for end_pos in targets:
+                        if end_pos == self.en_passant_target_square and piece.type != "pawn":
+                            continue # only pawns capture on the en passant square
+                        legal_flag, _ = self.is_move_legal((r, c), end_pos, player)
+                        if legal_flag:
+                            moves.append((r, c, end_pos[0], end_pos[1]))
+        return moves
+
+
     # lists all the legal moves for a player
     def find_all_legal_moves(self, player):
         moves = []
@@ -0,0 +1,88 @@
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # headless: no window is opened
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import argparse
+import json
+import random
+import time
+import pygame
+import main_gui
+from game import Game
+
+
+# frame-time benchmark of the pygame GUI, runnable without a display (SDL dummy video driver)
+# a random game is played on the board (one move every few frames, the other frames are idle) and the time of
+# every frame is measured in two modes:
+#   repaint: the previous game loop, i.e. game over check, all 64 squares and pieces drawn, display.flip
+#   dirty:   the current game loop, i.e. game over check after moves only, BoardRenderer, display.update(rects)
+# (the dummy driver does not copy pixels to a real window, so the gains on screen updates are underestimated)
+
+
+# function to run one mode, returns the frame times (seconds) of the frames after a move and of the idle frames
+def run_mode(screen, mode, frames, move_every, seed):
+    rng = random.Random(seed)
+    game = Game()
+    renderer = main_gui.BoardRenderer(screen)
+    move_times = []
+    idle_times = []
+    for frame in range(frames):
+        moved = False
+        if frame % move_every == move_every - 1:
+            moves = game.find_all_legal_moves(game.curr_player)
+            if not moves:
+                game = Game() # start a new game
+                moves = game.find_all_legal_moves(game.curr_player)
+            r1, c1, r2, c2 = rng.choice(moves)
+            game.make_move((r1, c1), (r2, c2))
+            moved = True
+        start_time = time.perf_counter()
+        if mode == "repaint":
+            game.find_all_legal_moves(game.curr_player)
+            main_gui.draw_game_state(screen, game, None)
+            pygame.display.flip()
+        else:
+            if moved:
+                game.find_all_legal_moves(game.curr_player)
+            pygame.display.update(renderer.render(game.board, None))
+        (move_times if moved else idle_times).append(time.perf_counter() - start_time)
+    return move_times, idle_times
+
+
+# function to run the benchmark, returns a dict of mode -> frame time summary (milliseconds)
+def run_benchmark(frames=300, move_every=15, seed=0):
+    pygame.init()
+    screen = pygame.display.set_mode((main_gui.WIDTH, main_gui.HEIGHT))
+    main_gui.load_graphics()
+    results = {}
+    for mode in ("repaint", "dirty"):
+        move_times, idle_times = run_mode(screen, mode, frames, move_every, seed)
+        all_times = move_times + idle_times
+        results[mode] = {
+            "mean_ms": round(1000 * sum(all_times) / len(all_times), 3),
+            "idle_ms": round(1000 * sum(idle_times) / len(idle_times), 3) if idle_times else 0.0,
+            "move_ms": round(1000 * sum(move_times) / len(move_times), 3) if move_times else 0.0,
+            "max_ms": round(1000 * max(all_times), 3),
+        }
+    pygame.quit()
+    return results
+
+
+# command line tool, e.g. python gui_benchmark.py --frames 600
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the frame time of the PinPawn GUI (headless).")
+    parser.add_argument("-f", "--frames", type=int, default=300, help="frames per mode (default: 300)")
+    parser.add_argument("-m", "--move-every", type=int, default=15, help="frames between moves (default: 15, "
+                                                                         "one move per second at the GUI frame rate)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the moves")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+    results = run_benchmark(args.frames, args.move_every, args.seed)
+    if args.json:
+        print(json.dumps(results))
+    else:
+        print(f"{'mode':<10}{'mean':>10}{'idle':>10}{'move':>10}{'max':>10}")
+        for mode, summary in results.items():
+            print(f"{mode:<10}" + "".join(f"{summary[field]:>8.3f}ms" for field in ("mean_ms", "idle_ms", "move_ms", "max_ms")))
+        if results["dirty"]["mean_ms"] > 0:
+            print(f"speedup: {results['repaint']['mean_ms'] / results['dirty']['mean_ms']:.1f}x")
@@ -0,0 +1,119 @@
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from game import Game, WHITE, BLACK
+from utils import _n2c, _c2n
+from server import GameServer, _percentile
+
+
+# load test for server.py: simulated clients connect, start games and play random legal moves as fast
+# as the engine answers; the client-side latency of every engine reply is measured and the server metrics
+# are fetched at the end
+# by default a server is started in this process, use --port to test a running one instead
+
+
+# function to play the games of one simulated client, returns the list of reply latencies (seconds)
+async def simulate_client(host, port, games, max_moves, depth, budget, rng):
+    reader, writer = await asyncio.open_connection(host, port)
+    latencies = []
+
+    async def send(line):
+        writer.write((line + "\n").encode())
+        await writer.drain()
+
+    async def receive():
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return line.decode().split()
+
+    for _ in range(games):
+        human = rng.choice([WHITE, BLACK])
+        await send(f"new {human} {depth} {budget}")
+        _, game_id, _ = await receive()
+        game = Game() # local copy of the game, to pick legal moves
+        over = False
+        if human == BLACK:
+            sent = time.perf_counter()
+            reply = await receive()
+            latencies.append(time.perf_counter() - sent)
+            game.make_move(_n2c(reply[2][0:2]), _n2c(reply[2][2:4]))
+        for _ in range(max_moves):
+            moves = game.find_all_legal_moves(game.curr_player)
+            if not moves:
+                break
+            r1, c1, r2, c2 = rng.choice(moves)
+            game.make_move((r1, c1), (r2, c2))
+            sent = time.perf_counter()
+            await send(f"move {game_id} {_c2n(r1, c1)}{_c2n(r2, c2)}")
+            reply = await receive()
+            if reply[0] == "over":
+                over = True
+                break
+            if reply[0] != "move":
+                raise RuntimeError(f"unexpected reply {' '.join(reply)}")
+            latencies.append(time.perf_counter() - sent)
+            game.make_move(_n2c(reply[2][0:2]), _n2c(reply[2][2:4]))
+            # the engine's move may end the game
+            if not game.find_all_legal_moves(game.curr_player) or game.draw_reason() is not None:
+                await receive() # "over" line
+                over = True
+                break
+        if not over:
+            await send(f"end {game_id}")
+            await receive()
+    await send("quit")
+    await receive()
+    writer.close()
+    return latencies
+
+
+# function to run the load test, returns (client latencies, server metrics, seconds)
+async def run_load_test(clients, games, max_moves, depth, budget, host="127.0.0.1", port=None, workers=2, seed=0):
+    server = listener = None
+    if port is None:
+        server = GameServer(workers)
+        listener = await server.start(host, 0)
+        port = listener.sockets[0].getsockname()[1]
+    try:
+        start_time = time.perf_counter()
+        results = await asyncio.gather(*[
+            simulate_client(host, port, games, max_moves, depth, budget, random.Random(seed + i)) for i in range(clients)
+        ])
+        seconds = time.perf_counter() - start_time
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(b"stats\nquit\n")
+        await writer.drain()
+        metrics = json.loads((await reader.readline()).decode().split(" ", 1)[1])
+        await reader.readline() # "bye"
+        writer.close()
+    finally:
+        if listener is not None:
+            listener.close()
+            await listener.wait_closed()
+            server.close()
+    return [latency for result in results for latency in result], metrics, seconds
+
+
+# command line tool, e.g. python loadtest.py --clients 20 --games 2 --moves 10 --workers 4
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the PinPawn game server.")
+    parser.add_argument("-c", "--clients", type=int, default=10, help="simulated clients (default: 10)")
+    parser.add_argument("-g", "--games", type=int, default=1, help="games per client (default: 1)")
+    parser.add_argument("-m", "--moves", type=int, default=10, help="moves per game and side (default: 10)")
+    parser.add_argument("-d", "--depth", type=int, default=2, help="engine depth (default: 2)")
+    parser.add_argument("-b", "--budget", type=float, default=10.0, help="engine seconds per game (default: 10)")
+    parser.add_argument("-w", "--workers", type=int, default=2, help="engine workers of the local server (default: 2)")
+    parser.add_argument("--port", type=int, default=None, help="port of a running server (default: start one)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the clients")
+    args = parser.parse_args()
+    latencies, metrics, seconds = asyncio.run(run_load_test(
+        args.clients, args.games, args.moves, args.depth, args.budget, port=args.port, workers=args.workers,
+        seed=args.seed))
+    print(f"{len(latencies)} engine replies in {seconds:.2f}s ({len(latencies) / seconds:.1f} moves/s)")
+    print(f"reply latency: p50 {_percentile(latencies, 50) * 1000:.0f} ms, p95 {_percentile(latencies, 95) * 1000:.0f} ms, "
+          f"max {max(latencies, default=0) * 1000:.0f} ms")
+    print("server: " + json.dumps(metrics))
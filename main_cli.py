@@ -1,7 +1,20 @@
 
+import argparse
+import profiler
 from game import *
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play PinPawn in the terminal.")
+    parser.add_argument("--profile", action="store_true", help="print where the engine spent its time (see profiler.py)")
+    parser.add_argument("--stacks", default=None, help="write the profiled call stacks to this file (collapsed format)")
+    args = parser.parse_args()
+    if args.profile or args.stacks:
+        profiler.enable(stacks_path=args.stacks)
+    else:
+        profiler.enable_from_env()
     g = Game()
-    g.play()
+    try:
+        g.play() # every move is measured by Game.play
+    finally:
+        profiler.disable()
@@ -1,7 +1,12 @@
 
-import pygame, sys, random
+import pygame, sys, os, random
 from game import Game, WHITE, BLACK
-from ai import get_random_move, get_minimax_move
+from ai import get_random_move, get_minimax_move, load_tablebases, MATE_SCORE
+from mate import find_mate
+from utils import _c2n
+from cache import AnalysisCache
+from book import OpeningBook
+import profiler
 
 
 
@@ -11,6 +16,16 @@ DIMENSION = 8 # chess board
 SQ_SIZE = WIDTH // DIMENSION # size of single square
 MAX_FPS = 15
 IMAGES = {}
+# optional persistent analysis cache, reused across sessions (e.g. PINPAWN_CACHE=analysis.db)
+CACHE_PATH = os.environ.get("PINPAWN_CACHE")
+# optional opening book built with book.py (e.g. PINPAWN_BOOK=book.bin)
+BOOK_PATH = os.environ.get("PINPAWN_BOOK")
+# optional directory of endgame tablebases built with tablebase.py (e.g. PINPAWN_TABLEBASES=tablebases)
+TABLEBASES_PATH = os.environ.get("PINPAWN_TABLEBASES")
+# seconds of mate search (proof-number search, see mate.py) before the normal search, from medium difficulty,
+# when the AI is attacking: its last search saw a mate, or its last move gave check
+MATE_SEARCH_TIME = 0.3
+# PINPAWN_PROFILE=1 prints a breakdown of the time of every AI move (see profiler.py)
 
 # GUI COLORS
 BG_COLOR = pygame.Color("white")
@@ -18,6 +33,16 @@ BTN_COLOR = pygame.Color("lightgray")
 BTN_HOVER = pygame.Color("darkgray")
 BTN_SELECTED = pygame.Color("yellow")
 TEXT_COLOR = pygame.Color("black")
+SQUARE_COLORS = [pygame.Color("white"), pygame.Color("gray")]
+HIGHLIGHT_COLOR = pygame.Color("yellow")
+END_TEXT_COLOR = pygame.Color("red")
+
+# image key letter of every piece type (e.g. 'wR' for a white rook)
+PIECE_LETTERS = {"pawn": "P", "rook": "R", "knight": "N", "bishop": "B", "queen": "Q", "king": "K"}
+
+# fonts and rendered texts, created once (SysFont searches the installed fonts, which is slow)
+FONTS = {}
+TEXTS = {}
 
 # DIFFICULTY
 DIFF_VERY_EASY = 0
@@ -35,7 +60,8 @@ def load_graphics():
         image_path = f"images/{piece}.png"
         try:
             image = pygame.image.load(image_path)
-            IMAGES[piece] = pygame.transform.scale(image, (SQ_SIZE, SQ_SIZE)) # icon size adjustment
+            # icon size adjustment, converted to the screen's pixel format once (much faster to blit)
+            IMAGES[piece] = pygame.transform.scale(image, (SQ_SIZE, SQ_SIZE)).convert_alpha()
         except FileNotFoundError:
             print(f"ERROR: Could not load image {image_path}")
 
@@ -55,8 +81,6 @@ def main():
 # function to display the main menu of the game
 def main_menu(screen):
     clock = pygame.time.Clock()
-    font_title = pygame.font.SysFont("Helvetica", 48, True, False)
-    font_sub = pygame.font.SysFont("Helvetica", 20)
 
     # buttons size and position parameters
     btn_w, btn_h = 120, 40
@@ -120,11 +144,11 @@ def main_menu(screen):
         # draw the menu
         screen.fill(BG_COLOR)
         # game title
-        title_surf = font_title.render("PinPawn", True, TEXT_COLOR)
+        title_surf = render_text("PinPawn", 48, True)
         title_rect = title_surf.get_rect(center=(WIDTH//2, 50))
         screen.blit(title_surf, title_rect)
         # subtitle
-        sub_surf = font_sub.render("Play as:", True, TEXT_COLOR)
+        sub_surf = render_text("Play as:", 20)
         screen.blit(sub_surf, (WIDTH//2 - sub_surf.get_width()//2, row1_y-30))
         # buttons row 1 (game mode)
         draw_button(screen, white_btn, "White", is_selected=(selected_option == WHITE), is_hovered=white_btn.collidepoint(mouse_pos))
@@ -133,7 +157,7 @@ def main_menu(screen):
         draw_button(screen, pvp_btn, "2 Players", is_selected=(selected_option == "PVP"), is_hovered=pvp_btn.collidepoint(mouse_pos))
         # buttons row 2 (difficulty)
         if selected_option != "PVP":
-            sub_diff = font_sub.render("Select AI difficulty:", True, TEXT_COLOR)
+            sub_diff = render_text("Select AI difficulty:", 20)
             screen.blit(sub_diff, (WIDTH//2 - sub_diff.get_width()//2, row2_y-30))
             draw_button(screen, diff0_btn, "Easiest", is_selected=(selected_difficulty == DIFF_VERY_EASY), is_hovered=diff0_btn.collidepoint(mouse_pos))
             draw_button(screen, diff1_btn, "Easy", is_selected=(selected_difficulty == DIFF_EASY), is_hovered=diff1_btn.collidepoint(mouse_pos))
@@ -154,6 +178,11 @@ def run_game(screen, player_color, difficulty):
     
     game = Game() # initialize game engine
     load_graphics() # load graphics
+    cache = AnalysisCache(CACHE_PATH) if CACHE_PATH else None
+    book = OpeningBook(BOOK_PATH) if BOOK_PATH else None
+    if TABLEBASES_PATH:
+        load_tablebases(TABLEBASES_PATH)
+    profiler.enable_from_env()
     
     # players configuration
     white_is_human = True
@@ -165,11 +194,14 @@ def run_game(screen, player_color, difficulty):
         white_is_human = False
     # if player_color == None, both are True (2 players mode)
 
+    renderer = BoardRenderer(screen) # redraws only the squares that changed
     running = True
+    position_changed = True # the game over check is only needed after a move
     game_over = False
     game_over_text = ""
     selected_square = None # tuple: (row, col)
     player_clicks = [] # tracks player clicks, e.g. [(6, 4), (4, 4)]
+    mate_expected = False # the AI is attacking, look for a forced mate before searching
     
     # game loop
     while running:
@@ -187,6 +219,19 @@ def run_game(screen, player_color, difficulty):
             # if user quits the game
             if event.type == pygame.QUIT:
                 running = False
+
+            # the window contents were lost (e.g. uncovered), repaint everything
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                renderer.invalidate()
+
+            # hint: press H to look for a forced mate for the side to move
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_h and not game_over and is_human_turn:
+                info = {}
+                mate_line = find_mate(game, time_limit=2 * MATE_SEARCH_TIME, info=info)
+                if mate_line:
+                    print(f"Hint: mate in {(len(mate_line) + 1) // 2}: " + " ".join(_c2n(*s) + _c2n(*e) for s, e in mate_line))
+                else:
+                    print("Hint: no forced mate by checks" if info["result"] == "no mate" else "Hint: no mate found in time")
             
             # handle mouse clicks only if turn is human)
             elif event.type == pygame.MOUSEBUTTONDOWN and not game_over and is_human_turn:
@@ -213,6 +258,7 @@ def run_game(screen, player_color, difficulty):
                     if is_legal:
                         # make the move
                         game.make_move(start_pos, end_pos)
+                        position_changed = True
                         print(f"Move made: {start_pos} -> {end_pos}") # console feedback
                         # reset clicks after valid move
                         selected_square = None
@@ -229,18 +275,33 @@ def run_game(screen, player_color, difficulty):
             if difficulty == DIFF_VERY_EASY:
                 ai_move = get_random_move(game)
             else:
-                ai_move = get_minimax_move(game, difficulty)
+                with profiler.measure("move"):
+                    # a forced mate is played without searching all the moves
+                    use_mate_search = difficulty >= DIFF_MEDIUM and mate_expected
+                    mate_line = find_mate(game, time_limit=MATE_SEARCH_TIME) if use_mate_search else None
+                    if mate_line:
+                        ai_move = mate_line[0]
+                    else:
+                        info = {}
+                        ai_move = get_minimax_move(game, difficulty, info=info, cache=cache, book=book)
+                        # score of the search from the AI's point of view
+                        ai_score = info.get("score", 0) if game.curr_player == WHITE else -info.get("score", 0)
+                        mate_expected = ai_score >= MATE_SCORE - 1000
             # make AI move
             if ai_move is None:
                 game_over = True # safety check
             else:
                 start_pos, end_pos = ai_move
                 game.make_move(start_pos, end_pos)
+                position_changed = True
+                if difficulty >= DIFF_MEDIUM:
+                    # keep looking for a mate while it lasts, or when the AI gives check
+                    mate_expected = mate_expected or game.is_square_attacked(game.board.find_king(game.curr_player),
+                                                                             game.curr_opponent)
                 print(f"AI Move: {start_pos} -> {end_pos}")
 
-        # 3. check for game over
-        moves = game.find_all_legal_moves(game.curr_player)
-        if len(moves) == 0:
+        # 3. check for game over (after moves only, generating the legal moves is slow)
+        if position_changed and not game.find_all_legal_moves(game.curr_player):
             game_over = True
             king_pos = game.board.find_king(game.curr_player)
             if game.is_square_attacked(king_pos, game.curr_opponent):
@@ -250,17 +311,104 @@ def run_game(screen, player_color, difficulty):
             else:
                 # king is not in check, stalemate
                 game_over_text = "Stalemate! It's a draw."
+        elif position_changed and game.draw_reason() is not None:
+            # draw by threefold repetition or by the fifty-move rule
+            game_over = True
+            game_over_text = "Repetition! It's a draw." if game.repetition_count() >= 3 else "50 moves! It's a draw."
+        position_changed = False
 
-        # 4. display board
-        draw_game_state(screen, game, selected_square)
-        if game_over:
-            draw_end_game_text(screen, game_over_text)
+        # 4. display board: only the changed squares are drawn and pushed to the screen (none on idle frames)
+        dirty_rects = renderer.render(game.board, selected_square, game_over_text if game_over else None)
+        pygame.display.update(dirty_rects)
         clock.tick(MAX_FPS)
-        pygame.display.flip()
-
 
-
-# higher-level function to draw the game board and pieces
+    if cache is not None:
+        cache.close()
+    if book is not None:
+        book.close()
+    profiler.disable()
+
+
+
+# function returning a system font, created on first use
+def get_font(size, bold=False):
+    key = (size, bold)
+    if key not in FONTS:
+        FONTS[key] = pygame.font.SysFont("Helvetica", size, bold, False)
+    return FONTS[key]
+
+
+# function returning the surface of a rendered text, rendered on first use
+def render_text(text, size, bold=False, color=TEXT_COLOR, antialias=True):
+    key = (text, size, bold, tuple(color), antialias)
+    if key not in TEXTS:
+        TEXTS[key] = get_font(size, bold).render(text, antialias, color)
+    return TEXTS[key]
+
+
+# function returning the image key of a piece (e.g. 'wR')
+def image_key(piece):
+    return ('w' if piece.color == WHITE else 'b') + PIECE_LETTERS[piece.type]
+
+
+# BoardRenderer class that draws the game on the screen incrementally
+# the empty board is drawn once on an off-screen surface, and every frame only the squares whose piece or
+# highlight changed since the previous frame are redrawn (copied from that surface, then the piece on top)
+# render returns the rectangles that changed, to be passed to pygame.display.update
+
+class BoardRenderer:
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.board_surface = pygame.Surface((WIDTH, HEIGHT)).convert()
+        draw_board(self.board_surface, None)
+        self.invalidate()
+
+    # forget what is on the screen, so that the next frame repaints everything
+    def invalidate(self):
+        self.drawn = [[None] * DIMENSION for _ in range(DIMENSION)] # (image key, highlighted) of every screen square
+        self.overlay = None # (text, rect) of the text drawn on top of the board
+
+    # draw the changes since the previous frame, returns the list of changed rectangles
+    def render(self, board, selected_square, text=None):
+        # squares below a text that changed or disappeared must be repainted
+        if self.overlay is not None and self.overlay[0] != text:
+            self._invalidate_area(self.overlay[1])
+            self.overlay = None
+        dirty_rects = []
+        for r in range(DIMENSION):
+            for c in range(DIMENSION):
+                piece = board.board[7-r][c] # 7-r is to account for inverted Y axis
+                state = (image_key(piece) if piece is not None else None, selected_square == (7-r, c))
+                if self.drawn[r][c] != state:
+                    rect = pygame.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE)
+                    if state[1]:
+                        self.screen.fill(HIGHLIGHT_COLOR, rect)
+                    else:
+                        self.screen.blit(self.board_surface, rect, rect)
+                    if state[0] in IMAGES:
+                        self.screen.blit(IMAGES[state[0]], rect)
+                    self.drawn[r][c] = state
+                    dirty_rects.append(rect)
+        if text is not None:
+            text_surf = render_text(text, 32, True, END_TEXT_COLOR, False)
+            text_rect = text_surf.get_rect(center=(WIDTH // 2 + 2, HEIGHT // 2 + 2))
+            # (re)draw the text when it is new or when squares below it were just repainted
+            if self.overlay is None or text_rect.collidelist(dirty_rects) != -1:
+                self.screen.blit(text_surf, text_rect)
+                dirty_rects.append(text_rect)
+                self.overlay = (text, text_rect)
+        return dirty_rects
+
+    # helper function to mark the squares overlapping a rectangle as not drawn
+    def _invalidate_area(self, area):
+        for r in range(DIMENSION):
+            for c in range(DIMENSION):
+                if area.colliderect(pygame.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE)):
+                    self.drawn[r][c] = None
+
+
+# higher-level function to draw the whole game board and pieces (full repaint, see BoardRenderer)
 def draw_game_state(screen, game, selected_square):
     draw_board(screen, selected_square)
     draw_pieces(screen, game.board)
@@ -268,13 +416,12 @@ def draw_game_state(screen, game, selected_square):
 
 # function to draw the chess board
 def draw_board(screen, selected_square):
-    colors = [pygame.Color("white"), pygame.Color("gray")]
     for r in range(DIMENSION):
         for c in range(DIMENSION):
-            color = colors[((r+c) % 2)] # pattern: if r+c is even = white, else black
+            color = SQUARE_COLORS[((r+c) % 2)] # pattern: if r+c is even = white, else black
             # highlight selected square
             if selected_square == (7-r, c): # 7-r is to account for inverted Y axis
-                color = pygame.Color("yellow")
+                color = HIGHLIGHT_COLOR
             pygame.draw.rect(screen, color, pygame.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
 
 
@@ -284,20 +431,15 @@ def draw_pieces(screen, board):
         for c in range(DIMENSION):
             piece = board.board[7-r][c] # 7-r is to account for inverted Y axis
             if piece is not None:
-                # map the Piece object to the image key (e.g. 'wR')
-                color_prefix = 'w' if piece.color == WHITE else 'b'
-                type_map = {"pawn": "P", "rook": "R", "knight": "N", "bishop": "B", "queen": "Q", "king": "K"}
-                key = color_prefix + type_map[piece.type]
+                key = image_key(piece)
                 if key in IMAGES:
                     screen.blit(IMAGES[key], pygame.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
 
 
 # function to draw text on top of the board
 def draw_end_game_text(screen, text):
-    # create a font object (system font, size 32, bold)
-    font = pygame.font.SysFont("Helvetica", 32, True, False)
-    # render the text
-    text_object = font.render(text, 0, pygame.Color("Red"))
+    # render the text (system font, size 32, bold, cached)
+    text_object = render_text(text, 32, True, END_TEXT_COLOR, False)
     text_location = pygame.Rect(0, 0, WIDTH, HEIGHT).move(
         WIDTH // 2 - text_object.get_width() // 2, 
         HEIGHT // 2 - text_object.get_height() // 2
@@ -310,8 +452,7 @@ def draw_button(screen, rect, text, is_selected=False, is_hovered=False):
     color = BTN_SELECTED if is_selected else (BTN_HOVER if is_hovered else BTN_COLOR)
     pygame.draw.rect(screen, color, rect)
     pygame.draw.rect(screen, TEXT_COLOR, rect, 2) # border
-    font = pygame.font.SysFont("Helvetica", 24, True, False)
-    text_surf = font.render(text, True, TEXT_COLOR)
+    text_surf = render_text(text, 24, True)
     text_rect = text_surf.get_rect(center=rect.center)
     screen.blit(text_surf, text_rect)
 
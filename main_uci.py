@@ -0,0 +1,212 @@
+
+import copy
+import sys
+import threading
+import ai
+from game import Game, WHITE
+from utils import _n2c, _c2n
+
+
+# UCI (Universal Chess Interface) front end, to use PinPawn from tournament managers and analysis GUIs
+# the search runs in a worker thread while the main thread keeps reading commands, so that "stop" and
+# "isready" are answered right away (the search checks the stop request at every node)
+
+ENGINE_NAME = "PinPawn"
+ENGINE_AUTHOR = "PinPawn developers"
+MAX_DEPTH = 64 # depth used when only a time limit is given
+MOVE_OVERHEAD = 0.05 # seconds kept in reserve for communication with the GUI
+DEFAULT_MOVES_TO_GO = 30 # time control assumption when the GUI doesn't send movestogo
+MAX_MULTIPV = 64 # maximum value of the MultiPV option (number of lines reported by the search)
+
+
+# UCIEngine class that handles the commands of the protocol, one line at a time
+
+class UCIEngine:
+
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.game = Game()
+        self.multipv = 1
+        self.search_thread = None
+        self.stop_event = threading.Event()
+        self._out_lock = threading.Lock() # the search thread writes too
+
+    # write a line to the GUI
+    def send(self, line):
+        with self._out_lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    # handle a command line, returns False when the engine must quit
+    def handle(self, line):
+        tokens = line.split()
+        if not tokens:
+            return True
+        command = tokens[0]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name MultiPV type spin default 1 min 1 max {MAX_MULTIPV}")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stop()
+            ai.TRANSPOSITION_TABLE.clear()
+            self.game = Game()
+        elif command == "setoption":
+            self._setoption(tokens[1:])
+        elif command == "position":
+            self.stop()
+            self._position(tokens[1:])
+        elif command == "go":
+            self.stop()
+            self._go(tokens[1:])
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            self.stop()
+            return False
+        else:
+            self.send(f"info string unknown command {command}")
+        return True
+
+    # stop the running search (if any) and wait for its bestmove
+    def stop(self):
+        if self.search_thread is not None:
+            self.stop_event.set()
+            self.search_thread.join()
+            self.search_thread = None
+
+    # "setoption name <name> value <value>", only MultiPV is supported
+    def _setoption(self, tokens):
+        if "name" not in tokens or "value" not in tokens:
+            return
+        name = " ".join(tokens[tokens.index("name") + 1:tokens.index("value")])
+        value = " ".join(tokens[tokens.index("value") + 1:])
+        if name.lower() == "multipv":
+            try:
+                self.multipv = max(1, min(MAX_MULTIPV, int(value)))
+            except ValueError:
+                self.send(f"info string invalid MultiPV value {value}")
+        else:
+            self.send(f"info string unknown option {name}")
+
+    # "position [startpos | fen <fen>] [moves <move> ...]"
+    def _position(self, tokens):
+        game = Game()
+        if tokens and tokens[0] == "fen":
+            end = tokens.index("moves") if "moves" in tokens else len(tokens)
+            try:
+                game.load_fen(" ".join(tokens[1:end]))
+            except ValueError as e:
+                self.send(f"info string {e}")
+                return
+            tokens = tokens[end:]
+        elif tokens and tokens[0] == "startpos":
+            tokens = tokens[1:]
+        if tokens and tokens[0] == "moves":
+            for move in tokens[1:]:
+                if len(move) == 5 and move[4] != "q":
+                    # promotions are always to a queen, playing another move would desync the GUI's board
+                    self.send(f"info string unsupported under-promotion {move}")
+                    break
+                try:
+                    start_pos, end_pos = _n2c(move[0:2]), _n2c(move[2:4])
+                    is_legal, _ = game.is_move_legal(start_pos, end_pos, game.curr_player)
+                except (ValueError, IndexError):
+                    is_legal = False
+                if not is_legal:
+                    self.send(f"info string illegal move {move}")
+                    break
+                game.make_move(start_pos, end_pos)
+        self.game = game
+
+    # "go [depth N] [movetime ms] [wtime ms] [btime ms] [winc ms] [binc ms] [movestogo N] [nodes N] [infinite]"
+    def _go(self, tokens):
+        params = {}
+        i = 0
+        while i < len(tokens):
+            if tokens[i] == "infinite":
+                params["infinite"] = True
+                i += 1
+            elif i + 1 < len(tokens):
+                try:
+                    params[tokens[i]] = int(tokens[i + 1])
+                except ValueError:
+                    pass
+                i += 2
+            else:
+                i += 1
+
+        depth = params.get("depth", MAX_DEPTH)
+        time_limit = None
+        if "movetime" in params:
+            time_limit = max(0.001, params["movetime"] / 1000 - MOVE_OVERHEAD)
+        elif not params.get("infinite"):
+            white = self.game.curr_player == WHITE
+            remaining = params.get("wtime" if white else "btime")
+            if remaining is not None:
+                increment = params.get("winc" if white else "binc", 0)
+                moves_to_go = params.get("movestogo", DEFAULT_MOVES_TO_GO)
+                budget = remaining / moves_to_go + 0.75 * increment
+                time_limit = max(0.001, min(budget, remaining / 2) / 1000 - MOVE_OVERHEAD)
+            elif "depth" not in params and "nodes" not in params:
+                depth = 4 # plain "go"
+
+        self.stop_event.clear()
+        self.search_thread = threading.Thread(
+            target=self._search, args=(copy.deepcopy(self.game), depth, time_limit, params.get("nodes"),
+                                       params.get("infinite", False)), daemon=True
+        )
+        self.search_thread.start()
+
+    # search thread body: print an info line per iteration (per line and iteration with MultiPV), then the best move
+    # an infinite search keeps its best move until "stop", even if the search is over before
+    def _search(self, game, depth, time_limit, max_nodes, infinite=False):
+        white_to_move = game.curr_player == WHITE
+        def report(info):
+            nps = int(info["nodes"] / info["time"]) if info["time"] > 0 else 0
+            pv = " ".join(_format_move(move) for move in info["pv"])
+            multipv = f" multipv {info['multipv']}" if "multipv" in info else ""
+            self.send(f"info depth {info['depth']}{multipv} score {_format_score(info['score'], white_to_move)} "
+                      f"nodes {info['nodes']} nps {nps} time {int(info['time'] * 1000)} pv {pv}")
+        if self.multipv > 1:
+            lines = ai.get_multipv(game, self.multipv, depth, time_limit, stop_event=self.stop_event,
+                                   max_nodes=max_nodes, on_iteration=report)
+            move = lines[0]["move"] if lines else None
+        else:
+            move = ai.get_minimax_move(game, depth, time_limit, stop_event=self.stop_event, max_nodes=max_nodes,
+                                       on_iteration=report)
+        if infinite:
+            self.stop_event.wait()
+        self.send(f"bestmove {_format_move(move) if move is not None else '0000'}")
+
+
+# helper function to convert a (start_pos, end_pos) move to UCI notation, e.g. 'e2e4'
+def _format_move(move):
+    return _c2n(*move[0]) + _c2n(*move[1])
+
+
+# helper function to convert a score (positive = white advantage) to a UCI score from the side to move's view
+def _format_score(score, white_to_move):
+    if not white_to_move:
+        score = -score
+    if abs(score) >= ai.TB_WIN_SCORE - 200:
+        # mate: the distance in plies is encoded in the score, from TB_WIN_SCORE for tablebase wins
+        plies = ai.TB_WIN_SCORE - abs(score) if abs(score) <= ai.TB_WIN_SCORE else ai.MATE_SCORE - abs(score)
+        moves = (plies + 1) // 2
+        return f"mate {moves if score > 0 else -moves}"
+    return f"cp {score}"
+
+
+# main loop reading commands from stdin
+def main():
+    engine = UCIEngine()
+    for line in sys.stdin:
+        if not engine.handle(line):
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+
+import time
+from ai import SearchLimits, SearchTimeout
+
+
+# mate search with depth-first proof-number search (df-pn)
+# instead of searching every move to a fixed depth like minimax, the search only asks "can the side to move
+# force mate?": every position gets a proof number (how many positions still have to be solved to prove the mate)
+# and a disproof number (same, to refute it), and the search always expands the most promising position, i.e.
+# the one that proves or refutes the mate with the least work; forced lines (checks with few replies) are
+# followed deep at once, so long mates are found with far fewer nodes than alpha-beta
+# the numbers are kept in MATE_TABLE, keyed by Zobrist hash: it is the only memory of the search, and proofs
+# stay in it between calls (e.g. when the mate is followed move after move)
+# a repetition on the current line counts as a failure for the attacker, so numbers that depend on one are only
+# valid for that line: they are kept in a table of the search keyed by the positions on the line instead
+# by default the attacker only plays checking moves, which finds the vast majority of practical mates quickly;
+# with checks_only=False every move is tried
+
+# proof/disproof number of a solved position (infinite)
+INFINITY = 10 ** 9
+# node limit used when neither max_nodes nor time_limit is given
+DEFAULT_MAX_NODES = 20000
+# maximum number of positions kept in the mate table (it is cleared when full)
+MATE_TABLE_MAX_ENTRIES = 500000
+
+# (position hash, attacker, checks_only) -> (phi, delta), from the point of view of the side to move:
+# phi is the proof number of its goal (mating for the attacker, escaping for the defender), delta the disproof
+MATE_TABLE = {}
+
+
+# MateSearch class holding the state of one df-pn search: the attacking side, the move restriction and the limits
+
+class MateSearch:
+
+    def __init__(self, attacker, checks_only=True, limits=None):
+        self.attacker = attacker
+        self.checks_only = checks_only
+        self.limits = limits if limits is not None else SearchLimits()
+        # numbers that depend on a repetition: (position hash, path hash) -> (phi, delta), where the path hash
+        # is the XOR of the hashes of the positions on the line leading to the position
+        self.path_table = {}
+        self.path_hash = 0
+
+    # multiple iterative deepening: search the position until its phi or delta reaches its threshold
+    # path holds the keys of the positions on the current line, to detect repetitions
+    # returns the (phi, delta) of the position
+    def mid(self, game, key, phi_threshold, delta_threshold, path):
+        self.limits.check()
+        children = self.expand(game)
+        if isinstance(children, tuple):
+            self.store(key, children) # no move to search: the value is known
+            return children
+        child_attacking = game.curr_player != self.attacker
+        path.add(key)
+        self.path_hash ^= key
+        try:
+            while True:
+                phi, delta, best, best_phi, second_delta, dependent = self.select(children, child_attacking, path)
+                if phi >= phi_threshold or delta >= delta_threshold:
+                    break
+                child_key, move = children[best]
+                child_phi_threshold = min(INFINITY, delta_threshold + best_phi - delta)
+                child_delta_threshold = min(phi_threshold, second_delta + 1)
+                game.make_move(*move)
+                try:
+                    self.mid(game, child_key, child_phi_threshold, child_delta_threshold, path)
+                finally:
+                    game.undo_move()
+        finally:
+            path.discard(key)
+            self.path_hash ^= key
+        self.store(key, (phi, delta), dependent)
+        return phi, delta
+
+    # function returning the children of a position as a list of (key, move), or its (phi, delta) when it
+    # is terminal: mate, stalemate, or no checking move for the attacker
+    def expand(self, game):
+        moves = game.find_all_legal_moves(game.curr_player)
+        attacking = game.curr_player == self.attacker
+        if not moves:
+            in_check = game.is_square_attacked(game.board.find_king(game.curr_player), game.curr_opponent)
+            if in_check or attacking:
+                return INFINITY, 0 # mated, or the attacker is stalemated
+            return 0, INFINITY # the defender escapes with a stalemate
+        children = []
+        for move in moves:
+            move = ((move[0], move[1]), (move[2], move[3]))
+            game.make_move(*move)
+            if not (attacking and self.checks_only and not game.is_square_attacked(
+                    game.board.find_king(game.curr_player), game.curr_opponent)):
+                children.append((game.zobrist_key, move))
+            game.undo_move()
+        if not children:
+            return INFINITY, 0 # no checking move
+        return children
+
+    # function to compute the (phi, delta) of a position from its children, with the child to search next
+    # returns phi, delta, index of the best child, phi of the best child, delta of the second best child, and
+    # whether the numbers depend on a repetition (a won goal only depends on the winning child, the others on
+    # every child)
+    def select(self, children, child_attacking, path):
+        phi = INFINITY
+        delta = 0
+        best = 0
+        best_phi = INFINITY
+        second_delta = INFINITY
+        best_dependent = any_dependent = False
+        for i, (child_key, _) in enumerate(children):
+            (child_phi, child_delta), child_dependent = self.lookup(child_key, child_attacking, path)
+            any_dependent = any_dependent or child_dependent
+            delta = min(INFINITY, delta + child_phi)
+            if child_delta < phi:
+                second_delta = phi
+                phi = child_delta
+                best = i
+                best_phi = child_phi
+                best_dependent = child_dependent
+            elif child_delta < second_delta:
+                second_delta = child_delta
+        return phi, delta, best, best_phi, second_delta, best_dependent if phi == 0 else any_dependent
+
+    # function returning the (phi, delta) of a position, (1, 1) if it was never searched, and whether they
+    # depend on a repetition on the current line (which counts as a failure for the attacker)
+    def lookup(self, key, attacking, path):
+        if key in path:
+            return ((INFINITY, 0) if attacking else (0, INFINITY)), True
+        value = self.path_table.get((key, self.path_hash))
+        if value is not None:
+            return value, True
+        return MATE_TABLE.get((key, self.attacker, self.checks_only), (1, 1)), False
+
+    # store the numbers of a position, in the table of the search (for the current line) if they depend on a
+    # repetition, in MATE_TABLE otherwise
+    def store(self, key, value, dependent=False):
+        if dependent:
+            if len(self.path_table) >= MATE_TABLE_MAX_ENTRIES:
+                self.path_table.clear()
+            self.path_table[(key, self.path_hash)] = value
+            return
+        self.path_table.pop((key, self.path_hash), None) # a line-specific value would hide this one
+        if len(MATE_TABLE) >= MATE_TABLE_MAX_ENTRIES:
+            MATE_TABLE.clear()
+        MATE_TABLE[(key, self.attacker, self.checks_only)] = value
+
+    # function to extract the mating line from the proofs of the table, as a list of (start_pos, end_pos) moves
+    # the attacker picks its shortest proven mate, the defender its longest resistance
+    # returns None if a proof is missing (the table was cleared during the search)
+    def mate_line(self, game, key, lines=None, path=None):
+        lines = {} if lines is None else lines
+        path = set() if path is None else path
+        if key in lines:
+            return lines[key]
+        if key in path:
+            return None
+        children = self.expand(game)
+        if isinstance(children, tuple):
+            return [] # the defender is mated
+        path.add(key)
+        attacking = game.curr_player == self.attacker
+        line = None
+        for child_key, move in children:
+            value, _ = self.lookup(child_key, not attacking, set())
+            if value != ((INFINITY, 0) if attacking else (0, INFINITY)):
+                if not attacking:
+                    line = None # a defence is not refuted
+                    break
+                continue
+            game.make_move(*move)
+            child_line = self.mate_line(game, child_key, lines, path)
+            game.undo_move()
+            if child_line is None:
+                if not attacking:
+                    line = None
+                    break
+                continue
+            if line is None or (len(child_line) + 1 < len(line) if attacking else len(child_line) + 1 > len(line)):
+                line = [move] + child_line
+        path.discard(key)
+        lines[key] = line
+        return line
+
+
+# function to search for a forced mate by the side to move, within max_nodes nodes and/or time_limit seconds
+# returns the mating line as a list of (start_pos, end_pos) moves (attacker and defender moves alternating, not
+# necessarily the shortest mate), or None
+# if an info dict is given, it is filled with the result ("mate", "no mate" or "unknown" when a limit was
+# reached), the number of nodes and the search time
+def find_mate(game, max_nodes=None, time_limit=None, checks_only=True, info=None):
+    if max_nodes is None and time_limit is None:
+        max_nodes = DEFAULT_MAX_NODES
+    start_time = time.perf_counter()
+    deadline = start_time + time_limit if time_limit is not None else None
+    search = MateSearch(game.curr_player, checks_only, SearchLimits(deadline, None, max_nodes))
+    key = game.zobrist_key
+    line = None
+    try:
+        phi, delta = search.mid(game, key, INFINITY, INFINITY, set())
+        if phi == 0:
+            line = search.mate_line(game, key)
+            result = "mate" if line else "unknown"
+        else:
+            result = "no mate"
+    except SearchTimeout:
+        result = "unknown"
+    if info is not None:
+        info["result"] = result
+        info["nodes"] = search.limits.nodes
+        info["time"] = time.perf_counter() - start_time
+    return line
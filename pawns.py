@@ -0,0 +1,111 @@
+
+from piece import WHITE, BLACK
+
+
+# pawn structure evaluation: doubled, isolated and passed pawns
+# the terms only depend on the pawns, which move rarely compared to the other pieces, so the search caches them
+# in a PawnTable keyed by the pawn-only Zobrist key of the position (see Game.pawn_key) instead of scanning the
+# files at every leaf
+
+# names of the pawn structure terms, passed pawns are rewarded by relative rank (rank 2 = not advanced yet)
+PAWN_TERMS = ["doubled", "isolated"] + [f"passed_{rank}" for rank in range(2, 8)]
+
+# (midgame, endgame) score of every term, for one white pawn (each extra pawn on a file counts as doubled)
+PAWN_WEIGHTS = {
+    "doubled": (-10, -20),
+    "isolated": (-10, -15),
+    "passed_2": (0, 5),
+    "passed_3": (5, 10),
+    "passed_4": (10, 20),
+    "passed_5": (20, 35),
+    "passed_6": (35, 60),
+    "passed_7": (50, 90),
+}
+
+# maximum number of pawn structures kept in a PawnTable (it is cleared when full)
+PAWN_TABLE_MAX_ENTRIES = 16384
+
+
+# function to count the pawn structure terms of a board
+# returns the counts (white minus black, in PAWN_TERMS order) and the passed pawns of each side as 64-bit
+# masks of squares (bit r*8 + c)
+def pawn_terms(board):
+    files = {WHITE: [[] for _ in range(8)], BLACK: [[] for _ in range(8)]} # rows of the pawns on every file
+    for r in range(1, 7):
+        for c in range(8):
+            piece = board.board[r][c]
+            if piece is not None and piece.type == "pawn":
+                files[piece.color][c].append(r)
+    counts = [0] * len(PAWN_TERMS)
+    passed = {WHITE: 0, BLACK: 0}
+    for color, opponent, sign in ((WHITE, BLACK, 1), (BLACK, WHITE, -1)):
+        own = files[color]
+        for c in range(8):
+            rows = own[c]
+            if not rows:
+                continue
+            counts[0] += sign * (len(rows) - 1)
+            neighbours = [f for f in (c - 1, c + 1) if 0 <= f < 8]
+            if not any(own[f] for f in neighbours):
+                counts[1] += sign * len(rows)
+            for r in rows:
+                # passed: no opposing pawn ahead on the same or an adjacent file
+                if color == WHITE:
+                    blocked = any(o > r for f in neighbours + [c] for o in files[opponent][f])
+                    rank = r + 1
+                else:
+                    blocked = any(o < r for f in neighbours + [c] for o in files[opponent][f])
+                    rank = 8 - r
+                if not blocked:
+                    passed[color] |= 1 << (r * 8 + c)
+                    counts[rank] += sign # passed_2 is at index 2
+    return counts, passed[WHITE], passed[BLACK]
+
+
+# function to evaluate the pawn structure of a board (positive = white advantage)
+# returns (midgame score, endgame score, white passed pawns mask, black passed pawns mask)
+def pawn_structure(board):
+    counts, white_passed, black_passed = pawn_terms(board)
+    mg_score = 0
+    eg_score = 0
+    for term, count in zip(PAWN_TERMS, counts):
+        if count:
+            mg_weight, eg_weight = PAWN_WEIGHTS[term]
+            mg_score += count * mg_weight
+            eg_score += count * eg_weight
+    return mg_score, eg_score, white_passed, black_passed
+
+
+# PawnTable class that caches pawn_structure results by pawn key, with hit and miss counters
+# the table is bounded: it is cleared when it holds max_entries structures
+
+class PawnTable:
+
+    def __init__(self, max_entries=PAWN_TABLE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    # look up the pawn structure of a board by its pawn key, evaluating and storing it on a miss
+    def probe(self, key, board):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = pawn_structure(board)
+        if len(self.entries) >= self.max_entries:
+            self.entries.clear()
+        self.entries[key] = entry
+        return entry
+
+    # fraction of the probes answered from the table
+    def hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,269 @@
+
+import argparse
+import json
+import re
+import sys
+import time
+from itertools import islice
+from multiprocessing import Pool
+from piece import WHITE
+from game import Game
+from utils import _n2c
+
+
+# minimal PGN support: a streaming reader that turns lines of PGN text into games, and a SAN move parser
+# that resolves standard algebraic notation against the rules of a Game
+# games can be replayed through the rules engine to validate large archives, in parallel worker processes
+
+SAN_PIECES = {"N": "knight", "B": "bishop", "R": "rook", "Q": "queen", "K": "king"}
+RESULTS = {"1-0", "0-1", "1/2-1/2", "*"}
+
+_HEADER_RE = re.compile(r'\[\s*(\w+)\s+"(.*)"\s*\]')
+_SAN_RE = re.compile(r"^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQ]))?$")
+_MOVE_NUMBER_RE = re.compile(r"^\d+\.+")
+
+KNIGHT_STEPS = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
+KING_STEPS = [(1, 1), (1, 0), (1, -1), (0, 1), (0, -1), (-1, 1), (-1, 0), (-1, -1)]
+ROOK_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+# generator that reads games from any iterable of PGN lines (an open file, a list, another generator...)
+# yields (headers, moves) tuples, where headers is a dict and moves a list of SAN strings
+# comments, variations, NAGs and move numbers are skipped, nothing is read ahead of the current game
+def read_games(lines):
+    headers = {}
+    moves = []
+    in_moves = False
+    comment_depth = 0 # inside {...}
+    variation_depth = 0 # inside (...)
+    for line in lines:
+        line = line.strip()
+        if comment_depth == 0 and variation_depth == 0 and line.startswith("["):
+            if in_moves:
+                # a new header section starts, the previous game had no result token
+                yield headers, moves
+                headers, moves, in_moves = {}, [], False
+            match = _HEADER_RE.match(line)
+            if match:
+                headers[match.group(1)] = match.group(2)
+            continue
+        if line.startswith("%"):
+            continue # escape mechanism, the line is ignored
+        for token in _tokenize(line):
+            if comment_depth:
+                if token == "}":
+                    comment_depth = 0
+                continue
+            if token == "{":
+                comment_depth = 1
+            elif token == ";":
+                break # rest of line comment
+            elif token == "(":
+                variation_depth += 1
+            elif token == ")":
+                variation_depth = max(0, variation_depth - 1)
+            elif variation_depth or token.startswith("$"):
+                continue
+            elif token in RESULTS:
+                headers.setdefault("Result", token)
+                yield headers, moves
+                headers, moves, in_moves = {}, [], False
+            else:
+                token = _MOVE_NUMBER_RE.sub("", token)
+                if token:
+                    moves.append(token)
+                    in_moves = True
+    if in_moves:
+        yield headers, moves
+
+
+# helper function to split a line of movetext into tokens, with braces, parentheses and semicolons on their own
+def _tokenize(line):
+    for char in "{}();":
+        line = line.replace(char, f" {char} ")
+    return line.split()
+
+
+# function to convert a SAN move (e.g. 'Nf3', 'exd5', 'O-O', 'e8=Q+') into (start_pos, end_pos) for a game
+# raises ValueError if the move cannot be parsed, is illegal or is ambiguous
+# under-promotions raise ValueError too, since make_move always promotes to a queen
+def san_to_move(game, san):
+    player = game.curr_player
+    san = san.rstrip("+#!?")
+    # castling
+    if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        row = 0 if player == WHITE else 7
+        end_col = 6 if san in ("O-O", "0-0") else 2
+        start_pos, end_pos = (row, 4), (row, end_col)
+        is_legal, msg = game.is_move_legal(start_pos, end_pos, player)
+        if not is_legal:
+            raise ValueError(f"Illegal castling {san}: {msg}")
+        return start_pos, end_pos
+
+    match = _SAN_RE.match(san)
+    if not match:
+        raise ValueError(f"Cannot parse SAN move '{san}'")
+    piece_letter, from_file, from_rank, _, dest, promotion = match.groups()
+    if promotion is not None and promotion != "Q":
+        raise ValueError(f"Under-promotion '{san}' is not supported")
+    piece_type = SAN_PIECES[piece_letter] if piece_letter else "pawn"
+    end_pos = _n2c(dest)
+
+    candidates = []
+    for r, c in find_candidate_squares(game, piece_type, player, end_pos):
+        if from_file is not None and c != ord(from_file) - ord('a'):
+            continue
+        if from_rank is not None and r != int(from_rank) - 1:
+            continue
+        if game.is_move_legal((r, c), end_pos, player)[0]:
+            candidates.append((r, c))
+    if len(candidates) != 1:
+        problem = "Illegal" if not candidates else "Ambiguous"
+        raise ValueError(f"{problem} move '{san}'")
+    return candidates[0], end_pos
+
+
+# function to list the squares holding a player's pieces of a given type that can reach end_pos geometrically,
+# as possible origins of a move to end_pos (pins and checks are left to is_move_legal)
+# the squares are found by looking backwards from end_pos (knight and king jumps, rays for the sliding pieces,
+# the squares behind for pawns), so only a handful of squares are visited instead of the whole board
+def find_candidate_squares(game, piece_type, player, end_pos):
+    board = game.board.board
+    row, col = end_pos
+    squares = []
+    if piece_type in ("knight", "king"):
+        for d_row, d_col in (KNIGHT_STEPS if piece_type == "knight" else KING_STEPS):
+            r, c = row + d_row, col + d_col
+            if 0 <= r < 8 and 0 <= c < 8:
+                piece = board[r][c]
+                if piece is not None and piece.color == player and piece.type == piece_type:
+                    squares.append((r, c))
+    elif piece_type == "pawn":
+        direction = 1 if player == WHITE else -1
+        behind = row - direction
+        origins = [(behind, col - 1), (behind, col + 1)] # captures
+        if board[row][col] is None and 0 <= behind < 8:
+            origins.append((behind, col))
+            if board[behind][col] is None:
+                origins.append((behind - direction, col)) # double step over an empty square
+        for r, c in origins:
+            if 0 <= r < 8 and 0 <= c < 8:
+                piece = board[r][c]
+                if piece is not None and piece.color == player and piece.type == "pawn":
+                    squares.append((r, c))
+    else:
+        directions = (ROOK_DIRECTIONS if piece_type == "rook" else BISHOP_DIRECTIONS if piece_type == "bishop"
+                      else ROOK_DIRECTIONS + BISHOP_DIRECTIONS)
+        for d_row, d_col in directions:
+            r, c = row + d_row, col + d_col
+            while 0 <= r < 8 and 0 <= c < 8:
+                piece = board[r][c]
+                if piece is not None:
+                    if piece.color == player and piece.type == piece_type:
+                        squares.append((r, c))
+                    break # the first piece on the ray blocks the rest
+                r, c = r + d_row, c + d_col
+    return squares
+
+
+# generator that yields the lines of PGN files one file after the other, without reading whole files in memory
+def read_lines(paths):
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            yield from f
+
+
+# function to replay a game through the rules of Game, move by move
+# returns a record dict with the game index, result header, number of plies played, final FEN, how the game
+# ended on the board ("checkmate", "stalemate" or None) and an error message (None if the game is valid)
+def replay_game(headers, moves, index=0):
+    game = Game()
+    result = headers.get("Result", "*")
+    error = None
+    plies = 0
+    for san in moves:
+        try:
+            start_pos, end_pos = san_to_move(game, san)
+        except ValueError as e:
+            error = f"ply {plies + 1}: {e}"
+            break
+        game.make_move(start_pos, end_pos)
+        plies += 1
+    end = None
+    if error is None and not game.find_all_legal_moves(game.curr_player):
+        king_pos = game.board.find_king(game.curr_player)
+        end = "checkmate" if game.is_square_attacked(king_pos, game.curr_opponent) else "stalemate"
+        expected = {"checkmate": "0-1" if game.curr_player == WHITE else "1-0", "stalemate": "1/2-1/2"}[end]
+        if result not in (expected, "*"):
+            error = f"result {result} does not match the final {end}"
+    return {"game": index, "result": result, "plies": plies, "fen": game.get_fen(), "end": end, "error": error}
+
+
+# helper function for the worker processes
+def _replay_job(job):
+    index, headers, moves = job
+    return replay_game(headers, moves, index)
+
+
+# generator that replays (headers, moves) games and yields their records
+# with workers > 1 the games are sharded across worker processes; the input is consumed in batches, so that
+# memory stays bounded on archives of any size, and records come out in input order (ordered=True) or as
+# soon as they are ready within a batch (ordered=False)
+def replay_games(games, workers=1, ordered=True, chunksize=32):
+    jobs = ((index, headers, moves) for index, (headers, moves) in enumerate(games))
+    if workers <= 1:
+        for job in jobs:
+            yield _replay_job(job)
+        return
+    with Pool(workers) as pool:
+        while True:
+            batch = list(islice(jobs, workers * chunksize * 4))
+            if not batch:
+                break
+            if ordered:
+                yield from pool.imap(_replay_job, batch, chunksize)
+            else:
+                yield from pool.imap_unordered(_replay_job, batch, chunksize)
+
+
+# function to replay PGN files, writing the records as JSON lines to out (all of them, or only the invalid
+# games with errors_only) and the progress to log every progress_every games
+# returns a summary dict with the number of games, errors, plies, seconds and games per second
+def replay_files(paths, workers=1, ordered=True, out=None, errors_only=False, log=None, progress_every=1000):
+    games = errors = plies = 0
+    start_time = time.perf_counter()
+    for record in replay_games(read_games(read_lines(paths)), workers, ordered):
+        games += 1
+        plies += record["plies"]
+        if record["error"] is not None:
+            errors += 1
+        if out is not None and (record["error"] is not None or not errors_only):
+            out.write(json.dumps(record) + "\n")
+        if log is not None and games % progress_every == 0:
+            elapsed = time.perf_counter() - start_time
+            log.write(f"{games} games, {errors} errors, {games / elapsed:.1f} games/s\n")
+            log.flush()
+    seconds = time.perf_counter() - start_time
+    return {"games": games, "errors": errors, "plies": plies, "seconds": round(seconds, 3),
+            "games_per_sec": round(games / seconds, 1) if seconds > 0 else 0.0}
+
+
+# command line tool, e.g. python pgn.py archive1.pgn archive2.pgn -w 8 --unordered --errors-only -o errors.jsonl
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay and validate PGN files with the PinPawn rules.")
+    parser.add_argument("pgn", nargs="+", help="PGN files to read")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument("--unordered", action="store_true", help="write the records as soon as they are ready")
+    parser.add_argument("-o", "--output", default=None, help="JSONL file for the game records (default: none)")
+    parser.add_argument("--errors-only", action="store_true", help="only write the records of invalid games")
+    parser.add_argument("--progress", type=int, default=1000, help="report progress every N games (default: 1000)")
+    args = parser.parse_args()
+    out = open(args.output, "w") if args.output else None
+    try:
+        summary = replay_files(args.pgn, args.workers, not args.unordered, out, args.errors_only, sys.stderr,
+                               args.progress)
+    finally:
+        if out is not None:
+            out.close()
+    print(json.dumps(summary), file=sys.stderr)
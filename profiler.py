@@ -0,0 +1,185 @@
+
+import os
+import sys
+from contextlib import contextmanager, nullcontext
+from time import perf_counter_ns
+import ai
+from game import Game
+from board import Board
+
+
+# built-in profiling mode for the hot paths of the engine
+# when enabled, the functions below are wrapped with perf_counter_ns timers that count calls, inclusive time
+# and self time (time not spent in another profiled function), so the time of a search is split between
+# move generation, legality checks, attack detection, path checks, making/undoing moves and evaluation
+# nothing is wrapped while profiling is disabled, so the normal game pays no cost
+#
+# enable it with PINPAWN_PROFILE=1 (GUI, CLI) or --profile (CLI, benchmark.py); PINPAWN_PROFILE_STACKS or
+# --stacks give a file where the call stacks are written in the collapsed format read by flamegraph.pl
+# and speedscope ("frame;frame;frame <microseconds>" per line)
+
+PROFILE_ENV = "PINPAWN_PROFILE"
+STACKS_ENV = "PINPAWN_PROFILE_STACKS"
+ROOT_FRAME = "pinpawn"
+
+# (owner, attribute, frame name) of the profiled functions
+TARGETS = [
+    (Game, "find_all_legal_moves", "find_all_legal_moves"),
+    (Game, "find_all_legal_captures", "find_all_legal_captures"),
+    (Game, "is_move_legal", "is_move_legal"),
+    (Game, "is_square_attacked", "is_square_attacked"),
+    (Board, "is_path_clear", "Board.is_path_clear"),
+    (Game, "make_move", "make_move"),
+    (Game, "undo_move", "undo_move"),
+    (ai, "score_board", "score_board"),
+    (ai, "evaluate", "evaluate"),
+]
+
+PROFILER = None # the active Profiler, if any
+
+
+# Profiler class that wraps the hot-path functions and accumulates their timings
+
+class Profiler:
+
+    def __init__(self, out=sys.stderr, stacks_path=None):
+        self.out = out
+        self.stacks_path = stacks_path
+        self.calls = {} # frame name -> number of calls
+        self.total_ns = {} # frame name -> inclusive time
+        self.self_ns = {} # frame name -> self time
+        self.stacks = {} # tuple of frame names -> self time, for the collapsed stacks
+        self.session_calls, self.session_total_ns, self.session_self_ns = {}, {}, {}
+        self.session_wall_ns = 0
+        self._stack = [] # [frame name, time spent in profiled children] of the calls in progress
+        self._label = None
+        self._originals = []
+
+    # wrap the target functions
+    def install(self):
+        for owner, attribute, name in TARGETS:
+            original = getattr(owner, attribute)
+            self._originals.append((owner, attribute, original))
+            setattr(owner, attribute, self._wrap(name, original))
+
+    # restore the original functions
+    def uninstall(self):
+        for owner, attribute, original in reversed(self._originals):
+            setattr(owner, attribute, original)
+        self._originals = []
+
+    # helper function returning a timed version of a function
+    def _wrap(self, name, func):
+        stack = self._stack
+        def timed(*args, **kwargs):
+            frame = [name, 0]
+            stack.append(frame)
+            start = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = perf_counter_ns() - start
+                path = tuple(f[0] for f in stack)
+                stack.pop()
+                self._record(name, path, elapsed, elapsed - frame[1])
+                if stack:
+                    stack[-1][1] += elapsed
+        return timed
+
+    # helper function to add a finished call to the counters
+    def _record(self, name, path, total, own):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if name not in path[:-1]: # recursive calls are already inside the outer call's time
+            self.total_ns[name] = self.total_ns.get(name, 0) + total
+        self.self_ns[name] = self.self_ns.get(name, 0) + own
+        if self._label is not None:
+            path = (self._label,) + path
+        self.stacks[path] = self.stacks.get(path, 0) + own
+
+    # context manager timing a unit of work (e.g. an AI move), whose breakdown is printed at the end
+    @contextmanager
+    def measure(self, label="move"):
+        self.calls, self.total_ns, self.self_ns = {}, {}, {}
+        self._label = label.split()[0] # frames are grouped by kind of work, e.g. "move"
+        start = perf_counter_ns()
+        try:
+            yield self
+        finally:
+            wall = perf_counter_ns() - start
+            self._label = None
+            self.out.write(self.format_breakdown(label, wall) + "\n")
+            self.out.flush()
+            # time not spent in a profiled function (search logic, ordering, tables...)
+            other = wall - sum(self.self_ns.values())
+            if other > 0:
+                path = (label.split()[0],)
+                self.stacks[path] = self.stacks.get(path, 0) + other
+            self._add_to_session(wall)
+
+    # helper function to accumulate the counters of a measured unit into the session totals
+    def _add_to_session(self, wall):
+        for totals, values in ((self.session_calls, self.calls), (self.session_total_ns, self.total_ns),
+                               (self.session_self_ns, self.self_ns)):
+            for name, value in values.items():
+                totals[name] = totals.get(name, 0) + value
+        self.session_wall_ns += wall
+
+    # function to format a breakdown table of the current counters (or the session totals)
+    def format_breakdown(self, label, wall_ns, session=False):
+        calls, total_ns, self_ns = ((self.session_calls, self.session_total_ns, self.session_self_ns) if session
+                                    else (self.calls, self.total_ns, self.self_ns))
+        lines = [f"{label}: {wall_ns / 1e6:.1f} ms",
+                 f"  {'function':<25}{'calls':>10}{'total ms':>11}{'self ms':>10}{'self %':>8}{'us/call':>9}"]
+        for name in sorted(self_ns, key=self_ns.get, reverse=True):
+            share = self_ns[name] / wall_ns if wall_ns else 0.0
+            lines.append(f"  {name:<25}{calls[name]:>10}{total_ns.get(name, 0) / 1e6:>11.1f}{self_ns[name] / 1e6:>10.1f}"
+                         f"{share:>8.1%}{total_ns.get(name, 0) / calls[name] / 1e3:>9.1f}")
+        other = wall_ns - sum(self_ns.values())
+        share = other / wall_ns if wall_ns else 0.0
+        lines.append(f"  {'(other)':<25}{'':>10}{'':>11}{other / 1e6:>10.1f}{share:>8.1%}")
+        return "\n".join(lines)
+
+    # function to write the collapsed stacks, times in microseconds
+    def write_stacks(self, path):
+        with open(path, "w") as f:
+            for frames, ns in sorted(self.stacks.items()):
+                if ns >= 1000:
+                    f.write(";".join((ROOT_FRAME,) + frames) + f" {ns // 1000}\n")
+
+
+# function to start profiling, returns the active Profiler
+def enable(out=sys.stderr, stacks_path=None):
+    global PROFILER
+    if PROFILER is None:
+        PROFILER = Profiler(out, stacks_path)
+        PROFILER.install()
+    return PROFILER
+
+
+# function to stop profiling: prints the session totals and writes the collapsed stacks (if requested)
+# returns the Profiler that was active, or None
+def disable():
+    global PROFILER
+    profiler, PROFILER = PROFILER, None
+    if profiler is not None:
+        profiler.uninstall()
+        if profiler.session_wall_ns:
+            profiler.out.write(profiler.format_breakdown("total", profiler.session_wall_ns, session=True) + "\n")
+        if profiler.stacks_path:
+            profiler.write_stacks(profiler.stacks_path)
+    return profiler
+
+
+# function to enable profiling if requested by the environment (PINPAWN_PROFILE), returns the Profiler or None
+def enable_from_env():
+    if os.environ.get(PROFILE_ENV, "") not in ("", "0"):
+        return enable(stacks_path=os.environ.get(STACKS_ENV))
+    return None
+
+
+# function returning a context manager that profiles a unit of work if profiling is enabled, and does
+# nothing otherwise, e.g. "with profiler.measure('move 12'): move = get_minimax_move(game)"
+def measure(label="move"):
+    if PROFILER is None:
+        return nullcontext()
+    return PROFILER.measure(label)
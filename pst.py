@@ -1,8 +1,20 @@
 
+from piece import WHITE, BLACK
+
 # these are highly simplified version of Piece-Square Tables (PST)
-# they are fixed and do not change between opening and endgame
+# there is a midgame and an endgame table for every piece, blended according to the game phase (tapered evaluation)
 # all maps are relative to white pieces, black pieces use mirrored tables (inverted rows)
 
+# material values of the pieces, the same in the midgame and in the endgame
+PIECE_SCORE = {"king": 0, "queen": 900, "rook": 500, "bishop": 330, "knight": 320, "pawn": 100}
+
+# game phase: every piece counts for its weight, from MAX_PHASE (all pieces on the board) down to 0 (pawn endgame)
+PHASE_WEIGHTS = {"king": 0, "queen": 4, "rook": 2, "bishop": 1, "knight": 1, "pawn": 0}
+MAX_PHASE = 24
+
+
+# MIDGAME TABLES
+
 pawn_table = [
     0,  0,  0,  0,  0,  0,  0,  0,
     50, 50, 50, 50, 50, 50, 50, 50,
@@ -58,8 +70,8 @@ queen_table = [
     -20,-10,-10, -5, -5,-10,-10,-20
 ]
 
-# king wants safety in early game, and activity in lte game
-# this general table prioritizes safety
+# king wants safety in early game, and activity in late game
+# this table prioritizes safety, king_endgame_table activity
 king_table = [
     -30,-40,-40,-50,-50,-40,-40,-30,
     -30,-40,-40,-50,-50,-40,-40,-30,
@@ -72,6 +84,77 @@ king_table = [
 ]
 
 
+# ENDGAME TABLES
+
+# passed pawns are the main asset of the endgame, the further advanced the better
+pawn_endgame_table = [
+    0,  0,  0,  0,  0,  0,  0,  0,
+    80, 80, 80, 80, 80, 80, 80, 80,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    15, 15, 15, 15, 15, 15, 15, 15,
+    5,  5,  5,  5,  5,  5,  5,  5,
+    0,  0,  0,  0,  0,  0,  0,  0,
+    0,  0,  0,  0,  0,  0,  0,  0
+]
+
+knight_endgame_table = [
+    -50,-40,-30,-30,-30,-30,-40,-50,
+    -40,-20,  0,  0,  0,  0,-20,-40,
+    -30,  0, 10, 15, 15, 10,  0,-30,
+    -30,  5, 15, 20, 20, 15,  5,-30,
+    -30,  0, 15, 20, 20, 15,  0,-30,
+    -30,  5, 10, 15, 15, 10,  5,-30,
+    -40,-20,  0,  5,  5,  0,-20,-40,
+    -50,-40,-30,-30,-30,-30,-40,-50
+]
+
+bishop_endgame_table = [
+    -20,-10,-10,-10,-10,-10,-10,-20,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -10,  0,  5, 10, 10,  5,  0,-10,
+    -10,  5, 10, 15, 15, 10,  5,-10,
+    -10,  5, 10, 15, 15, 10,  5,-10,
+    -10,  0,  5, 10, 10,  5,  0,-10,
+    -10,  0,  0,  0,  0,  0,  0,-10,
+    -20,-10,-10,-10,-10,-10,-10,-20
+]
+
+rook_endgame_table = [
+    10, 10, 10, 10, 10, 10, 10, 10,
+    20, 20, 20, 20, 20, 20, 20, 20,
+    0,  0,  0,  0,  0,  0,  0,  0,
+    0,  0,  0,  0,  0,  0,  0,  0,
+    0,  0,  0,  0,  0,  0,  0,  0,
+    0,  0,  0,  0,  0,  0,  0,  0,
+    0,  0,  0,  0,  0,  0,  0,  0,
+    0,  0,  0,  0,  0,  0,  0,  0
+]
+
+queen_endgame_table = [
+    -20,-10,-10, -5, -5,-10,-10,-20,
+    -10,  0,  5,  5,  5,  5,  0,-10,
+    -10,  5, 10, 10, 10, 10,  5,-10,
+     -5,  5, 10, 15, 15, 10,  5, -5,
+     -5,  5, 10, 15, 15, 10,  5, -5,
+    -10,  5, 10, 10, 10, 10,  5,-10,
+    -10,  0,  5,  5,  5,  5,  0,-10,
+    -20,-10,-10, -5, -5,-10,-10,-20
+]
+
+# in the endgame the king is a fighting piece and belongs in the center
+king_endgame_table = [
+    -50,-40,-30,-20,-20,-30,-40,-50,
+    -30,-20,-10,  0,  0,-10,-20,-30,
+    -30,-10, 20, 30, 30, 20,-10,-30,
+    -30,-10, 30, 40, 40, 30,-10,-30,
+    -30,-10, 30, 40, 40, 30,-10,-30,
+    -30,-10, 20, 30, 30, 20,-10,-30,
+    -30,-30,  0,  0,  0,  0,-30,-30,
+    -50,-30,-30,-30,-30,-30,-30,-50
+]
+
+
 # map piece types to tables
 PIECE_TABLES = {
     "pawn": pawn_table,
@@ -81,3 +164,31 @@ PIECE_TABLES = {
     "queen": queen_table,
     "king": king_table
 }
+PIECE_TABLES_EG = {
+    "pawn": pawn_endgame_table,
+    "knight": knight_endgame_table,
+    "bishop": bishop_endgame_table,
+    "rook": rook_endgame_table,
+    "queen": queen_endgame_table,
+    "king": king_endgame_table
+}
+
+
+# function to precompute, for every (color, piece type), the midgame or endgame value of the piece on every board
+# square (indexed by row * 8 + col, row 0 being rank 1): material plus table, positive for white, negative for black
+def _square_values(tables):
+    values = {}
+    for piece_type, table in tables.items():
+        white = [0] * 64
+        black = [0] * 64
+        for r in range(8):
+            for c in range(8):
+                # rank 8 is on the first line of a table, black pieces read the table upside down
+                white[r * 8 + c] = PIECE_SCORE[piece_type] + table[(7 - r) * 8 + c]
+                black[r * 8 + c] = -(PIECE_SCORE[piece_type] + table[r * 8 + c])
+        values[(WHITE, piece_type)] = white
+        values[(BLACK, piece_type)] = black
+    return values
+
+MG_VALUES = _square_values(PIECE_TABLES)
+EG_VALUES = _square_values(PIECE_TABLES_EG)
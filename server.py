@@ -0,0 +1,360 @@
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from game import Game, WHITE, BLACK
+import ai
+from utils import _n2c, _c2n
+
+
+# asyncio game server hosting many human-vs-engine games at once, over a plain TCP line protocol
+# the games live in the server process, which validates the human moves, while the engine turns are
+# sent to a bounded pool of worker processes; the pool is shared fairly between the clients (round robin),
+# and every game has a time budget for all of its engine moves
+#
+# commands (one per line) and replies:
+#   new [white|black] [depth] [budget]   -> "game <id> <engine color>", then "move <id> <uci>" if the engine starts
+#   move <id> <uci>                      -> "move <id> <uci>" (the engine's reply) or "error <id> <message>"
+#   fen <id>                             -> "fen <id> <fen>"
+#   end <id>                             -> "ended <id>"
+#   stats                                -> "stats <json>" (queueing latency, service time, throughput)
+#   quit                                 -> "bye"
+# when a game is over (after either move), the server also sends "over <id> <result> <reason>"
+# if the engine fails, the game is ended with "error <id> the engine failed (<error>)" and "over <id> * engine failure"
+
+DEFAULT_DEPTH = 3
+DEFAULT_BUDGET = 60.0 # seconds of engine time per game
+MOVES_TO_GO = 30 # the budget is spread over this many engine moves
+MIN_MOVE_TIME = 0.05 # the engine always gets this time, even with the budget spent
+MAX_MOVES = 300 # games are adjudicated a draw after this many moves (both sides counted)
+LATENCY_SAMPLES = 10000 # number of recent jobs kept for the latency percentiles
+
+
+# function run in the worker processes: search a move for a game, returns (move in UCI notation or None, seconds)
+def _engine_move(game, depth, time_limit):
+    start_time = time.perf_counter()
+    move = ai.get_minimax_move(game, depth, time_limit)
+    seconds = time.perf_counter() - start_time
+    return (None if move is None else _c2n(*move[0]) + _c2n(*move[1])), seconds
+
+
+# helper function to compute a percentile of a list of values (nearest rank)
+def _percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+# FairScheduler class that runs jobs on an executor with at most `workers` jobs at a time
+# pending jobs are queued per client and the clients are served round robin, so that a client with many
+# games cannot starve the others
+
+class FairScheduler:
+
+    def __init__(self, executor, workers):
+        self.executor = executor
+        self.idle = workers
+        self.queues = {} # client -> deque of (future, func, args, enqueue time)
+        self.ready = deque() # clients with pending jobs, in round robin order
+        self.queue_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.service_times = deque(maxlen=LATENCY_SAMPLES)
+        self.completed = 0
+        self.start_time = time.perf_counter()
+
+    # queue a job for a client, returns an asyncio future with the result of func(*args)
+    def submit(self, client, func, *args):
+        future = asyncio.get_running_loop().create_future()
+        queue = self.queues.setdefault(client, deque())
+        if not queue:
+            self.ready.append(client)
+        queue.append((future, func, args, time.perf_counter()))
+        self._dispatch()
+        return future
+
+    # drop the pending jobs of a client (e.g. after a disconnection)
+    def cancel(self, client):
+        for future, _, _, _ in self.queues.pop(client, ()):
+            future.cancel()
+        if client in self.ready:
+            self.ready.remove(client)
+
+    # number of jobs waiting for a worker
+    def pending(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    # helper function to start queued jobs while workers are idle
+    def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self.idle > 0 and self.ready:
+            client = self.ready.popleft()
+            queue = self.queues[client]
+            future, func, args, enqueued = queue.popleft()
+            if queue:
+                self.ready.append(client) # back of the line
+            else:
+                del self.queues[client]
+            if future.cancelled():
+                continue
+            started = time.perf_counter()
+            self.queue_latencies.append(started - enqueued)
+            self.idle -= 1
+            job = loop.run_in_executor(self.executor, func, *args)
+            job.add_done_callback(lambda job, future=future, started=started: self._finish(job, future, started))
+
+    # helper function called when a job is done: pass its result on and start the next job
+    def _finish(self, job, future, started):
+        self.idle += 1
+        self.completed += 1
+        self.service_times.append(time.perf_counter() - started)
+        if not future.cancelled():
+            if job.exception() is not None:
+                future.set_exception(job.exception())
+            else:
+                future.set_result(job.result())
+        self._dispatch()
+
+    # dict of the scheduling metrics
+    def metrics(self):
+        elapsed = time.perf_counter() - self.start_time
+        latencies, services = list(self.queue_latencies), list(self.service_times)
+        return {
+            "completed": self.completed, "pending": self.pending(),
+            "throughput": round(self.completed / elapsed, 3) if elapsed > 0 else 0.0,
+            "queue_p50": round(_percentile(latencies, 50), 4), "queue_p95": round(_percentile(latencies, 95), 4),
+            "queue_max": round(max(latencies, default=0.0), 4),
+            "service_p50": round(_percentile(services, 50), 4), "service_p95": round(_percentile(services, 95), 4),
+        }
+
+
+# Session class that holds the state of a hosted game
+
+class Session:
+
+    def __init__(self, game_id, client, engine_color, depth, budget):
+        self.id = game_id
+        self.client = client
+        self.game = Game()
+        self.engine_color = engine_color
+        self.depth = depth
+        self.budget = budget # engine seconds left
+        self.moves = 0
+        self.thinking = False # an engine move is queued or running
+        self.result = None # (result, reason) once the game is over
+
+    # time limit of the next engine move
+    def move_time(self):
+        return max(MIN_MOVE_TIME, self.budget / MOVES_TO_GO)
+
+
+# GameServer class that owns the sessions and the engine scheduler
+
+class GameServer:
+
+    def __init__(self, workers=2, executor=None):
+        self.executor = executor if executor is not None else ProcessPoolExecutor(workers)
+        self.scheduler = FairScheduler(self.executor, workers)
+        self.sessions = {}
+        self._ids = itertools.count(1)
+        self._clients = itertools.count(1)
+        self._tasks = set() # engine turns in progress (referenced so they are not garbage collected)
+        self.games_started = 0
+        self.moves_played = 0
+
+    # start listening, returns the asyncio server
+    async def start(self, host="127.0.0.1", port=8765):
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # connection handler: read commands until the client quits or disconnects
+    async def handle_client(self, reader, writer):
+        client = next(self._clients)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not self.handle_command(client, line.decode(errors="replace").split(), writer):
+                    break
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.scheduler.cancel(client)
+            for game_id in [s.id for s in self.sessions.values() if s.client == client]:
+                del self.sessions[game_id]
+            writer.close()
+
+    # helper function to send a line to a client
+    def _send(self, writer, line):
+        if not writer.is_closing():
+            writer.write((line + "\n").encode())
+
+    # handle a command, returns False when the client quits
+    def handle_command(self, client, tokens, writer):
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "new":
+            self._new_game(client, args, writer)
+        elif command == "move" and len(args) == 2:
+            self._human_move(client, args[0], args[1], writer)
+        elif command == "fen" and len(args) == 1:
+            session = self._session(client, args[0], writer)
+            if session is not None:
+                self._send(writer, f"fen {session.id} {session.game.get_fen()}")
+        elif command == "end" and len(args) == 1:
+            session = self._session(client, args[0], writer)
+            if session is not None:
+                del self.sessions[session.id]
+                self._send(writer, f"ended {session.id}")
+        elif command == "stats":
+            self._send(writer, "stats " + json.dumps(self.metrics()))
+        elif command == "quit":
+            self._send(writer, "bye")
+            return False
+        else:
+            self._send(writer, f"error unknown command '{' '.join(tokens)}'")
+        return True
+
+    # dict of the server metrics
+    def metrics(self):
+        metrics = {"games": len(self.sessions), "games_started": self.games_started, "moves": self.moves_played}
+        metrics.update(self.scheduler.metrics())
+        return metrics
+
+    # helper function to find a session of a client, sends an error if there is none
+    def _session(self, client, game_id, writer):
+        session = self.sessions.get(int(game_id)) if game_id.isdigit() else None
+        if session is None or session.client != client:
+            self._send(writer, f"error {game_id} unknown game")
+            return None
+        return session
+
+    # "new [white|black] [depth] [budget]": the color is the human's
+    def _new_game(self, client, args, writer):
+        try:
+            human = args[0] if args else WHITE
+            if human not in (WHITE, BLACK):
+                raise ValueError
+            depth = int(args[1]) if len(args) > 1 else DEFAULT_DEPTH
+            budget = float(args[2]) if len(args) > 2 else DEFAULT_BUDGET
+            if depth < 1 or budget <= 0:
+                raise ValueError
+        except ValueError:
+            self._send(writer, "error usage: new [white|black] [depth] [budget]")
+            return
+        session = Session(next(self._ids), client, BLACK if human == WHITE else WHITE, depth, budget)
+        self.sessions[session.id] = session
+        self.games_started += 1
+        self._send(writer, f"game {session.id} {session.engine_color}")
+        if session.engine_color == WHITE:
+            self._start_engine_turn(session, writer)
+
+    # "move <id> <uci>": validate and play the human move, then queue the engine's reply
+    def _human_move(self, client, game_id, move, writer):
+        session = self._session(client, game_id, writer)
+        if session is None:
+            return
+        game = session.game
+        if session.result is not None:
+            self._send(writer, f"error {session.id} the game is over")
+            return
+        if session.thinking or game.curr_player == session.engine_color:
+            self._send(writer, f"error {session.id} not your turn")
+            return
+        try:
+            start_pos, end_pos = _n2c(move[0:2]), _n2c(move[2:4])
+            is_legal, message = game.is_move_legal(start_pos, end_pos, game.curr_player)
+        except (ValueError, IndexError):
+            is_legal, message = False, f"invalid move '{move}'"
+        if not is_legal:
+            self._send(writer, f"error {session.id} {message}")
+            return
+        self._play(session, start_pos, end_pos, writer)
+        if session.result is None:
+            self._start_engine_turn(session, writer)
+
+    # helper function to play a move in a session and detect the end of the game
+    def _play(self, session, start_pos, end_pos, writer):
+        game = session.game
+        game.make_move(start_pos, end_pos)
+        session.moves += 1
+        self.moves_played += 1
+        if not game.find_all_legal_moves(game.curr_player):
+            king_pos = game.board.find_king(game.curr_player)
+            if game.is_square_attacked(king_pos, game.curr_opponent):
+                session.result = ("0-1" if game.curr_player == WHITE else "1-0", "checkmate")
+            else:
+                session.result = ("1/2-1/2", "stalemate")
+        elif game.draw_reason() is not None:
+            session.result = ("1/2-1/2", game.draw_reason())
+        elif session.moves >= MAX_MOVES:
+            session.result = ("1/2-1/2", "move cap")
+        if session.result is not None:
+            self._send(writer, f"over {session.id} {session.result[0]} {session.result[1]}")
+
+    # helper function to queue the engine move of a session
+    def _start_engine_turn(self, session, writer):
+        session.thinking = True
+        task = asyncio.ensure_future(self._engine_turn(session, writer))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _engine_turn(self, session, writer):
+        try:
+            move, seconds = await self.scheduler.submit(
+                session.client, _engine_move, session.game, session.depth, session.move_time())
+        except asyncio.CancelledError:
+            return # the client went away
+        except Exception as e:
+            # the search failed in the worker: report it and end the game, as nothing can play the engine's turn
+            session.thinking = False
+            if self.sessions.get(session.id) is session:
+                session.result = ("*", "engine failure")
+                self._send(writer, f"error {session.id} the engine failed ({type(e).__name__})")
+                self._send(writer, f"over {session.id} {session.result[0]} {session.result[1]}")
+            return
+        session.thinking = False
+        session.budget = max(0.0, session.budget - seconds)
+        if self.sessions.get(session.id) is not session:
+            return # the game was ended while the engine was thinking
+        if move is None:
+            self._send(writer, f"error {session.id} the engine has no move")
+            return
+        self._send(writer, f"move {session.id} {move}")
+        self._play(session, _n2c(move[0:2]), _n2c(move[2:4]), writer)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+# command line tool, e.g. python server.py --port 8765 --workers 4
+async def _serve(host, port, workers):
+    server = GameServer(workers)
+    listener = await server.start(host, port)
+    print(f"PinPawn server listening on {host}:{port} with {workers} engine workers", flush=True)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host PinPawn games over a TCP line protocol.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on (default: 8765)")
+    parser.add_argument("-w", "--workers", type=int, default=2, help="engine worker processes (default: 2)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
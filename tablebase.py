@@ -0,0 +1,234 @@
+
+import argparse
+import mmap
+import os
+import sys
+import time
+from array import array
+from game import Game
+from piece import Piece, WHITE, BLACK
+
+
+# endgame tablebases for king + one piece against a bare king (KQK, KRK, KPK), built by retrograde analysis
+# with the rules of Game as the oracle: every position gets its result and distance to mate in plies
+#
+# a table is a file of 2 * 64**3 bytes, one per position, indexed by
+#   side_to_move * 64**3 + white_king * 64**2 + black_king * 64 + piece
+# (squares are row * 8 + col, side_to_move is 0 for white), where the extra piece is always white:
+# positions with a black extra piece are probed with colors swapped and the board mirrored
+# byte values, from the point of view of the side to move:
+#   0         draw (or illegal position)
+#   1..127    win, mate in that many plies
+#   128..255  loss, mated in (value - 128) plies (128 = checkmated)
+
+MATERIALS = {"KQK": "queen", "KRK": "rook", "KPK": "pawn"}
+TABLE_SIZE = 2 * 64**3
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+
+# helper function to compute the index of a position in a table
+def _index(side_to_move, white_king, black_king, piece):
+    return side_to_move << 18 | white_king << 12 | black_king << 6 | piece
+
+
+# helper function to decode a table byte into (result, dtm)
+def _decode(value):
+    if value == 0:
+        return DRAW, 0
+    if value < 128:
+        return WIN, value
+    return LOSS, value - 128
+
+
+# function to generate the table of a material set (e.g. "KRK") and write it to directory/<material>.tb
+# KPK needs the KQK table in the same directory, since promotions lead into it
+# if verbose, progress is printed to stderr, returns the table as a bytearray
+def generate(material, directory=".", verbose=False):
+    piece_type = MATERIALS[material]
+    promotion_values = None
+    if piece_type == "pawn":
+        with open(os.path.join(directory, "KQK.tb"), "rb") as f:
+            promotion_values = f.read()
+    start_time = time.perf_counter()
+
+    # 1. enumerate all positions, find mates and stalemates, and store the successors of all the others
+    # successors are stored as a flat array with an offsets array (one slice per position), with table
+    # indices for positions inside this table and -1 - value for positions decided elsewhere
+    # (-1 is a draw after the extra piece is captured, promotions are looked up in the KQK table)
+    game = Game()
+    game.board.board = [[None for _ in range(8)] for _ in range(8)]
+    for color in (WHITE, BLACK):
+        for flag in game.has_moved[color]:
+            game.has_moved[color][flag] = True # no castling
+    white_king, black_king, extra = Piece(WHITE, "king"), Piece(BLACK, "king"), Piece(WHITE, piece_type)
+    values = bytearray(TABLE_SIZE)
+    offsets = array("l", [0])
+    successors = array("l")
+    unresolved = []
+    max_external_dtm = 0
+    for idx in range(TABLE_SIZE):
+        side, wk, bk, p = idx >> 18, (idx >> 12) & 63, (idx >> 6) & 63, idx & 63
+        legal = wk != bk and wk != p and bk != p and not (piece_type == "pawn" and p // 8 in (0, 7))
+        if legal:
+            board = game.board.board
+            for row in board:
+                row[:] = [None] * 8
+            board[wk // 8][wk % 8] = white_king
+            board[bk // 8][bk % 8] = black_king
+            board[p // 8][p % 8] = extra
+            game.curr_player, game.curr_opponent = (WHITE, BLACK) if side == 0 else (BLACK, WHITE)
+            # the side that just moved cannot be in check
+            own_king = wk if side == 0 else bk
+            other_king = bk if side == 0 else wk
+            legal = not game.is_square_attacked((other_king // 8, other_king % 8), game.curr_player)
+        if legal:
+            moves = game.find_all_legal_moves(game.curr_player)
+            if not moves:
+                if game.is_square_attacked((own_king // 8, own_king % 8), game.curr_opponent):
+                    values[idx] = 128 # checkmate
+            else:
+                for fr, fc, tr, tc in moves:
+                    start, end = fr * 8 + fc, tr * 8 + tc
+                    if side == 0:
+                        if start == wk:
+                            successors.append(_index(1, end, bk, p))
+                        elif piece_type == "pawn" and tr == 7:
+                            value = promotion_values[_index(1, wk, bk, end)]
+                            max_external_dtm = max(max_external_dtm, _decode(value)[1])
+                            successors.append(-1 - value)
+                        else:
+                            successors.append(_index(1, wk, bk, end))
+                    elif end == p:
+                        successors.append(-1) # the extra piece is captured, bare kings
+                    else:
+                        successors.append(_index(0, wk, end, p))
+                unresolved.append(idx)
+        offsets.append(len(successors))
+        if verbose and idx % 65536 == 65535:
+            print(f"{material}: enumerated {idx + 1}/{TABLE_SIZE} positions", file=sys.stderr)
+
+    # 2. retrograde passes: at ply k, a position is won in k plies if a move leads to a position lost in
+    # k - 1 plies (odd k), and lost in k plies if every move leads to a position won in less than k plies (even k)
+    k = 1
+    idle_passes = 0
+    while unresolved and (idle_passes < 2 or k <= max_external_dtm + 1):
+        still_unresolved = []
+        for idx in unresolved:
+            succ_values = [values[s] if s >= 0 else -1 - s for s in successors[offsets[idx]:offsets[idx + 1]]]
+            if k % 2 == 1:
+                if 128 + k - 1 in succ_values:
+                    values[idx] = k
+                    continue
+            elif all(0 < v < 128 for v in succ_values):
+                values[idx] = 128 + k
+                continue
+            still_unresolved.append(idx)
+        idle_passes = idle_passes + 1 if len(still_unresolved) == len(unresolved) else 0
+        unresolved = still_unresolved
+        k += 1
+    # positions left unresolved are draws (value 0)
+
+    with open(os.path.join(directory, f"{material}.tb"), "wb") as f:
+        f.write(values)
+    if verbose:
+        longest = max((v for v in values if v < 128), default=0)
+        print(f"{material}: done in {time.perf_counter() - start_time:.1f}s, longest win {longest} plies", file=sys.stderr)
+    return values
+
+
+# Tablebases class that gives read access to the tables found in a directory
+# tables are memory-mapped on first use
+
+class Tablebases:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.available = {m for m in MATERIALS if os.path.exists(os.path.join(directory, f"{m}.tb"))}
+        self._tables = {}
+
+    # helper function returning the memory-mapped table of a material set
+    def _table(self, material):
+        table = self._tables.get(material)
+        if table is None:
+            with open(os.path.join(self.directory, f"{material}.tb"), "rb") as f:
+                table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._tables[material] = table
+        return table
+
+    # function to probe the tables for the current position of a game
+    # returns (result, dtm) from the point of view of the side to move, with result in WIN, DRAW, LOSS and dtm
+    # the distance to mate in plies, or None if the position is not covered
+    def probe(self, game):
+        kings = {}
+        extra = None
+        for r in range(8):
+            for c in range(8):
+                piece = game.board.board[r][c]
+                if piece is not None:
+                    if piece.type == "king":
+                        kings[piece.color] = (r, c)
+                    elif extra is not None:
+                        return None # more than three pieces
+                    else:
+                        extra = (piece, (r, c))
+        if extra is None:
+            return (DRAW, 0) if len(kings) == 2 else None # bare kings
+        piece, piece_pos = extra
+        material = "K" + {"queen": "Q", "rook": "R", "pawn": "P"}.get(piece.type, "?") + "K"
+        if material not in self.available or len(kings) != 2:
+            return None
+        strong = piece.color
+        if not game.has_moved[strong]['king'] and piece.type == "rook" and not (
+                game.has_moved[strong]['rook_a'] and game.has_moved[strong]['rook_h']):
+            return None # castling may still be possible, the tables assume it is not
+        # the tables have a white extra piece: swap colors and mirror the board for a black one
+        def square(pos):
+            return pos[0] * 8 + pos[1] if strong == WHITE else (7 - pos[0]) * 8 + pos[1]
+        side = 0 if game.curr_player == strong else 1
+        idx = _index(side, square(kings[strong]), square(kings[BLACK if strong == WHITE else WHITE]), square(piece_pos))
+        return _decode(self._table(material)[idx])
+
+    # function to find the best move according to the tables: the fastest win, a drawing move, or the slowest loss
+    # returns (start_pos, end_pos) or None if the position is not covered
+    def best_move(self, game):
+        if self.probe(game) is None:
+            return None
+        best_move, best_rank = None, None
+        for move in game.find_all_legal_moves(game.curr_player):
+            game.make_move((move[0], move[1]), (move[2], move[3]))
+            probed = self.probe(game)
+            game.undo_move()
+            if probed is None:
+                continue
+            result, dtm = probed
+            # rank moves from the point of view of the side moving now (the opponent's loss is our win)
+            if result == LOSS:
+                rank = (2, -dtm) # win, faster is better
+            elif result == DRAW:
+                rank = (1, 0)
+            else:
+                rank = (0, dtm) # loss, slower is better
+            if best_rank is None or rank > best_rank:
+                best_move, best_rank = ((move[0], move[1]), (move[2], move[3])), rank
+        return best_move
+
+    def close(self):
+        for table in self._tables.values():
+            table.close()
+        self._tables = {}
+
+
+# command line tool, e.g. python tablebase.py KQK KRK KPK -d tablebases
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate PinPawn endgame tablebases.")
+    parser.add_argument("materials", nargs="*", default=["KQK", "KRK", "KPK"], choices=sorted(MATERIALS),
+                        help="material sets to generate (KPK needs KQK)")
+    parser.add_argument("-d", "--directory", default="tablebases", help="output directory (default: tablebases)")
+    args = parser.parse_args()
+    os.makedirs(args.directory, exist_ok=True)
+    # KQK first, since KPK promotions need it
+    for material in sorted(args.materials, key=lambda m: m != "KQK"):
+        generate(material, args.directory, verbose=True)
@@ -0,0 +1,179 @@
+import unittest
+import sys
+
+sys.path.append('..')
+from utils import _n2c
+from piece import Piece, WHITE, BLACK
+from game import Game
+import ai
+
+
+class TestAI(unittest.TestCase):
+
+    def setUp(self):
+        self.game = Game()
+
+    def _clear_board(self, white_king='h1', black_king='h8'):
+        self.game.board.board = [[None for _ in range(8)] for _ in range(8)]
+        self._put(white_king, WHITE, "king")
+        self._put(black_king, BLACK, "king")
+
+    def _put(self, square, color, piece_type):
+        row, col = _n2c(square)
+        self.game.board.board[row][col] = Piece(color, piece_type)
+
+    def _setup_back_rank_mate(self):
+        # white king g1, white rook a1, black king g8 behind its pawns: Ra8# is mate in one
+        self.game.board.board = [[None for _ in range(8)] for _ in range(8)] # clear board
+        self.game.board.board[0][6] = Piece(WHITE, "king")
+        self.game.board.board[0][0] = Piece(WHITE, "rook")
+        self.game.board.board[7][6] = Piece(BLACK, "king")
+        for col in (5, 6, 7):
+            self.game.board.board[6][col] = Piece(BLACK, "pawn")
+        self.game.has_moved[WHITE]['king'] = True
+        self.game.has_moved[BLACK]['king'] = True
+
+    def test_finds_mate_in_one(self):
+        self._setup_back_rank_mate()
+        info = {}
+        move = ai.get_minimax_move(self.game, 2, info=info)
+        self.assertEqual(move, (_n2c('a1'), _n2c('a8')))
+        self.assertGreater(info["score"], ai.MATE_SCORE - 10)
+
+    def test_principal_variation_starts_with_best_move(self):
+        info = {}
+        move = ai.get_minimax_move(self.game, 3, info=info)
+        self.assertEqual(info["depth"], 3)
+        self.assertEqual(len(info["pv"]), 3)
+        self.assertEqual(info["pv"][0], move)
+
+    def test_pvs_score_matches_full_window_search(self):
+        # the root score of the windowed search must equal a plain full-window search
+        info = {}
+        ai.get_minimax_move(self.game, 3, info=info)
+        expected = ai.minimax(self.game, 3, -ai.MATE_SCORE, ai.MATE_SCORE, True)
+        self.assertEqual(info["score"], expected)
+
+    def test_time_limit_returns_legal_move(self):
+        info = {}
+        move = ai.get_minimax_move(self.game, 20, time_limit=0.2, info=info)
+        self.assertIsNotNone(move)
+        is_legal, msg = self.game.is_move_legal(move[0], move[1], WHITE)
+        self.assertTrue(is_legal, msg)
+        self.assertLess(info["depth"], 20)
+
+    def test_see_undefended_piece(self):
+        self._clear_board()
+        self._put('e4', WHITE, "pawn")
+        self._put('d5', BLACK, "knight")
+        self.assertEqual(ai.see(self.game, _n2c('e4') + _n2c('d5')), ai.PIECE_SCORE["knight"])
+
+    def test_see_losing_capture(self):
+        # queen takes a pawn defended by a pawn
+        self._clear_board()
+        self._put('d1', WHITE, "queen")
+        self._put('d5', BLACK, "pawn")
+        self._put('e6', BLACK, "pawn")
+        self.assertEqual(ai.see(self.game, _n2c('d1') + _n2c('d5')), 100 - 900)
+
+    def test_see_xray_attacker(self):
+        # doubled white rooks against a defended black rook: the rook behind recaptures through the first one
+        self._clear_board()
+        self._put('a1', WHITE, "rook")
+        self._put('a2', WHITE, "rook")
+        self._put('a7', BLACK, "rook")
+        self._put('a8', BLACK, "rook")
+        board_before = [row[:] for row in self.game.board.board]
+        self.assertEqual(ai.see(self.game, _n2c('a2') + _n2c('a7')), 500)
+        self.assertEqual(self.game.board.board, board_before) # no move was left on the board
+
+    def test_order_moves_puts_losing_captures_last(self):
+        self._clear_board()
+        self._put('d1', WHITE, "queen")
+        self._put('d5', BLACK, "pawn")
+        self._put('e6', BLACK, "pawn")
+        self._put('b5', BLACK, "knight")
+        self._put('a4', WHITE, "pawn")
+        moves = self.game.find_all_legal_moves(WHITE)
+        ordered = ai.order_moves(self.game, moves)
+        self.assertEqual(ordered[0][1], _n2c('a4') + _n2c('b5'))
+        self.assertEqual(ordered[-1][1], _n2c('d1') + _n2c('d5'))
+
+    def test_quiescence_sees_recapture(self):
+        # static evaluation counts the queen capture, quiescence sees the pawn recapture
+        self._clear_board()
+        self._put('d5', WHITE, "queen")
+        self._put('c6', BLACK, "pawn")
+        self._put('e6', BLACK, "pawn")
+        self.game.curr_player, self.game.curr_opponent = BLACK, WHITE
+        self.game.refresh_eval() # the board was edited directly
+        static = ai.score_board(self.game.board)
+        resolved = ai.quiescence(self.game, -ai.MATE_SCORE, ai.MATE_SCORE, False)
+        self.assertLess(resolved, static - 500)
+
+    def test_search_stats(self):
+        ai.TRANSPOSITION_TABLE.clear()
+        move, stats = ai.get_minimax_move_with_stats(self.game, 3)
+        self.assertIn((move[0] + move[1]), self.game.find_all_legal_moves(WHITE))
+        self.assertEqual(len(stats.depth_times), 3)
+        self.assertEqual(len(stats.depth_nodes), 3)
+        self.assertGreater(stats.nodes, 0)
+        self.assertGreater(stats.qnodes, 0)
+        self.assertEqual(stats.leaf_evals, stats.qnodes) # every quiescence node evaluates its stand pat
+        self.assertLessEqual(stats.first_move_cutoffs, stats.beta_cutoffs)
+        self.assertLessEqual(stats.tt_cutoffs, stats.tt_hits)
+        self.assertLessEqual(stats.tt_hits, stats.tt_probes)
+        self.assertAlmostEqual(stats.effective_branching_factor(), stats.depth_nodes[2] / stats.depth_nodes[1])
+        record = stats.as_record()
+        self.assertEqual(record["nodes"], stats.nodes)
+
+    def test_search_stats_info(self):
+        stats = ai.SearchStats()
+        info = {}
+        ai.get_minimax_move(self.game, 2, info=info, stats=stats)
+        self.assertEqual(info["nodes"], sum(stats.depth_nodes))
+
+    def test_repetition_scores_draw(self):
+        # the start position is on the board a second time: the search scores it as a draw
+        for start, end in [('g1', 'f3'), ('g8', 'f6'), ('f3', 'g1'), ('f6', 'g8')]:
+            self.game.make_move(_n2c(start), _n2c(end))
+        self.assertEqual(ai.minimax(self.game, 2, float('-inf'), float('inf'), True), ai.DRAW_SCORE)
+
+    def test_search_restores_game(self):
+        self.game.load_fen("r3k2r/pppq1ppp/2n5/3pP3/8/2N5/PPPQ1PPP/R3K2R w KQkq d6 0 1")
+        fen, key, clock = self.game.get_fen(), self.game.zobrist_key, self.game.halfmove_clock
+        ai.get_minimax_move(self.game, 2)
+        self.assertEqual((self.game.get_fen(), self.game.zobrist_key, self.game.halfmove_clock), (fen, key, clock))
+        self.assertEqual(self.game.undo_stack, [])
+
+    def test_multipv(self):
+        self.game.load_fen("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1") # Ra8# is mate in one
+        ai.TRANSPOSITION_TABLE.clear()
+        info = {}
+        lines = ai.get_multipv(self.game, 3, 2, info=info)
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[0]["move"], (_n2c('a1'), _n2c('a8')))
+        self.assertGreater(lines[0]["score"], ai.MATE_SCORE - 1000)
+        self.assertEqual(len({line["move"] for line in lines}), 3) # every line starts with another move
+        for line in lines:
+            self.assertEqual(line["pv"][0], line["move"])
+        self.assertGreaterEqual(lines[1]["score"], lines[2]["score"])
+        self.assertLess(lines[1]["score"], ai.MATE_SCORE - 1000)
+        self.assertEqual(sum(info["line_nodes"]), info["nodes"])
+        self.assertGreater(info["extra_cost"], 0)
+        # without the mating move
+        lines = ai.get_multipv(self.game, 3, 2, exclude=[(_n2c('a1'), _n2c('a8'))])
+        self.assertNotIn((_n2c('a1'), _n2c('a8')), [line["move"] for line in lines])
+        self.assertLess(lines[0]["score"], ai.MATE_SCORE - 1000)
+
+    def test_multipv_single_line_matches_search(self):
+        for fen in ("r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 0 1",
+                    "r1b1kb1r/pppp1ppp/5q2/4n3/3KP3/2N3PN/PPP4P/R1BQ1B1R b kq - 0 1"):
+            self.game.load_fen(fen)
+            ai.TRANSPOSITION_TABLE.clear()
+            info = {}
+            ai.get_minimax_move(self.game, 2, info=info)
+            ai.TRANSPOSITION_TABLE.clear()
+            lines = ai.get_multipv(self.game, 1, 2)
+            self.assertEqual(len(lines), 1)
+            self.assertEqual(lines[0]["score"], info["score"])
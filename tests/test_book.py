@@ -0,0 +1,72 @@
+import unittest
+import sys
+import os
+import random
+import tempfile
+
+sys.path.append('..')
+from utils import _n2c, _move2int
+from game import Game
+from book import OpeningBook, build_book, write_book
+from zobrist import hash_game
+import ai
+
+
+PGN = """[Result "1-0"]
+1. e4 e5 2. Nf3 1-0
+
+[Result "1-0"]
+1. e4 c5 1-0
+
+[Result "0-1"]
+1. d4 d5 0-1
+"""
+
+
+class TestBook(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.pgn_path = os.path.join(self.tmpdir.name, "games.pgn")
+        self.book_path = os.path.join(self.tmpdir.name, "book.bin")
+        with open(self.pgn_path, "w") as f:
+            f.write(PGN)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_build_and_probe(self):
+        build_book([self.pgn_path], self.book_path)
+        with OpeningBook(self.book_path) as book:
+            game = Game()
+            moves = dict(book.probe(game))
+            # e4 won twice (weight 2 each), d4 lost and is not stored
+            self.assertEqual(moves, {(_n2c('e2'), _n2c('e4')): 4})
+            game.make_move(_n2c('e2'), _n2c('e4'))
+            # black lost both games after 1. e4: no book moves
+            self.assertEqual(book.probe(game), [])
+            self.assertIsNone(book.choose_move(game))
+
+    def test_weighted_choice(self):
+        game = Game()
+        key = hash_game(game)
+        e4 = (_n2c('e2'), _n2c('e4'))
+        d4 = (_n2c('d2'), _n2c('d4'))
+        write_book(self.book_path, [(key + 1, 0, 5), (key, _move2int(*e4), 3), (key, _move2int(*d4), 1), (key - 1, 0, 5)])
+        with OpeningBook(self.book_path) as book:
+            self.assertEqual(len(book.find_moves(key)), 2)
+            rng = random.Random(0)
+            picks = [book.choose_move(game, rng) for _ in range(400)]
+            self.assertGreater(picks.count(e4), 2 * picks.count(d4))
+
+    def test_search_plays_book_move(self):
+        build_book([self.pgn_path], self.book_path)
+        with OpeningBook(self.book_path) as book:
+            info = {}
+            self.assertEqual(ai.get_minimax_move(Game(), 3, info=info, book=book), (_n2c('e2'), _n2c('e4')))
+            self.assertTrue(info["book"])
+
+    def test_empty_book(self):
+        write_book(self.book_path, [])
+        with OpeningBook(self.book_path) as book:
+            self.assertIsNone(book.choose_move(Game()))
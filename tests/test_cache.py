@@ -0,0 +1,62 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.append('..')
+from utils import _n2c
+from game import Game
+from cache import AnalysisCache, EXACT, LOWER
+from zobrist import hash_game
+import ai
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = AnalysisCache(os.path.join(self.tmpdir.name, "analysis.db"), max_entries=10)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def test_store_and_probe(self):
+        move = (_n2c('e2'), _n2c('e4'))
+        self.assertIsNone(self.cache.probe(2**64 - 1))
+        self.cache.store(2**64 - 1, move, 35, 4, LOWER) # large hashes must fit the signed SQLite integers
+        self.assertEqual(self.cache.probe(2**64 - 1), (move, 35, 4, LOWER))
+
+    def test_deeper_result_is_kept(self):
+        self.cache.store(1, (_n2c('e2'), _n2c('e4')), 30, 6)
+        self.assertFalse(self.cache.store(1, (_n2c('d2'), _n2c('d4')), 20, 3))
+        self.assertEqual(self.cache.probe(1)[2], 6)
+        self.assertTrue(self.cache.store(1, (_n2c('d2'), _n2c('d4')), 20, 7))
+        self.assertEqual(self.cache.probe(1)[0], (_n2c('d2'), _n2c('d4')))
+
+    def test_eviction_of_shallow_entries(self):
+        for key in range(11):
+            self.cache.store(key, (_n2c('e2'), _n2c('e4')), 0, 1 if key < 5 else 5)
+        self.assertLessEqual(len(self.cache), 10)
+        self.assertIsNotNone(self.cache.probe(10)) # deep entries survive
+        self.assertIsNone(self.cache.probe(0))
+
+    def test_search_uses_cache(self):
+        game = Game()
+        # an exact deep result is returned without searching
+        move = (_n2c('a2'), _n2c('a3'))
+        self.cache.store(hash_game(game), move, 0, 10, EXACT)
+        self.assertEqual(ai.get_minimax_move(game, 3, cache=self.cache), move)
+
+    def test_search_writes_back(self):
+        game = Game()
+        info = {}
+        move = ai.get_minimax_move(game, 2, info=info, cache=self.cache)
+        self.assertEqual(self.cache.probe(hash_game(game)), (move, info["score"], 2, EXACT))
+
+    def test_persistence_across_sessions(self):
+        path = self.cache.path
+        self.cache.store(42, (_n2c('e2'), _n2c('e4')), 10, 3)
+        self.cache.close()
+        self.cache = AnalysisCache(path)
+        self.assertEqual(self.cache.probe(42)[2], 3)
@@ -0,0 +1,57 @@
+import unittest
+import sys
+import os
+import subprocess
+
+sys.path.append('..')
+from engine import Engine
+
+
+class TestEngine(unittest.TestCase):
+
+    def test_moves(self):
+        engine = Engine()
+        self.assertEqual(len(engine.legal_moves()), 20)
+        engine.push("e2e4")
+        self.assertTrue(engine.fen().startswith("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b"))
+        with self.assertRaises(ValueError):
+            engine.push("e2e4") # no piece there anymore
+        with self.assertRaises(ValueError):
+            engine.push("e7")
+        for move in ("e2e9", "i2i4", "e2e0", "e7ex"): # off the board
+            with self.assertRaises(ValueError):
+                engine.push(move)
+
+    def test_result(self):
+        engine = Engine()
+        self.assertIsNone(engine.result())
+        engine.set_position(moves=["f2f3", "e7e5", "g2g4", "d8h4"]) # fool's mate
+        self.assertEqual(engine.result(), "0-1")
+        self.assertIsNone(engine.best_move(1))
+
+    def test_search(self):
+        engine = Engine("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+        info = {}
+        self.assertEqual(engine.best_move(2, info=info), "a1a8")
+        self.assertEqual(info["pv"][0], "a1a8")
+        self.assertEqual(engine.find_mate(), ["a1a8"])
+
+    def test_analyse(self):
+        engine = Engine("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+        info = {}
+        lines = engine.analyse(2, 2, info=info)
+        self.assertEqual(lines[0]["pv"][0], "a1a8")
+        self.assertEqual(len(lines), 2)
+        self.assertIn("extra_cost", info)
+
+    def test_light_import(self):
+        # a fresh process importing the engine loads neither pygame nor the search until a move is searched
+        script = ("import sys, engine; before = 'ai' in sys.modules; engine.Engine().best_move(1); "
+                  "print(before, 'ai' in sys.modules, 'pygame' in sys.modules)")
+        root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=root).stdout
+        self.assertEqual(output.split(), ["False", "True", "False"])
+
+
+if __name__ == '__main__':
+    unittest.main()
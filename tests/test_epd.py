@@ -0,0 +1,58 @@
+import unittest
+import sys
+
+sys.path.append('..')
+from epd import parse_epd, read_epd, solve_position, run_suite, solve_curve
+
+
+SUITE = """# mate in one and a hanging queen
+6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - bm Ra8#; id "back rank";
+
+4k3/8/8/3q4/8/8/3R4/3K4 w - - bm Rxd5; id "hanging queen";
+4k3/8/3p4/4p3/3Q4/8/8/4K3 w - - am Qxe5; id "poisoned pawn";
+"""
+
+
+class TestEPD(unittest.TestCase):
+
+    def test_parse_epd(self):
+        entry = parse_epd('6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - bm Ra8# Re1; id "WAC 1";')
+        self.assertEqual(entry["fen"], "6k1/5ppp/8/8/8/8/5PPP/R5K1 w - - 0 1")
+        self.assertEqual(entry["bm"], ["Ra8#", "Re1"])
+        self.assertEqual(entry["id"], ["WAC 1"])
+        with self.assertRaises(ValueError):
+            parse_epd("8/8/8 w - -")
+
+    def test_read_epd(self):
+        entries = list(read_epd(SUITE.splitlines()))
+        self.assertEqual([e["id"][0] for e in entries], ["back rank", "hanging queen", "poisoned pawn"])
+        self.assertEqual(entries[2]["am"], ["Qxe5"])
+
+    def test_solve_position(self):
+        record = solve_position(parse_epd(SUITE.splitlines()[1]), depth=2)
+        self.assertEqual(record["id"], "back rank")
+        self.assertEqual(record["move"], "a1a8")
+        self.assertTrue(record["solved"])
+        self.assertLessEqual(record["solution_time"], record["seconds"])
+
+    def test_unparsable_entry(self):
+        entries = list(read_epd(SUITE.splitlines()))
+        entries.insert(1, parse_epd('4k3/1P6/8/8/8/8/8/4K3 w - - bm b8=N; id "under-promotion";'))
+        records = run_suite(entries, depth=2, workers=2)
+        self.assertEqual([r["id"] for r in records], ["back rank", "under-promotion", "hanging queen", "poisoned pawn"])
+        self.assertFalse(records[1]["solved"])
+        self.assertIsNone(records[1]["move"])
+        self.assertIn("Under-promotion", records[1]["error"])
+        self.assertTrue(records[0]["solved"] and records[2]["solved"] and records[3]["solved"])
+
+    def test_run_suite_and_curve(self):
+        entries = list(read_epd(SUITE.splitlines()))
+        records = run_suite(entries, depth=2, workers=2)
+        self.assertEqual([r["id"] for r in records], ["back rank", "hanging queen", "poisoned pawn"])
+        self.assertTrue(all(r["solved"] for r in records))
+        fake = [{"solution_time": 0.1}, {"solution_time": 1.5}, {"solution_time": None}, {"solution_time": 0.3}]
+        self.assertEqual(solve_curve(fake, [0.2, 1, 2]), [(0.2, 0.25), (1, 0.5), (2, 0.75)])
+
+
+if __name__ == '__main__':
+    unittest.main()
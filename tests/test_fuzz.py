@@ -0,0 +1,44 @@
+import unittest
+import sys
+
+sys.path.append('..')
+from game import Game
+import fuzz
+
+
+class TestFuzz(unittest.TestCase):
+
+    def test_no_mismatch(self):
+        summary = fuzz.run_fuzz(6, workers=1, seed=3, max_plies=30)
+        self.assertEqual(summary["playouts"], 6)
+        self.assertGreater(summary["plies"], 0)
+        self.assertEqual(summary["mismatches"], [])
+
+    def test_random_fen(self):
+        rng = fuzz.random.Random(0)
+        for _ in range(20):
+            game = Game()
+            game.load_fen(fuzz.random_fen(rng))
+            self.assertFalse(game.is_square_attacked(game.board.find_king(game.curr_opponent), game.curr_player))
+
+    def test_shrinks_injected_bug(self):
+        # break the incremental hash on en passant captures only: the mismatch shrinks to the capture itself
+        fen = "r3k2r/pppq1ppp/8/3pP3/8/8/PPPQ1PPP/R3K2R w KQkq d6 0 1"
+        make_move = Game.make_move
+        def buggy_make_move(game, start_pos, end_pos):
+            en_passant = game.board.board[start_pos[0]][start_pos[1]].type == "pawn" and end_pos == game.en_passant_target_square
+            make_move(game, start_pos, end_pos)
+            if en_passant:
+                game.zobrist_key ^= 1
+        Game.make_move = buggy_make_move
+        try:
+            for seed in range(100):
+                _, mismatch = fuzz.run_playout(fen, seed, 40, ["zobrist"])
+                if mismatch is not None:
+                    break
+            self.assertIsNotNone(mismatch)
+            moves, detail = fuzz.shrink(fen, mismatch["moves"], "zobrist")
+        finally:
+            Game.make_move = make_move
+        self.assertEqual(fuzz._format_moves(moves), ["e5d6"])
+        self.assertIn("hash_game", detail)
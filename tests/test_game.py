@@ -1,12 +1,15 @@
 
 import unittest
 import sys
+import random
 
 sys.path.append('..')
 from utils import _n2c
 from piece import Piece, WHITE, BLACK
 from board import Board
 from game import Game
+import ai
+import zobrist
 
 
 class TestGame(unittest.TestCase):
@@ -68,4 +71,105 @@ class TestGame(unittest.TestCase):
         white_king_pos = self.game.board.find_king(WHITE)
         self.assertTrue(self.game.is_square_attacked(white_king_pos, BLACK))
         white_legal_moves = self.game.find_all_legal_moves(WHITE)
-        self.assertEqual(len(white_legal_moves), 0)
\ No newline at end of file
+        self.assertEqual(len(white_legal_moves), 0)
+
+    def test_find_attackers(self):
+        # a black knight on f3 is attacked by the g1 knight and the e2 and g2 pawns
+        self.game.board.board[2][5] = Piece(BLACK, "knight")
+        attackers = self.game.find_attackers(_n2c('f3'), WHITE)
+        self.assertEqual(sorted(attackers), sorted([_n2c('g1'), _n2c('e2'), _n2c('g2')]))
+        self.assertEqual(self.game.find_attackers(_n2c('f3'), BLACK), [])
+
+    def test_find_all_legal_captures(self):
+        # 1. e4 d5: exd5 is the only capture
+        self.game.make_move(_n2c('e2'), _n2c('e4'))
+        self.game.make_move(_n2c('d7'), _n2c('d5'))
+        self.assertEqual(self.game.find_all_legal_captures(WHITE), [_n2c('e4') + _n2c('d5')])
+
+    def test_fen_roundtrip(self):
+        start_fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+        self.assertEqual(self.game.get_fen(), start_fen)
+        self.game.make_move(_n2c('e2'), _n2c('e4'))
+        fen = self.game.get_fen()
+        self.assertEqual(fen, "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1")
+        other = Game()
+        other.load_fen(fen)
+        self.assertEqual(other.get_fen(), fen)
+        self.assertEqual(other.curr_player, BLACK)
+        self.assertEqual(other.en_passant_target_square, _n2c('e3'))
+
+    def test_load_fen_castling_rights(self):
+        self.game.load_fen("r3k2r/8/8/8/8/8/8/R3K2R w Kq - 0 1")
+        self.assertTrue(self.game.is_move_legal(_n2c('e1'), _n2c('g1'), WHITE)[0])
+        self.assertFalse(self.game.is_move_legal(_n2c('e1'), _n2c('c1'), WHITE)[0])
+        with self.assertRaises(ValueError):
+            self.game.load_fen("rnbqkbnr/pppppppp/8/8 w KQkq - 0 1")
+
+    def test_incremental_eval(self):
+        # the sums kept by make_move match a full evaluation, through captures, castling, en passant and promotion
+        rng = random.Random(0)
+        fens = [None, "r3k2r/pppq1ppp/8/3pP3/8/8/PPPQ1PPP/R3K2R w KQkq d6 0 1", "8/1P4k1/8/8/8/8/6p1/K7 w - - 0 1"]
+        for fen in fens:
+            for _ in range(5):
+                game = Game()
+                if fen:
+                    game.load_fen(fen)
+                for _ in range(60):
+                    moves = game.find_all_legal_moves(game.curr_player)
+                    if not moves:
+                        break
+                    r1, c1, r2, c2 = rng.choice(moves)
+                    game.make_move((r1, c1), (r2, c2))
+                    self.assertEqual(ai.evaluate(game), ai.score_board(game.board))
+                    self.assertEqual(game.pawn_key, zobrist.hash_pawns(game.board))
+
+    def test_tapered_eval(self):
+        # a centralised king is worth more once the pieces are off the board
+        self.game.load_fen("8/8/8/3K4/8/8/8/k7 w - - 0 1")
+        self.assertEqual(self.game.phase, 0)
+        self.assertGreater(ai.evaluate(self.game), 0)
+        self.game.load_fen("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+        self.assertEqual(self.game.phase, 24)
+        self.assertEqual(ai.evaluate(self.game), 0)
+
+    def test_undo_move(self):
+        # undo_move restores the position, its keys and sums, through captures, castling, en passant and promotion
+        rng = random.Random(1)
+        fens = [None, "r3k2r/pppq1ppp/8/3pP3/8/8/PPPQ1PPP/R3K2R w KQkq d6 0 1", "8/1P4k1/8/8/8/8/6p1/K7 w - - 0 1"]
+        for fen in fens:
+            game = Game()
+            if fen:
+                game.load_fen(fen)
+            states = []
+            for _ in range(40):
+                moves = game.find_all_legal_moves(game.curr_player)
+                if not moves:
+                    break
+                states.append((game.get_fen(), game.zobrist_key, game.eval_mg, game.eval_eg, game.phase,
+                               game.pawn_key, game.halfmove_clock, dict(game.repetitions)))
+                r1, c1, r2, c2 = rng.choice(moves)
+                game.make_move((r1, c1), (r2, c2))
+                self.assertEqual(game.zobrist_key, zobrist.hash_game(game))
+            while states:
+                game.undo_move()
+                self.assertEqual((game.get_fen(), game.zobrist_key, game.eval_mg, game.eval_eg, game.phase,
+                                  game.pawn_key, game.halfmove_clock, game.repetitions), states.pop())
+
+    def test_threefold_repetition(self):
+        shuffle = [('g1', 'f3'), ('g8', 'f6'), ('f3', 'g1'), ('f6', 'g8')]
+        for start, end in shuffle * 2:
+            self.assertIsNone(self.game.draw_reason())
+            self.game.make_move(_n2c(start), _n2c(end))
+        self.assertEqual(self.game.repetition_count(), 3)
+        self.assertEqual(self.game.draw_reason(), "threefold repetition")
+        self.game.undo_move()
+        self.assertIsNone(self.game.draw_reason())
+
+    def test_fifty_move_rule(self):
+        self.game.load_fen("8/8/8/4k3/8/8/8/R3K3 w - - 99 80")
+        self.assertEqual(self.game.halfmove_clock, 99)
+        self.game.make_move(_n2c('a1'), _n2c('a2'))
+        self.assertEqual(self.game.draw_reason(), "fifty-move rule")
+        self.game.undo_move()
+        self.assertEqual(self.game.halfmove_clock, 99)
+        self.assertIsNone(self.game.draw_reason())
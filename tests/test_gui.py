@@ -0,0 +1,54 @@
+import unittest
+import sys
+import os
+
+sys.path.append('..')
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+from utils import _n2c
+from game import Game
+try:
+    import pygame
+    import main_gui
+except ImportError: # the GUI is optional
+    pygame = None
+
+
+@unittest.skipIf(pygame is None, "pygame is not installed")
+class TestGui(unittest.TestCase):
+
+    def setUp(self):
+        pygame.init()
+        self.screen = pygame.display.set_mode((main_gui.WIDTH, main_gui.HEIGHT))
+        os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')) # images are loaded from images/
+        main_gui.load_graphics()
+
+    def tearDown(self):
+        pygame.quit()
+
+    # the incremental frames must look exactly like a full repaint
+    def assertSameAsRepaint(self, game, selected_square, text=None):
+        expected = pygame.Surface((main_gui.WIDTH, main_gui.HEIGHT)).convert()
+        main_gui.draw_game_state(expected, game, selected_square)
+        if text is not None:
+            main_gui.draw_end_game_text(expected, text)
+        self.assertEqual(pygame.image.tobytes(self.screen, "RGB"), pygame.image.tobytes(expected, "RGB"))
+
+    def test_dirty_rendering(self):
+        game = Game()
+        renderer = main_gui.BoardRenderer(self.screen)
+        self.assertEqual(len(renderer.render(game.board, None)), 64) # first frame: everything
+        self.assertEqual(renderer.render(game.board, None), []) # idle frame: nothing
+        self.assertEqual(len(renderer.render(game.board, _n2c('e2'))), 1)
+        game.make_move(_n2c('e2'), _n2c('e4'))
+        self.assertEqual(len(renderer.render(game.board, None)), 2)
+        self.assertSameAsRepaint(game, None)
+        renderer.render(game.board, _n2c('e4'), "Checkmate! White wins!")
+        self.assertSameAsRepaint(game, _n2c('e4'), "Checkmate! White wins!")
+        self.assertEqual(renderer.render(game.board, _n2c('e4'), "Checkmate! White wins!"), [])
+        renderer.render(game.board, None)
+        self.assertSameAsRepaint(game, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import sys
+
+sys.path.append('..')
+from utils import _n2c
+from game import Game
+from piece import WHITE
+import mate
+
+
+class TestMate(unittest.TestCase):
+
+    def setUp(self):
+        mate.MATE_TABLE.clear()
+
+    def _game(self, fen):
+        game = Game()
+        game.load_fen(fen)
+        return game
+
+    def _assert_mates(self, game, line):
+        for start_pos, end_pos in line:
+            self.assertTrue(game.is_move_legal(start_pos, end_pos, game.curr_player)[0])
+            game.make_move(start_pos, end_pos)
+        self.assertEqual(game.find_all_legal_moves(game.curr_player), [])
+        self.assertTrue(game.is_square_attacked(game.board.find_king(game.curr_player), game.curr_opponent))
+
+    def test_mate_in_one(self):
+        game = self._game("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+        self.assertEqual(mate.find_mate(game), [(_n2c('a1'), _n2c('a8'))])
+
+    def test_mate_in_two(self):
+        # 1. Nf6+ gxf6 2. Bxf7#
+        game = self._game("r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq - 1 1")
+        info = {}
+        line = mate.find_mate(game, info=info)
+        self.assertEqual(info["result"], "mate")
+        self.assertEqual(len(line), 3)
+        self.assertEqual(line[0], (_n2c('d5'), _n2c('f6')))
+        self._assert_mates(game, line)
+
+    def test_long_mate(self):
+        # the king is hunted across the board, far beyond the depth of a full-width search
+        game = self._game("r1b1kb1r/pppp1ppp/5q2/4n3/3KP3/2N3PN/PPP4P/R1BQ1B1R b kq - 0 1")
+        info = {}
+        line = mate.find_mate(game, info=info)
+        self.assertGreaterEqual(len(line), 9)
+        self.assertLess(info["nodes"], 1000)
+        self._assert_mates(game, line)
+
+    def test_no_mate(self):
+        info = {}
+        self.assertIsNone(mate.find_mate(Game(), info=info))
+        self.assertEqual(info["result"], "no mate")
+        # a node limit too small to solve the position
+        game = self._game("r1b1kb1r/pppp1ppp/5q2/4n3/3KP3/2N3PN/PPP4P/R1BQ1B1R b kq - 0 1")
+        mate.MATE_TABLE.clear()
+        self.assertIsNone(mate.find_mate(game, max_nodes=5, info=info))
+        self.assertEqual(info["result"], "unknown")
+
+    def test_repetition_results_stay_on_their_line(self):
+        # numbers that depend on a repetition are only reused on the same line, never through MATE_TABLE
+        search = mate.MateSearch(WHITE)
+        search.path_hash = 123
+        search.store(42, (mate.INFINITY, 0), dependent=True)
+        self.assertNotIn((42, WHITE, True), mate.MATE_TABLE)
+        self.assertEqual(search.lookup(42, True, set()), ((mate.INFINITY, 0), True))
+        self.assertEqual(search.lookup(42, True, {42}), ((mate.INFINITY, 0), True))
+        search.path_hash = 456 # another line to the same position
+        self.assertEqual(search.lookup(42, True, set()), ((1, 1), False))
+        search.store(42, (3, 2))
+        self.assertEqual(mate.MATE_TABLE[(42, WHITE, True)], (3, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
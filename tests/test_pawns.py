@@ -0,0 +1,63 @@
+import unittest
+import sys
+
+sys.path.append('..')
+from utils import _n2c
+from game import Game
+from pawns import PAWN_TERMS, PawnTable, pawn_terms, pawn_structure
+
+
+class TestPawns(unittest.TestCase):
+
+    def _terms(self, fen):
+        game = Game()
+        game.load_fen(fen)
+        counts, white_passed, black_passed = pawn_terms(game.board)
+        return dict(zip(PAWN_TERMS, counts)), white_passed, black_passed
+
+    def _mask(self, *squares):
+        mask = 0
+        for square in squares:
+            r, c = _n2c(square)
+            mask |= 1 << (r * 8 + c)
+        return mask
+
+    def test_start_position(self):
+        counts, white_passed, black_passed = self._terms("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+        self.assertEqual(set(counts.values()), {0})
+        self.assertEqual((white_passed, black_passed), (0, 0))
+
+    def test_doubled_isolated_passed(self):
+        # white: doubled and isolated c-pawns, passed pawn on a5
+        # black: f7/g7 connected, h5 passed (no white pawn on the g and h files)
+        counts, white_passed, black_passed = self._terms("4k3/5pp1/8/P6p/8/2P5/2P5/4K3 w - - 0 1")
+        self.assertEqual(counts["doubled"], 1)
+        self.assertEqual(counts["isolated"], 3) # a5, c3, c2
+        self.assertEqual(white_passed, self._mask("a5", "c3", "c2"))
+        self.assertEqual(black_passed, self._mask("f7", "g7", "h5"))
+        self.assertEqual(counts["passed_5"], 1) # a5
+        self.assertEqual(counts["passed_4"], -1) # h5, fourth rank for black
+        self.assertEqual(counts["passed_2"], 1 - 2) # c2 against f7, g7
+
+    def test_pawn_table(self):
+        game = Game()
+        table = PawnTable(max_entries=2)
+        entry = table.probe(game.pawn_key, game.board)
+        self.assertEqual(entry, pawn_structure(game.board))
+        self.assertIs(table.probe(game.pawn_key, game.board), entry)
+        self.assertEqual((table.hits, table.misses), (1, 1))
+        self.assertEqual(table.hit_rate(), 0.5)
+        # a knight move keeps the pawn key, a pawn move changes it
+        key = game.pawn_key
+        game.make_move(_n2c('g1'), _n2c('f3'))
+        self.assertEqual(game.pawn_key, key)
+        game.make_move(_n2c('e7'), _n2c('e5'))
+        self.assertNotEqual(game.pawn_key, key)
+        # the table stays bounded
+        table.probe(game.pawn_key, game.board)
+        table.probe(game.pawn_key ^ 1, game.board)
+        self.assertLessEqual(len(table.entries), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import sys
+
+sys.path.append('..')
+from utils import _n2c
+from piece import Piece, WHITE, BLACK
+from game import Game
+import io
+import os
+import tempfile
+from pgn import read_games, san_to_move, find_candidate_squares, replay_game, replay_games, replay_files
+
+
+SAMPLE_PGN = """[Event "Test"]
+[White "A"]
+[Black "B"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 {a comment} Nc6 (2... d6 3. d4) 3. Bb5 $1 a6 1-0
+
+[Event "Test 2"]
+[Result "1/2-1/2"]
+
+1. d4 d5 ; rest of line comment
+2. c4 1/2-1/2
+"""
+
+MATE_PGN = """[Event "Fool's mate"]
+[Result "0-1"]
+
+1. f3 e5 2. g4 Qh4# 0-1
+
+[Event "Wrong result"]
+[Result "1-0"]
+
+1. f3 e5 2. g4 Qh4# 1-0
+
+[Event "Broken"]
+[Result "*"]
+
+1. e4 e5 2. Ke3 *
+"""
+
+
+class TestPGN(unittest.TestCase):
+
+    def test_read_games(self):
+        games = list(read_games(SAMPLE_PGN.splitlines()))
+        self.assertEqual(len(games), 2)
+        headers, moves = games[0]
+        self.assertEqual(headers["White"], "A")
+        self.assertEqual(moves, ["e4", "e5", "Nf3", "Nc6", "Bb5", "a6"])
+        self.assertEqual(games[1][0]["Result"], "1/2-1/2")
+        self.assertEqual(games[1][1], ["d4", "d5", "c4"])
+
+    def test_read_games_is_lazy(self):
+        # the first game is available before the second one is read
+        def lines():
+            yield from SAMPLE_PGN.splitlines()[:7]
+            raise AssertionError("read too far")
+        headers, moves = next(read_games(lines()))
+        self.assertEqual(len(moves), 6)
+
+    def test_san_to_move(self):
+        game = Game()
+        self.assertEqual(san_to_move(game, "Nf3"), (_n2c('g1'), _n2c('f3')))
+        self.assertEqual(san_to_move(game, "e4"), (_n2c('e2'), _n2c('e4')))
+        with self.assertRaises(ValueError):
+            san_to_move(game, "Ke2") # blocked
+        with self.assertRaises(ValueError):
+            san_to_move(game, "xyz")
+
+    def test_san_disambiguation(self):
+        game = Game()
+        game.board.board = [[None for _ in range(8)] for _ in range(8)]
+        game.board.board[0][0] = Piece(WHITE, "rook")
+        game.board.board[0][7] = Piece(WHITE, "rook")
+        game.board.board[1][4] = Piece(WHITE, "king")
+        game.board.board[7][4] = Piece(BLACK, "king")
+        with self.assertRaises(ValueError):
+            san_to_move(game, "Rd1") # both rooks can go to d1
+        self.assertEqual(san_to_move(game, "Rad1"), (_n2c('a1'), _n2c('d1')))
+        self.assertEqual(san_to_move(game, "Rhd1+"), (_n2c('h1'), _n2c('d1')))
+
+    def test_san_castling(self):
+        game = Game()
+        for san in ["Nf3", "Nf6", "e4", "e5", "Be2", "Be7"]:
+            game.make_move(*san_to_move(game, san))
+        self.assertEqual(san_to_move(game, "O-O"), (_n2c('e1'), _n2c('g1')))
+        with self.assertRaises(ValueError):
+            san_to_move(game, "O-O-O")
+
+    def test_find_candidate_squares(self):
+        game = Game()
+        # only the pawn behind the square can move there, the other pawns are not candidates
+        self.assertEqual(find_candidate_squares(game, "pawn", WHITE, _n2c('e4')), [_n2c('e2')])
+        self.assertEqual(sorted(find_candidate_squares(game, "knight", WHITE, _n2c('f3'))), [_n2c('g1')])
+        # the rooks are blocked by their own pieces
+        self.assertEqual(find_candidate_squares(game, "rook", WHITE, _n2c('a4')), [])
+        game.board.board[1][0] = None # a2 pawn removed
+        self.assertEqual(find_candidate_squares(game, "rook", WHITE, _n2c('a4')), [_n2c('a1')])
+
+    def test_replay_game(self):
+        games = list(read_games(MATE_PGN.splitlines()))
+        mate, wrong, broken = [replay_game(headers, moves, i) for i, (headers, moves) in enumerate(games)]
+        self.assertEqual((mate["plies"], mate["end"], mate["error"]), (4, "checkmate", None))
+        self.assertIn("does not match", wrong["error"])
+        self.assertEqual(broken["plies"], 2)
+        self.assertTrue(broken["error"].startswith("ply 3"))
+
+    def test_replay_games_sharded(self):
+        games = list(read_games((SAMPLE_PGN + MATE_PGN).splitlines())) * 3
+        sequential = list(replay_games(games))
+        self.assertEqual([r["game"] for r in sequential], list(range(len(games))))
+        self.assertEqual(list(replay_games(games, workers=2, ordered=True, chunksize=2)), sequential)
+        unordered = list(replay_games(games, workers=2, ordered=False, chunksize=2))
+        self.assertEqual(sorted(unordered, key=lambda r: r["game"]), sequential)
+
+    def test_replay_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "games.pgn")
+            with open(path, "w") as f:
+                f.write(SAMPLE_PGN + "\n" + MATE_PGN)
+            out = io.StringIO()
+            summary = replay_files([path], out=out, errors_only=True)
+        self.assertEqual(summary["games"], 5)
+        self.assertEqual(summary["errors"], 2)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
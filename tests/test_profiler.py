@@ -0,0 +1,60 @@
+import unittest
+import sys
+import io
+import os
+import tempfile
+
+sys.path.append('..')
+from game import Game, WHITE
+from board import Board
+import ai
+import profiler
+
+
+class TestProfiler(unittest.TestCase):
+
+    def tearDown(self):
+        profiler.disable()
+
+    def test_disabled_by_default(self):
+        original = Game.is_move_legal
+        with profiler.measure("move"):
+            pass
+        self.assertIs(Game.is_move_legal, original)
+
+    def test_breakdown_and_uninstall(self):
+        originals = (Game.find_all_legal_moves, Board.is_path_clear, ai.score_board, Game.undo_move)
+        out = io.StringIO()
+        prof = profiler.enable(out=out)
+        self.assertIsNot(Game.find_all_legal_moves, originals[0])
+        with profiler.measure("move 1"):
+            ai.get_minimax_move(Game(), 2)
+        self.assertGreater(prof.calls["find_all_legal_moves"], 0)
+        self.assertGreater(prof.calls["is_move_legal"], 0)
+        self.assertGreater(prof.calls["undo_move"], 0)
+        # nested calls: the inclusive time of move generation contains the legality checks
+        self.assertGreaterEqual(prof.total_ns["find_all_legal_moves"], prof.self_ns["find_all_legal_moves"])
+        self.assertIn("move 1:", out.getvalue())
+        self.assertIn("is_move_legal", out.getvalue())
+        profiler.disable()
+        self.assertEqual((Game.find_all_legal_moves, Board.is_path_clear, ai.score_board, Game.undo_move), originals)
+
+    def test_collapsed_stacks(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "stacks.txt")
+            profiler.enable(out=io.StringIO(), stacks_path=path)
+            with profiler.measure("move"):
+                Game().find_all_legal_moves(WHITE)
+            profiler.disable()
+            with open(path) as f:
+                lines = f.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            frames, count = line.rsplit(" ", 1)
+            self.assertTrue(frames.startswith("pinpawn;move"))
+            self.assertGreater(int(count), 0)
+        self.assertTrue(any(line.startswith("pinpawn;move;find_all_legal_moves;is_move_legal ") for line in lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
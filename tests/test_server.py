@@ -0,0 +1,106 @@
+import unittest
+import sys
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append('..')
+import server as server_module
+from server import GameServer, FairScheduler
+from loadtest import run_load_test
+
+
+class TestServer(unittest.TestCase):
+
+    def test_fair_scheduling(self):
+        # one worker: client 1 queues three jobs, client 2 one job, the clients are served in turn
+        order = []
+        def job(name):
+            order.append(name)
+            time.sleep(0.01)
+            return name
+        async def run():
+            with ThreadPoolExecutor(1) as executor:
+                scheduler = FairScheduler(executor, 1)
+                futures = [scheduler.submit(1, job, "a1"), scheduler.submit(1, job, "a2"),
+                           scheduler.submit(1, job, "a3"), scheduler.submit(2, job, "b1")]
+                results = await asyncio.gather(*futures)
+                return results, scheduler.metrics()
+        results, metrics = asyncio.run(run())
+        self.assertEqual(results, ["a1", "a2", "a3", "b1"])
+        self.assertEqual(order, ["a1", "a2", "b1", "a3"])
+        self.assertEqual(metrics["completed"], 4)
+        self.assertEqual(metrics["pending"], 0)
+        self.assertGreater(metrics["queue_max"], 0)
+
+    def test_protocol(self):
+        async def run():
+            server = GameServer(1, executor=ThreadPoolExecutor(1))
+            listener = await server.start("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            async def ask(line):
+                writer.write((line + "\n").encode())
+                await writer.drain()
+                return (await reader.readline()).decode().split()
+            replies = [await ask("new white 1 5"), await ask("move 1 e2e5"), await ask("move 1 e2e4"),
+                       await ask("fen 1"), await ask("move 2 e2e4"), await ask("stats"), await ask("quit")]
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+            server.close()
+            return replies
+        new, illegal, engine, fen, unknown, stats, bye = asyncio.run(run())
+        self.assertEqual(new, ["game", "1", "black"])
+        self.assertEqual(illegal[:2], ["error", "1"])
+        self.assertEqual(engine[:2], ["move", "1"])
+        self.assertEqual(fen[:3], ["fen", "1", fen[2]])
+        self.assertEqual(fen[3], "w") # white to move again after the engine's reply
+        self.assertEqual(unknown[:2], ["error", "2"])
+        self.assertEqual(stats[0], "stats")
+        self.assertEqual(bye, ["bye"])
+
+    def test_engine_failure(self):
+        def failing_engine_move(game, depth, time_limit):
+            raise RuntimeError("search crashed")
+        async def run():
+            server = GameServer(1, executor=ThreadPoolExecutor(1))
+            listener = await server.start("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            async def ask(line):
+                writer.write((line + "\n").encode())
+                await writer.drain()
+                return (await reader.readline()).decode().split()
+            replies = [await ask("new white 1 5"), await ask("move 1 e2e4")]
+            replies.append((await reader.readline()).decode().split())
+            thinking = server.sessions[1].thinking
+            replies.append(await ask("move 1 e7e5"))
+            replies.append(await ask("fen 1"))
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+            server.close()
+            return replies, thinking
+        engine_move = server_module._engine_move
+        server_module._engine_move = failing_engine_move
+        try:
+            (new, failure, over, move, fen), thinking = asyncio.run(run())
+        finally:
+            server_module._engine_move = engine_move
+        self.assertEqual(new, ["game", "1", "black"])
+        self.assertEqual(failure, ["error", "1", "the", "engine", "failed", "(RuntimeError)"])
+        self.assertEqual(over, ["over", "1", "*", "engine", "failure"])
+        self.assertFalse(thinking)
+        self.assertEqual(move, ["error", "1", "the", "game", "is", "over"])
+        self.assertEqual(fen[:2], ["fen", "1"])
+
+    def test_load_test(self):
+        latencies, metrics, _ = asyncio.run(run_load_test(clients=3, games=1, max_moves=2, depth=1, budget=2, workers=2))
+        self.assertEqual(metrics["games_started"], 3)
+        self.assertEqual(metrics["completed"], len(latencies))
+        self.assertGreater(len(latencies), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
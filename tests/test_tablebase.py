@@ -0,0 +1,93 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.append('..')
+from utils import _n2c
+from piece import Piece, WHITE, BLACK
+from game import Game
+from tablebase import Tablebases, TABLE_SIZE, WIN, LOSS, DRAW, _index, _decode, generate
+import ai
+
+
+def _square(notation):
+    row, col = _n2c(notation)
+    return row * 8 + col
+
+
+class TestTablebase(unittest.TestCase):
+
+    def setUp(self):
+        # a KRK table that only knows a back-rank mate: Kg6 Ra1 Kh8, white to move, Ra8# is mate in one
+        self.tmpdir = tempfile.TemporaryDirectory()
+        values = bytearray(TABLE_SIZE)
+        values[_index(0, _square('g6'), _square('h8'), _square('a1'))] = 1
+        values[_index(1, _square('g6'), _square('h8'), _square('a8'))] = 128
+        with open(os.path.join(self.tmpdir.name, "KRK.tb"), "wb") as f:
+            f.write(values)
+        self.tablebases = Tablebases(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tablebases.close()
+        ai.load_tablebases(None)
+        self.tmpdir.cleanup()
+
+    def _position(self, pieces, player):
+        game = Game()
+        game.board.board = [[None for _ in range(8)] for _ in range(8)]
+        for square, color, piece_type in pieces:
+            row, col = _n2c(square)
+            game.board.board[row][col] = Piece(color, piece_type)
+        for color in (WHITE, BLACK):
+            for flag in game.has_moved[color]:
+                game.has_moved[color][flag] = True
+        game.curr_player = player
+        game.curr_opponent = BLACK if player == WHITE else WHITE
+        return game
+
+    def test_probe(self):
+        game = self._position([('g6', WHITE, "king"), ('a1', WHITE, "rook"), ('h8', BLACK, "king")], WHITE)
+        self.assertEqual(self.tablebases.probe(game), (WIN, 1))
+        self.assertEqual(self.tablebases.best_move(game), (_n2c('a1'), _n2c('a8')))
+
+    def test_probe_mirrored_colors(self):
+        # the same position with colors swapped and the board mirrored
+        game = self._position([('g3', BLACK, "king"), ('a8', BLACK, "rook"), ('h1', WHITE, "king")], BLACK)
+        self.assertEqual(self.tablebases.probe(game), (WIN, 1))
+        game.make_move(_n2c('a8'), _n2c('a1'))
+        self.assertEqual(self.tablebases.probe(game), (LOSS, 0))
+
+    def test_positions_not_covered(self):
+        self.assertIsNone(self.tablebases.probe(Game()))
+        game = self._position([('g6', WHITE, "king"), ('a1', WHITE, "queen"), ('h8', BLACK, "king")], WHITE)
+        self.assertIsNone(self.tablebases.probe(game)) # no KQK table
+        game = self._position([('g6', WHITE, "king"), ('h8', BLACK, "king")], WHITE)
+        self.assertEqual(self.tablebases.probe(game), (DRAW, 0))
+
+    def test_search_uses_tablebases(self):
+        ai.load_tablebases(self.tmpdir.name)
+        game = self._position([('g6', WHITE, "king"), ('a1', WHITE, "rook"), ('h8', BLACK, "king")], WHITE)
+        info = {}
+        self.assertEqual(ai.get_minimax_move(game, 3, info=info), (_n2c('a1'), _n2c('a8')))
+        self.assertTrue(info["tablebase"])
+        self.assertEqual(info["score"], ai.TB_WIN_SCORE - 1)
+
+    @unittest.skipUnless(os.environ.get("PINPAWN_SLOW_TESTS"), "slow (about 80s), set PINPAWN_SLOW_TESTS=1 to run")
+    def test_generate_kqk(self):
+        values = generate("KQK", self.tmpdir.name)
+        # the longest win of KQK is a mate in 10 moves (19 plies)
+        self.assertEqual(max(v for v in values if v < 128), 19)
+        self.assertEqual(_decode(values[_index(0, _square('g6'), _square('h8'), _square('a2'))]), (WIN, 1)) # Qa8#
+        self.assertEqual(_decode(values[_index(1, _square('g6'), _square('h8'), _square('g7'))]), (LOSS, 0)) # mated
+        self.assertEqual(_decode(values[_index(1, _square('g6'), _square('h8'), _square('f7'))]), (DRAW, 0)) # stalemate
+        self.assertEqual(_decode(values[_index(1, _square('a1'), _square('h8'), _square('g7'))]), (DRAW, 0)) # Kxg7
+        # the table agrees with the generated file and the probing code
+        tablebases = Tablebases(self.tmpdir.name)
+        try:
+            game = self._position([('g6', WHITE, "king"), ('a2', WHITE, "queen"), ('h8', BLACK, "king")], WHITE)
+            self.assertEqual(tablebases.probe(game), (WIN, 1))
+            game = self._position([('e4', WHITE, "king"), ('d1', WHITE, "queen"), ('e6', BLACK, "king")], BLACK)
+            self.assertEqual(tablebases.probe(game), (LOSS, 10)) # mated in 10 plies
+        finally:
+            tablebases.close()
@@ -0,0 +1,53 @@
+import unittest
+import sys
+import io
+import json
+
+sys.path.append('..')
+from tournament import play_game, run_match, count_results, elo_estimate, sprt, parse_engine
+
+
+class TestTournament(unittest.TestCase):
+
+    def test_parse_engine(self):
+        self.assertTrue(callable(parse_engine("random")))
+        self.assertTrue(callable(parse_engine("minimax:2:0.5")))
+        with self.assertRaises(ValueError):
+            parse_engine("stockfish")
+
+    def test_move_cap_adjudication(self):
+        record = play_game("random", "random", max_moves=10, seed=1)
+        self.assertLessEqual(len(record["moves"]), 10)
+        if record["reason"] == "move cap":
+            self.assertEqual(record["result"], "1/2-1/2")
+
+    def test_result_is_consistent(self):
+        record = play_game("random", "random", max_moves=400, seed=7)
+        self.assertIn(record["reason"], ["checkmate", "stalemate", "threefold repetition", "fifty-move rule", "move cap"])
+        if record["reason"] == "checkmate":
+            self.assertIn(record["result"], ["1-0", "0-1"])
+
+    def test_run_match_streams_jsonl(self):
+        out = io.StringIO()
+        records = run_match("random", "minimax:1", 4, workers=2, out=out, max_moves=12, seed=3)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(sorted(json.loads(line)["game"] for line in lines), [0, 1, 2, 3])
+        # colors alternate
+        self.assertEqual(sum(r["white"] == "random" for r in records), 2)
+
+    def test_statistics(self):
+        records = [
+            {"white": "a", "black": "b", "result": "1-0"},
+            {"white": "b", "black": "a", "result": "1-0"},
+            {"white": "a", "black": "b", "result": "1/2-1/2"},
+        ]
+        self.assertEqual(count_results(records, "a"), (1, 1, 1))
+        elo, error = elo_estimate(60, 20, 20)
+        self.assertGreater(elo, 100)
+        self.assertLess(elo - error, elo)
+        self.assertAlmostEqual(elo_estimate(10, 0, 10)[0], 0.0)
+        llr, lower, upper = sprt(600, 200, 200)
+        self.assertGreater(llr, upper)
+        llr, lower, upper = sprt(200, 200, 600)
+        self.assertLess(llr, lower)
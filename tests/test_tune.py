@@ -0,0 +1,83 @@
+import unittest
+import sys
+import random
+
+sys.path.append('..')
+from utils import _n2c
+from piece import Piece, WHITE, BLACK
+from game import Game
+import ai
+import tune
+
+
+class TestTune(unittest.TestCase):
+
+    def _random_positions(self, count, seed=0):
+        rng = random.Random(seed)
+        games = []
+        for _ in range(count):
+            game = Game()
+            for _ in range(rng.randrange(4, 40)):
+                moves = game.find_all_legal_moves(game.curr_player)
+                if not moves:
+                    break
+                r1, c1, r2, c2 = rng.choice(moves)
+                game.make_move((r1, c1), (r2, c2))
+            games.append(game)
+        return games
+
+    def test_encoding_matches_score_board(self):
+        weights = tune.current_weights()
+        for game in [Game()] + self._random_positions(10):
+            encoded = tune.encode_board(game.board)
+            # score_board rounds the tapered score down
+            self.assertAlmostEqual(sum(weights[f] * s for f, s in encoded), ai.score_board(game.board), delta=1)
+
+    def test_is_quiet(self):
+        game = Game()
+        self.assertTrue(tune.is_quiet(game))
+        game.board.board = [[None for _ in range(8)] for _ in range(8)]
+        game.board.board[0][7] = Piece(WHITE, "king")
+        game.board.board[7][7] = Piece(BLACK, "king")
+        game.board.board[3][3] = Piece(WHITE, "rook")
+        game.board.board[5][3] = Piece(BLACK, "queen") # hanging queen
+        self.assertFalse(tune.is_quiet(game))
+
+    def test_extract_positions(self):
+        moves = [(_n2c(a), _n2c(b)) for a, b in [("e2", "e4"), ("e7", "e5"), ("g1", "f3"), ("b8", "c6")]]
+        samples = list(tune.extract_positions([("1-0", moves), ("*", moves)], skip_plies=2))
+        self.assertEqual(len(samples), 2) # plies 2 and 3 of the first game, the unfinished game is skipped
+        self.assertEqual(samples[0][1], 1.0)
+
+    @unittest.skipIf(tune.np is None, "numpy is not installed")
+    def test_fit_recovers_material(self):
+        np = tune.np
+        rng = random.Random(1)
+        samples = []
+        for game in self._random_positions(300, seed=2):
+            encoded = tune.encode_board(game.board)
+            material = sum(s * (900 if f == tune.MATERIAL_OFFSET + 4 else 300 if f > tune.MATERIAL_OFFSET else 100)
+                           for f, s in encoded if tune.MATERIAL_OFFSET <= f < tune.MATERIAL_OFFSET + 5)
+            for _ in range(5):
+                samples.append((encoded, 1.0 if rng.random() < 1 / (1 + 10 ** (-material / 400)) else 0.0))
+        features, coefficients, results = tune.encode_samples(samples)
+        self.assertEqual(features.shape, (len(samples), tune.MAX_FEATURES))
+        weights = np.zeros(tune.NUM_FEATURES)
+        before = tune.loss(weights, features, coefficients, results, 1.0)
+        weights = tune.fit_weights(weights, features, coefficients, results, 1.0, epochs=200, learning_rate=5.0)
+        self.assertLess(tune.loss(weights, features, coefficients, results, 1.0), before)
+        weights = tune.normalize(weights)
+        self.assertGreater(weights[tune.MATERIAL_OFFSET + 4], weights[tune.MATERIAL_OFFSET]) # queen > pawn
+
+    @unittest.skipIf(tune.np is None, "numpy is not installed")
+    def test_format_tables(self):
+        namespace = {}
+        exec(tune.format_tables(tune.np.array(tune.current_weights())), namespace)
+        self.assertEqual(namespace["PIECE_TABLES"]["knight"], tune.PIECE_TABLES["knight"])
+        self.assertEqual(namespace["PIECE_TABLES_EG"]["king"], tune.PIECE_TABLES_EG["king"])
+        self.assertEqual(namespace["PIECE_SCORE"], ai.PIECE_SCORE)
+        self.assertEqual(namespace["EG_VALUES"], tune.pst.EG_VALUES)
+
+
+if __name__ == '__main__':
+    unittest.main()
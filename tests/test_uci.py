@@ -0,0 +1,100 @@
+import unittest
+import sys
+import io
+import time
+
+sys.path.append('..')
+from piece import BLACK
+from main_uci import UCIEngine, _format_score
+import ai
+
+
+class TestUCI(unittest.TestCase):
+
+    def setUp(self):
+        self.out = io.StringIO()
+        self.engine = UCIEngine(self.out)
+
+    def tearDown(self):
+        self.engine.stop()
+
+    def _lines(self):
+        return self.out.getvalue().splitlines()
+
+    def test_handshake(self):
+        self.engine.handle("uci")
+        self.engine.handle("isready")
+        self.assertIn("uciok", self._lines())
+        self.assertEqual(self._lines()[-1], "readyok")
+
+    def test_position_with_moves(self):
+        self.engine.handle("position startpos moves e2e4 e7e5 g1f3")
+        self.assertEqual(self.engine.game.curr_player, BLACK)
+        self.assertEqual(self.engine.game.get_fen(), "rnbqkbnr/pppp1ppp/8/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 0 1")
+        self.engine.handle("position fen 7k/8/8/8/8/8/8/R6K w - - 0 1 moves a1a7")
+        self.assertEqual(self.engine.game.get_fen(), "7k/R7/8/8/8/8/8/7K b - - 0 1")
+
+    def test_position_with_promotions(self):
+        self.engine.handle("position fen 7k/P7/8/8/8/8/8/K7 w - - 0 1 moves a7a8q")
+        self.assertEqual(self.engine.game.get_fen(), "Q6k/8/8/8/8/8/8/K7 b - - 0 1")
+        self.engine.handle("position fen 7k/P7/8/8/8/8/8/K7 w - - 0 1 moves a7a8n h8g7")
+        self.assertEqual(self._lines(), ["info string unsupported under-promotion a7a8n"])
+        self.assertEqual(self.engine.game.get_fen(), "7k/P7/8/8/8/8/8/K7 w - - 0 1")
+
+    def test_go_depth(self):
+        self.engine.handle("position startpos")
+        self.engine.handle("go depth 2")
+        self.engine.search_thread.join()
+        lines = self._lines()
+        self.assertTrue(lines[0].startswith("info depth 1 "))
+        self.assertIn(" nodes ", lines[1])
+        self.assertIn(" pv ", lines[1])
+        self.assertTrue(lines[-1].startswith("bestmove "))
+
+    def test_stop_infinite_search(self):
+        self.engine.handle("position startpos")
+        self.engine.handle("go infinite")
+        time.sleep(0.1)
+        self.engine.handle("isready") # answered while searching
+        self.assertIn("readyok", self._lines())
+        start = time.perf_counter()
+        self.engine.handle("stop")
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertTrue(self._lines()[-1].startswith("bestmove "))
+
+    def test_multipv(self):
+        self.engine.handle("uci")
+        self.assertIn("option name MultiPV type spin default 1 min 1 max 64", self._lines())
+        self.engine.handle("setoption name MultiPV value 3")
+        self.engine.handle("position startpos")
+        self.engine.handle("go depth 2")
+        self.engine.search_thread.join()
+        lines = [line for line in self._lines() if line.startswith("info depth 2 ")]
+        self.assertEqual([line.split()[4] for line in lines], ["1", "2", "3"])
+        self.assertTrue(self._lines()[-1].startswith("bestmove "))
+
+    def test_mate_score(self):
+        self.engine.handle("position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+        self.engine.handle("go depth 2")
+        self.engine.search_thread.join()
+        self.assertIn("score mate 1", self._lines()[-2])
+        self.assertEqual(self._lines()[-1], "bestmove a1a8")
+        self.engine.handle("position fen r2qkb1r/pp2nppp/3p4/2pNN1B1/2BnP3/3P4/PPP2PPP/R2bK2R w KQkq - 1 1")
+        self.engine.handle("go depth 4") # the mated position must be reached above the quiescence search
+        self.engine.search_thread.join()
+        self.assertIn("score mate 2", self._lines()[-2]) # 1. Nf6+ gxf6 2. Bxf7#
+
+    def test_format_score(self):
+        self.assertEqual(_format_score(ai.MATE_SCORE - 3, True), "mate 2")
+        self.assertEqual(_format_score(ai.MATE_SCORE - 3, False), "mate -2")
+        self.assertEqual(_format_score(-(ai.MATE_SCORE - 2), True), "mate -1")
+        self.assertEqual(_format_score(ai.TB_WIN_SCORE - 5, True), "mate 3")
+        self.assertEqual(_format_score(35, False), "cp -35")
+
+    def test_infinite_waits_for_stop(self):
+        self.engine.handle("position startpos")
+        self.engine.handle("go depth 1 infinite")
+        time.sleep(0.2) # the depth 1 search is over by now
+        self.assertFalse(any(line.startswith("bestmove") for line in self._lines()))
+        self.engine.handle("stop")
+        self.assertTrue(self._lines()[-1].startswith("bestmove "))
@@ -0,0 +1,34 @@
+import unittest
+import sys
+
+sys.path.append('..')
+from utils import _n2c
+from game import Game
+from zobrist import hash_game
+
+
+class TestZobrist(unittest.TestCase):
+
+    def _play(self, moves):
+        game = Game()
+        for move in moves:
+            game.make_move(_n2c(move[:2]), _n2c(move[2:]))
+        return game
+
+    def test_transposition_same_hash(self):
+        # the same position reached by two different move orders
+        game1 = self._play(["g1f3", "g8f6", "b1c3"])
+        game2 = self._play(["b1c3", "g8f6", "g1f3"])
+        self.assertEqual(hash_game(game1), hash_game(game2))
+
+    def test_side_to_move_changes_hash(self):
+        game1 = self._play(["g1f3", "g8f6", "f3g1", "f6g8"])
+        game2 = Game()
+        self.assertEqual(hash_game(game1), hash_game(game2))
+        game1.curr_player, game1.curr_opponent = game1.curr_opponent, game1.curr_player
+        self.assertNotEqual(hash_game(game1), hash_game(game2))
+
+    def test_castling_rights_change_hash(self):
+        # the rook goes back to h1, but white can no longer castle kingside
+        game1 = self._play(["g1f3", "g8f6", "h1g1", "f6g8", "g1h1", "g8f6", "f3g1", "f6g8"])
+        self.assertNotEqual(hash_game(game1), hash_game(Game()))
@@ -0,0 +1,190 @@
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from multiprocessing import Pool
+from game import Game, WHITE, BLACK
+import ai
+from ai import get_minimax_move, get_random_move
+from utils import _c2n
+
+
+# headless engine-vs-engine match runner
+# games are played in parallel worker processes and streamed as JSON lines, one per game:
+#   {"game": 3, "white": "minimax:2", "black": "random", "moves": ["e2e4", ...], "result": "1-0", "reason": "checkmate"}
+# at the end, the score of the first engine is summarized with an Elo estimate and a sequential
+# probability ratio test (SPRT)
+#
+# engine specs: "random", "minimax:<depth>" or "minimax:<depth>:<time limit in seconds>"
+
+
+# function to parse an engine spec, returns a function taking a game and returning a move (or None)
+def parse_engine(spec):
+    parts = spec.split(":")
+    if parts[0] == "random" and len(parts) == 1:
+        return get_random_move
+    if parts[0] == "minimax" and len(parts) in (2, 3):
+        depth = int(parts[1])
+        time_limit = float(parts[2]) if len(parts) == 3 else None
+        table = {}
+        def engine(game):
+            # each engine keeps its own transposition table, so that it doesn't profit from the opponent's search
+            ai.TRANSPOSITION_TABLE = table
+            return get_minimax_move(game, depth, time_limit)
+        return engine
+    raise ValueError(f"Unknown engine spec '{spec}'")
+
+
+# function to play a single game between two engine specs
+# the game is adjudicated a draw after max_moves moves (both sides counted)
+# returns the game record as a dict
+def play_game(white_spec, black_spec, max_moves=300, seed=None, game_id=0):
+    if seed is not None:
+        random.seed(seed)
+    engines = {WHITE: parse_engine(white_spec), BLACK: parse_engine(black_spec)}
+    game = Game()
+    moves = []
+    start_time = time.perf_counter()
+    while True:
+        if not game.find_all_legal_moves(game.curr_player):
+            king_pos = game.board.find_king(game.curr_player)
+            if game.is_square_attacked(king_pos, game.curr_opponent):
+                result = "0-1" if game.curr_player == WHITE else "1-0"
+                reason = "checkmate"
+            else:
+                result, reason = "1/2-1/2", "stalemate"
+            break
+        if game.draw_reason() is not None:
+            result, reason = "1/2-1/2", game.draw_reason()
+            break
+        if len(moves) >= max_moves:
+            result, reason = "1/2-1/2", "move cap"
+            break
+        start_pos, end_pos = engines[game.curr_player](game)
+        game.make_move(start_pos, end_pos)
+        moves.append(_c2n(*start_pos) + _c2n(*end_pos))
+    return {
+        "game": game_id, "white": white_spec, "black": black_spec, "moves": moves,
+        "result": result, "reason": reason, "seconds": round(time.perf_counter() - start_time, 3)
+    }
+
+
+# helper function for the worker processes
+def _play_job(job):
+    return play_game(*job)
+
+
+# function to play a match of num_games games between engine_a and engine_b, alternating colors
+# games run on a pool of worker processes, each finished game is written to out as a JSON line
+# returns the list of game records, in the order they finished
+def run_match(engine_a, engine_b, num_games, workers=None, out=None, max_moves=300, seed=None):
+    # validate the specs before spawning anything
+    parse_engine(engine_a)
+    parse_engine(engine_b)
+    base_seed = seed if seed is not None else random.randrange(2**32)
+    jobs = []
+    for i in range(num_games):
+        white, black = (engine_a, engine_b) if i % 2 == 0 else (engine_b, engine_a)
+        jobs.append((white, black, max_moves, base_seed + i, i))
+    records = []
+    with Pool(workers) as pool:
+        for record in pool.imap_unordered(_play_job, jobs):
+            records.append(record)
+            if out is not None:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+    return records
+
+
+# function to count wins, draws and losses of an engine in a list of game records
+def count_results(records, engine):
+    wins = draws = losses = 0
+    for record in records:
+        if record["result"] == "1/2-1/2":
+            draws += 1
+        elif (record["result"] == "1-0") == (record["white"] == engine):
+            wins += 1
+        else:
+            losses += 1
+    return wins, draws, losses
+
+
+# helper function to convert an expected score into an Elo difference
+def _score_to_elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+# helper function to convert an Elo difference into an expected score
+def _elo_to_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+# function to estimate the Elo difference from wins, draws and losses
+# returns (elo, error), where error is the half-width of the 95% confidence interval
+def elo_estimate(wins, draws, losses):
+    n = wins + draws + losses
+    if n == 0:
+        return 0.0, float("inf")
+    score = (wins + 0.5 * draws) / n
+    variance = (wins * (1 - score)**2 + draws * (0.5 - score)**2 + losses * score**2) / n
+    margin = 1.96 * math.sqrt(variance / n)
+    elo = _score_to_elo(score)
+    error = (_score_to_elo(score + margin) - _score_to_elo(score - margin)) / 2
+    return elo, error
+
+
+# function to compute the log-likelihood ratio of the SPRT between H0: elo = elo0 and H1: elo = elo1
+# (normal approximation of the score distribution)
+# returns (llr, lower_bound, upper_bound): H1 is accepted above the upper bound, H0 below the lower one
+def sprt(wins, draws, losses, elo0=0, elo1=10, alpha=0.05, beta=0.05):
+    lower = math.log(beta / (1 - alpha))
+    upper = math.log((1 - beta) / alpha)
+    n = wins + draws + losses
+    if n == 0:
+        return 0.0, lower, upper
+    score = (wins + 0.5 * draws) / n
+    variance = (wins * (1 - score)**2 + draws * (0.5 - score)**2 + losses * score**2) / n
+    if variance == 0:
+        return 0.0, lower, upper
+    s0, s1 = _elo_to_score(elo0), _elo_to_score(elo1)
+    llr = n * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+    return llr, lower, upper
+
+
+# function to format the summary of a match
+def summarize(records, engine_a, engine_b, elo0=0, elo1=10):
+    wins, draws, losses = count_results(records, engine_a)
+    elo, error = elo_estimate(wins, draws, losses)
+    llr, lower, upper = sprt(wins, draws, losses, elo0, elo1)
+    verdict = "H1 accepted" if llr >= upper else ("H0 accepted" if llr <= lower else "inconclusive")
+    return (
+        f"{engine_a} vs {engine_b}: +{wins} ={draws} -{losses} ({len(records)} games)\n"
+        f"Elo difference: {elo:.1f} +/- {error:.1f}\n"
+        f"SPRT [{elo0}, {elo1}]: LLR {llr:.2f} ({lower:.2f}, {upper:.2f}) {verdict}"
+    )
+
+
+# command line tool, e.g. python tournament.py minimax:2 random -n 100 -w 4 -o games.jsonl
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play headless PinPawn engine matches.")
+    parser.add_argument("engine_a", help="first engine, e.g. minimax:2 or minimax:4:0.5")
+    parser.add_argument("engine_b", help="second engine, e.g. random")
+    parser.add_argument("-n", "--games", type=int, default=100, help="number of games (default: 100)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("-o", "--output", default=None, help="JSONL output file (default: stdout)")
+    parser.add_argument("--max-moves", type=int, default=300, help="adjudicate a draw after this many moves")
+    parser.add_argument("--seed", type=int, default=None, help="base random seed")
+    parser.add_argument("--elo0", type=float, default=0, help="SPRT null hypothesis")
+    parser.add_argument("--elo1", type=float, default=10, help="SPRT alternative hypothesis")
+    args = parser.parse_args()
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        records = run_match(args.engine_a, args.engine_b, args.games, args.workers, out, args.max_moves, args.seed)
+    finally:
+        if args.output:
+            out.close()
+    print(summarize(records, args.engine_a, args.engine_b, args.elo0, args.elo1), file=sys.stderr)
@@ -0,0 +1,320 @@
+
+import argparse
+import inspect
+import sys
+import time
+import ai
+from game import Game, WHITE, BLACK
+import pst
+from pgn import read_games, read_lines, san_to_move
+from pawns import PAWN_TERMS, PAWN_WEIGHTS, pawn_terms
+from pst import PIECE_SCORE, PIECE_TABLES, PIECE_TABLES_EG, PHASE_WEIGHTS, MAX_PHASE
+from tournament import run_match
+from utils import _n2c
+
+try:
+    import numpy as np
+except ImportError: # numpy is only needed to tune, not to play
+    np = None
+
+
+# Texel-style tuning of the evaluation (material values, midgame and endgame piece-square tables)
+# 1. quiet positions are extracted from PGN games or self-play games, labelled with the game result
+# 2. every position is encoded once as its piece-square occupancy: the list of (feature, coefficient) pairs of its
+#    pieces, where the coefficient is the sign of the piece (+1 white, -1 black) times the weight of the midgame or
+#    endgame table in the tapered evaluation; they are stored in NumPy arrays (one row per position, padded to 32
+#    pieces), so that the evaluation of all positions is a single vectorized weights[features] * coefficients sum
+#    the pawn structure terms of pawns.py are encoded the same way (white minus black counts), but kept fixed
+# 3. the scaling constant K of the win probability 1 / (1 + 10^(-K * score / 400)) is fitted, then the weights
+#    are fitted by gradient descent (Adam) on the mean squared error between results and win probabilities
+# 4. the fitted tables are written in the pst.py format
+#
+# e.g. python tune.py --pgn games.pgn -o pst_tuned.py, or python tune.py --selfplay 200 -o pst_tuned.py
+
+PIECE_TYPES = ["pawn", "knight", "bishop", "rook", "queen", "king"]
+# midgame piece-square features first, then the endgame ones, then one material feature per piece type,
+# then a midgame and an endgame feature per pawn structure term
+ENDGAME_OFFSET = len(PIECE_TYPES) * 64
+MATERIAL_OFFSET = 2 * ENDGAME_OFFSET
+PAWN_OFFSET = MATERIAL_OFFSET + len(PIECE_TYPES)
+NUM_FEATURES = PAWN_OFFSET + 2 * len(PAWN_TERMS)
+FEATURES_PER_PIECE = 3
+MAX_PIECES = 32
+MAX_FEATURES = MAX_PIECES * FEATURES_PER_PIECE + 2 * len(PAWN_TERMS)
+RESULT_SCORES = {"1-0": 1.0, "1/2-1/2": 0.5, "0-1": 0.0}
+
+
+# function to encode a board as a list of (feature, coefficient) pairs
+# with weights holding PIECE_SCORE, the tables of pst.py and the pawn weights, the sum of weight * coefficient is ai.score_board
+# (before its rounding down)
+def encode_board(board):
+    pieces = []
+    phase = 0
+    for r in range(8):
+        for c in range(8):
+            piece = board.board[r][c]
+            if piece is not None:
+                pieces.append((piece, r, c))
+                phase += PHASE_WEIGHTS[piece.type]
+    phase = min(phase, MAX_PHASE)
+    features = []
+    for piece, r, c in pieces:
+        type_index = PIECE_TYPES.index(piece.type)
+        # same table indexing as score_board: rank 8 on the first line of a table, mirrored for black
+        square = (7 - r) * 8 + c if piece.color == WHITE else r * 8 + c
+        sign = 1 if piece.color == WHITE else -1
+        features.append((type_index * 64 + square, sign * phase / MAX_PHASE))
+        features.append((ENDGAME_OFFSET + type_index * 64 + square, sign * (MAX_PHASE - phase) / MAX_PHASE))
+        features.append((MATERIAL_OFFSET + type_index, sign))
+    counts, _, _ = pawn_terms(board)
+    for i, count in enumerate(counts):
+        if count:
+            features.append((PAWN_OFFSET + 2 * i, count * phase / MAX_PHASE))
+            features.append((PAWN_OFFSET + 2 * i + 1, count * (MAX_PHASE - phase) / MAX_PHASE))
+    return features
+
+
+# function returning the weights of the current evaluation, as a list indexed by feature
+def current_weights():
+    weights = [0.0] * NUM_FEATURES
+    for type_index, piece_type in enumerate(PIECE_TYPES):
+        for square in range(64):
+            weights[type_index * 64 + square] = float(PIECE_TABLES[piece_type][square])
+            weights[ENDGAME_OFFSET + type_index * 64 + square] = float(PIECE_TABLES_EG[piece_type][square])
+        weights[MATERIAL_OFFSET + type_index] = float(PIECE_SCORE[piece_type])
+    for i, term in enumerate(PAWN_TERMS):
+        weights[PAWN_OFFSET + 2 * i], weights[PAWN_OFFSET + 2 * i + 1] = PAWN_WEIGHTS[term]
+    return weights
+
+
+# function to check if a position is quiet enough to be used for tuning: the side to move is not in check
+# and has no capture winning material (according to the static exchange evaluation)
+def is_quiet(game):
+    king_pos = game.board.find_king(game.curr_player)
+    if king_pos is None or game.is_square_attacked(king_pos, game.curr_opponent):
+        return False
+    return all(ai.see(game, move) <= 0 for move in game.find_all_legal_captures(game.curr_player))
+
+
+# generator that replays games, given as (result, list of (start_pos, end_pos) moves), and yields the
+# (features, result score) samples of their quiet positions, skipping the first skip_plies plies of every game
+def extract_positions(games, skip_plies=8):
+    for result, moves in games:
+        if result not in RESULT_SCORES:
+            continue
+        game = Game()
+        for ply, (start_pos, end_pos) in enumerate(moves):
+            if ply >= skip_plies and is_quiet(game):
+                yield encode_board(game.board), RESULT_SCORES[result]
+            game.make_move(start_pos, end_pos)
+
+
+# generator that reads games with a result from PGN files, as (result, moves) for extract_positions
+def pgn_games(paths):
+    for headers, sans in read_games(read_lines(paths)):
+        game = Game()
+        moves = []
+        for san in sans:
+            try:
+                move = san_to_move(game, san)
+            except ValueError:
+                break
+            game.make_move(*move)
+            moves.append(move)
+        yield headers.get("Result", "*"), moves
+
+
+# function to play self-play games between two engine specs (see tournament.py) on worker processes,
+# returns them as a list of (result, moves) for extract_positions
+def selfplay_games(num_games, engine="minimax:1", workers=None, seed=0, max_moves=200):
+    records = run_match(engine, engine, num_games, workers, max_moves=max_moves, seed=seed)
+    return [(record["result"], [(_n2c(m[0:2]), _n2c(m[2:4])) for m in record["moves"]]) for record in records]
+
+
+# function to pack samples into NumPy arrays: features (N x 112 int16), coefficients (N x 112 float32, 0 for
+# padding) and results (N float32)
+def encode_samples(samples):
+    samples = list(samples)
+    width = MAX_FEATURES
+    features = np.zeros((len(samples), width), dtype=np.int16)
+    coefficients = np.zeros((len(samples), width), dtype=np.float32)
+    results = np.zeros(len(samples), dtype=np.float32)
+    for i, (encoded, result) in enumerate(samples):
+        for j, (feature, coefficient) in enumerate(encoded):
+            features[i, j] = feature
+            coefficients[i, j] = coefficient
+        results[i] = result
+    return features, coefficients, results
+
+
+# function to evaluate all the encoded positions at once
+def evaluate(weights, features, coefficients):
+    return (weights[features] * coefficients).sum(axis=1)
+
+
+# helper function returning the win probabilities of scores
+def _win_probability(scores, k):
+    return 1.0 / (1.0 + np.power(10.0, -k * scores / 400.0))
+
+
+# function to compute the mean squared error between the results and the win probabilities
+def loss(weights, features, coefficients, results, k):
+    return float(np.mean((results - _win_probability(evaluate(weights, features, coefficients), k)) ** 2))
+
+
+# function to fit the scaling constant K for fixed weights (golden-section search)
+def fit_k(weights, features, coefficients, results, low=0.01, high=5.0, iterations=40):
+    scores = evaluate(weights, features, coefficients)
+    def error(k):
+        return float(np.mean((results - _win_probability(scores, k)) ** 2))
+    ratio = (5 ** 0.5 - 1) / 2
+    a, b = low, high
+    for _ in range(iterations):
+        c, d = b - ratio * (b - a), a + ratio * (b - a)
+        if error(c) < error(d):
+            b = d
+        else:
+            a = c
+    return (a + b) / 2
+
+
+# function to fit the weights by gradient descent (Adam) on the loss, K fixed
+# the king's material weight is not tuned (kings are always on the board), frozen features neither
+# returns the fitted weights, progress is printed to log every report_every epochs
+def fit_weights(weights, features, coefficients, results, k, epochs=500, learning_rate=1.0, frozen=(), log=None,
+                report_every=50):
+    weights = np.array(weights, dtype=np.float64)
+    trainable = np.ones(NUM_FEATURES)
+    trainable[MATERIAL_OFFSET + PIECE_TYPES.index("king")] = 0
+    trainable[list(frozen)] = 0
+    flat_features = features.ravel().astype(np.int64)
+    n = len(results)
+    m, v = np.zeros(NUM_FEATURES), np.zeros(NUM_FEATURES)
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+    for epoch in range(1, epochs + 1):
+        probabilities = _win_probability(evaluate(weights, features, coefficients), k)
+        # d loss / d score for every position, then spread over its features
+        d_score = -2 * (results - probabilities) * probabilities * (1 - probabilities) * k * np.log(10) / 400 / n
+        grad = np.bincount(flat_features, weights=(coefficients * d_score[:, None]).ravel(), minlength=NUM_FEATURES)
+        grad *= trainable
+        m = beta1 * m + (1 - beta1) * grad
+        v = beta2 * v + (1 - beta2) * grad ** 2
+        weights -= learning_rate * (m / (1 - beta1 ** epoch)) / (np.sqrt(v / (1 - beta2 ** epoch)) + epsilon)
+        if log is not None and epoch % report_every == 0:
+            log.write(f"epoch {epoch}: loss {loss(weights, features, coefficients, results, k):.6f}\n")
+            log.flush()
+    return weights
+
+
+# function to move the average of every midgame piece-square table into the material value of the piece
+# (material and table values of a piece always go together: shifting the material and both tables by opposite
+# amounts does not change any score, so only their sum is fitted)
+# pawns are averaged over the squares they can stand on
+def normalize(weights):
+    weights = np.array(weights, dtype=np.float64)
+    for type_index, piece_type in enumerate(PIECE_TYPES):
+        squares = slice(8, 56) if piece_type == "pawn" else slice(0, 64)
+        mg_table = weights[type_index * 64:(type_index + 1) * 64]
+        eg_table = weights[ENDGAME_OFFSET + type_index * 64:ENDGAME_OFFSET + (type_index + 1) * 64]
+        mean = 0.0 if piece_type == "king" else mg_table[squares].mean() # the king's material stays 0
+        mg_table[squares] -= mean
+        eg_table[squares] -= mean
+        weights[MATERIAL_OFFSET + type_index] += mean
+    return weights
+
+
+# helper function to format a table of 64 weights starting at offset, with rank 8 on the first line
+def _format_table(name, weights, offset):
+    lines = [f"{name} = ["]
+    for row in range(8):
+        values = [int(round(weights[offset + row * 8 + col])) for col in range(8)]
+        lines.append("    " + ",".join(f"{value:>4}" for value in values) + ("," if row < 7 else ""))
+    lines.append("]")
+    lines.append("")
+    return lines
+
+
+# function to format weights as a Python module that can replace pst.py: material values, midgame and
+# endgame tables, and the precomputed square values
+def format_tables(weights):
+    material = ", ".join(f'"{piece_type}": {int(round(weights[MATERIAL_OFFSET + i]))}'
+                         for i, piece_type in enumerate(PIECE_TYPES))
+    lines = ["", "from piece import WHITE, BLACK", "",
+             "# piece-square tables fitted by tune.py (Texel tuning)",
+             "# there is a midgame and an endgame table for every piece, blended according to the game phase",
+             "# all maps are relative to white pieces, black pieces use mirrored tables (inverted rows)", "",
+             f"PIECE_SCORE = {{{material}}}", "",
+             f"PHASE_WEIGHTS = {PHASE_WEIGHTS!r}".replace("'", '"'), f"MAX_PHASE = {MAX_PHASE}", "", ""]
+    lines.append("# MIDGAME TABLES")
+    lines.append("")
+    for type_index, piece_type in enumerate(PIECE_TYPES):
+        lines.extend(_format_table(f"{piece_type}_table", weights, type_index * 64))
+    lines.append("# ENDGAME TABLES")
+    lines.append("")
+    for type_index, piece_type in enumerate(PIECE_TYPES):
+        lines.extend(_format_table(f"{piece_type}_endgame_table", weights, ENDGAME_OFFSET + type_index * 64))
+    lines.append("")
+    lines.append("# map piece types to tables")
+    lines.append("PIECE_TABLES = {")
+    lines.extend(f'    "{piece_type}": {piece_type}_table,' for piece_type in PIECE_TYPES)
+    lines.append("}")
+    lines.append("PIECE_TABLES_EG = {")
+    lines.extend(f'    "{piece_type}": {piece_type}_endgame_table,' for piece_type in PIECE_TYPES)
+    lines.append("}")
+    lines.append("")
+    lines.append("")
+    lines.append(inspect.getsource(pst._square_values).rstrip())
+    lines.append("")
+    lines.append("MG_VALUES = _square_values(PIECE_TABLES)")
+    lines.append("EG_VALUES = _square_values(PIECE_TABLES_EG)")
+    return "\n".join(lines) + "\n"
+
+
+# command line tool
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the PinPawn evaluation on game results (Texel tuning).")
+    parser.add_argument("--pgn", nargs="*", default=[], help="PGN files to extract positions from")
+    parser.add_argument("--selfplay", type=int, default=0, help="number of self-play games to extract positions from")
+    parser.add_argument("--engine", default="minimax:1", help="engine spec of the self-play games (default: minimax:1)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="self-play worker processes (default: CPU count)")
+    parser.add_argument("--data", default=None, help="load encoded positions from this .npz file instead")
+    parser.add_argument("--save-data", default=None, help="save the encoded positions to this .npz file")
+    parser.add_argument("--epochs", type=int, default=500, help="gradient descent epochs (default: 500)")
+    parser.add_argument("--learning-rate", type=float, default=1.0, help="Adam step size in centipawns (default: 1)")
+    parser.add_argument("--freeze-material", action="store_true", help="only tune the piece-square tables")
+    parser.add_argument("-o", "--output", default="pst_tuned.py", help="output file (default: pst_tuned.py)")
+    args = parser.parse_args()
+    if np is None:
+        sys.exit("tune.py needs numpy (pip install numpy)")
+
+    start_time = time.perf_counter()
+    if args.data:
+        data = np.load(args.data)
+        features, coefficients, results = data["features"], data["coefficients"], data["results"]
+    else:
+        games = []
+        if args.pgn:
+            games.append(pgn_games(args.pgn))
+        if args.selfplay:
+            games.append(selfplay_games(args.selfplay, args.engine, args.workers))
+        samples = [sample for source in games for sample in extract_positions(source)]
+        features, coefficients, results = encode_samples(samples)
+        if args.save_data:
+            np.savez_compressed(args.save_data, features=features, coefficients=coefficients, results=results)
+    print(f"{len(results)} positions ready in {time.perf_counter() - start_time:.1f}s", file=sys.stderr)
+    if not len(results):
+        sys.exit("no positions to tune on")
+
+    weights = np.array(current_weights())
+    k = fit_k(weights, features, coefficients, results)
+    print(f"K = {k:.3f}, initial loss {loss(weights, features, coefficients, results, k):.6f}", file=sys.stderr)
+    frozen = list(range(PAWN_OFFSET, NUM_FEATURES)) # the pawn structure weights of pawns.py are not written out
+    if args.freeze_material:
+        frozen += range(MATERIAL_OFFSET, PAWN_OFFSET)
+    weights = fit_weights(weights, features, coefficients, results, k, args.epochs, args.learning_rate, frozen, sys.stderr)
+    weights = normalize(weights)
+    print(f"final loss {loss(weights, features, coefficients, results, k):.6f}, "
+          f"total {time.perf_counter() - start_time:.1f}s", file=sys.stderr)
+    with open(args.output, "w") as f:
+        f.write(format_tables(weights))
+    print(f"tables written to {args.output}", file=sys.stderr)
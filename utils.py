@@ -10,3 +10,14 @@ def _c2n(row, col): # coords to notation
     # converts row and column indices to chess notation
     # e.g. (0,0) -> 'a1', (1,0) -> 'a2', (3,4) -> 'e4', (7,7) -> 'h8'
     return chr(col + ord('a')) + str(row + 1)
+
+def _move2int(start_pos, end_pos): # move to 16-bit integer
+    # packs a move as from_square << 6 | to_square, with square = row * 8 + col
+    # (the same layout as the move field of Polyglot opening books)
+    return (start_pos[0] * 8 + start_pos[1]) << 6 | (end_pos[0] * 8 + end_pos[1])
+
+def _int2move(value): # 16-bit integer to move
+    # inverse of _move2int, returns (start_pos, end_pos)
+    from_sq = (value >> 6) & 63
+    to_sq = value & 63
+    return (from_sq // 8, from_sq % 8), (to_sq // 8, to_sq % 8)
@@ -0,0 +1,62 @@
+
+import random
+from piece import WHITE, BLACK
+
+
+# Zobrist hashing: every (piece, square) pair, castling flag, en passant file and the side to move get a random
+# 64-bit key, and the hash of a position is the XOR of the keys of its features
+# keys come from a fixed seed so that hashes (and the files storing them) are stable between runs
+
+PIECE_TYPES = ["pawn", "knight", "bishop", "rook", "queen", "king"]
+
+_rng = random.Random(0x5069_6E50_6177_6E)
+PIECE_KEYS = {
+    (color, piece_type): [_rng.getrandbits(64) for _ in range(64)]
+    for color in (WHITE, BLACK) for piece_type in PIECE_TYPES
+}
+CASTLING_KEYS = {
+    (color, flag): _rng.getrandbits(64)
+    for color in (WHITE, BLACK) for flag in ("king", "rook_a", "rook_h")
+}
+EN_PASSANT_KEYS = [_rng.getrandbits(64) for _ in range(8)] # one per file
+BLACK_TO_MOVE_KEY = _rng.getrandbits(64)
+
+
+# function to compute the hash of a game state from scratch
+# (Game keeps it up to date in game.zobrist_key, this is the reference)
+def hash_game(game):
+    h = hash_state(game)
+    board = game.board.board
+    for r in range(8):
+        for c in range(8):
+            piece = board[r][c]
+            if piece is not None:
+                h ^= PIECE_KEYS[(piece.color, piece.type)][r*8 + c]
+    return h
+
+
+# function to compute the hash of the state of a game that is not on the board: castling flags, en passant
+# file and side to move
+def hash_state(game):
+    h = 0
+    for color in (WHITE, BLACK):
+        for flag, moved in game.has_moved[color].items():
+            if moved:
+                h ^= CASTLING_KEYS[(color, flag)]
+    if game.en_passant_target_square is not None:
+        h ^= EN_PASSANT_KEYS[game.en_passant_target_square[1]]
+    if game.curr_player == BLACK:
+        h ^= BLACK_TO_MOVE_KEY
+    return h
+
+
+# function to compute the pawn key of a board from scratch: the hash of its pawns only, which identifies the
+# pawn structure (see pawns.py)
+def hash_pawns(board):
+    h = 0
+    for r in range(8):
+        for c in range(8):
+            piece = board.board[r][c]
+            if piece is not None and piece.type == "pawn":
+                h ^= PIECE_KEYS[(piece.color, "pawn")][r*8 + c]
+    return h